@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+import asyncio
+
+from db.pool import monitors, pool_settings
+from db.replicas import replica_router
+from services.jobs import job_worker
+from services.session_tokens import get_admin_session
+
+
+# queue depths, pool settings and replica hosts are for operators only
+router = APIRouter(dependencies=[Depends(get_admin_session)])
+
+
+@router.get("/metrics/jobs")
+async def job_metrics_():
+    return {"message": "Job queue metrics", "data": await asyncio.to_thread(job_worker.queue_stats)}
+
+
+@router.get("/db/pool")
+async def db_pool_stats_():
+    return {
+        "message": "Database pool statistics",
+        "data": {
+            "settings": pool_settings.as_dict(),
+            "engines": {name: monitor.snapshot() for name, monitor in monitors.items()},
+        },
+    }
+
+
+@router.get("/db/replicas")
+async def db_replica_status_():
+    return {"message": "Read replica status", "data": replica_router.status()}
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import (
     Response,
     Request,
@@ -11,10 +12,13 @@ from fastapi import (
     Query,
 )
 from sqlalchemy.orm import Session, joinedload
-import json
-from db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import AsyncSessionLocal, get_db, get_async_db
+from db.bulk import BulkInsertError, chunked, insert_returning_chunks
+from db import conditional
+from db.pagination import InvalidCursor, Keyset
 import utils
-from uuid import uuid4
+from uuid import UUID, uuid4
 from db.models.person import (
     Artist,
     Sculpture,
@@ -27,8 +31,10 @@ from db.models.person import (
     PermanentCollection,
     ExhibitionArtObjectAssociation,
 )
-from fastapi.responses import Response
-import cloudinary.uploader
+from fastapi.responses import ORJSONResponse, Response
+from services.media import MediaUnavailable
+from services import artist_ingest, catalog_import, exhibition_membership, fuzzy_match, homepage, image_variants, listings, staged_create
+from services.homepage import homepage_snapshot
 
 from db.models.data_types import Role
 from schemas.museum import (
@@ -41,6 +47,12 @@ from schemas.museum import (
     PermanentCollectionCreate,
     BorrowedArtObjectBaseCreate,
     ExhibitionArtObjectAssociationCreate,
+    ExhibitionMembershipSync,
+    ArtistPage,
+    SculpturePage,
+    PaintingPage,
+    OtherArtPage,
+    ExhibitionPage,
 )
 
 from typing import Annotated, Optional, List
@@ -51,8 +63,9 @@ from db.models.data_types import (
     StatusTypeEnum,
     GenderEnum,
     ArtObjectType,
+    ImageSize,
 )
-from sqlalchemy import func, and_, desc
+from sqlalchemy import func, and_, desc, select
 import datetime
 
 router = APIRouter()
@@ -62,46 +75,82 @@ def temp_date():
     return datetime.datetime.date(datetime.datetime.now)
 
 
+def _row_dict(row):
+    return {k: v for k, v in row.__dict__.items() if not k.startswith("_")}
+
+
+def _artist_dict(artist):
+    data = _row_dict(artist)
+    # the dedupe key stays internal
+    data.pop("name_normalized", None)
+    return data
+
+
+def _art_object_versions(*where):
+    """Id and ``updated_at`` of art objects with the ``updated_at`` of their subtype rows."""
+    return (
+        select(ArtObject.id, ArtObject.updated_at, Sculpture.updated_at, Painting.updated_at, OtherArt.updated_at)
+        .outerjoin(Sculpture, Sculpture.id == ArtObject.id)
+        .outerjoin(Painting, Painting.id == ArtObject.id)
+        .outerjoin(OtherArt, OtherArt.id == ArtObject.id)
+        .where(*where)
+        .order_by(ArtObject.id)
+    )
+
+
 @router.post("/create/artist")
 async def create_artist_(
     artists: list[ArtistCreate],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    artist_exists = []
-    new_artists = []
     try:
-        for artist in artists:
-            artist_exist = db.query(Artist).filter(Artist.name == artist.name).first()
-            if artist_exist:
-                print(f"artist_exist.name: {artist_exist.name}")
-                artist_exists.append(artist_exist.name)
-                continue
-            new_artist = Artist(
-                name=artist.name,
-                description=artist.description,
-                artist_bio=artist.artist_bio,
-                gender=artist.gender,
-                origin_country=artist.origin_country,
-                date_of_birth=artist.date_of_birth,
-                date_of_died=artist.date_of_died,
-                wiki_qid=artist.wiki_qid,
-                ulan=artist.ulan,
-            )
-            new_artists.append(new_artist)
-
-        db.add_all(new_artists)
-        db.commit()
-        for i in range(0, len(new_artists)):
-            db.refresh(new_artists[i])
+        new_artists = []
+        artist_exists = []
+        for chunk in chunked(artists, 1000):
+            result = await artist_ingest.ingest_chunk(db, chunk, returning=listings.ARTIST_COLUMNS)
+            new_artists.extend(result.inserted)
+            artist_exists.extend(row["name"] for row in result.existing)
+        await db.commit()
         return {
             "message": "artist created successfully",
-            "data": {"new_artists": new_artists, "artist_exists": new_artists},
+            "data": {"new_artists": new_artists, "artist_exists": artist_exists},
         }
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
 
 
+# streamed NDJSON, one artist per line; answers with NDJSON progress per chunk
+@router.post("/create/artist/bulk")
+async def create_artist_bulk_(
+    request: Request,
+    chunk_size: int = Query(1000, ge=1, le=2000),
+):
+    return artist_ingest.StreamingDuplexResponse(
+        artist_ingest.ndjson_progress(request.stream(), AsyncSessionLocal, chunk_size),
+        media_type="application/x-ndjson",
+    )
+
+
+# CSV or Parquet catalog of art objects; invalid rows are skipped and reported
+@router.post("/import/catalog")
+async def import_catalog_(
+    file: UploadFile = File(...),
+    dry_run: bool = Form(False),
+):
+    try:
+        report = await asyncio.to_thread(catalog_import.import_catalog, file.file, file.filename, dry_run)
+        return {
+            "message": "catalog validated" if dry_run else "catalog imported",
+            "data": report,
+        }
+    except catalog_import.CatalogError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        print(e)
+        return {"message": f"something went wrong: {e}"}
+
+
 @router.post("/create/art_object/sculpture")
 async def create_sculpture_(
     title: str = Form("title"),
@@ -118,7 +167,7 @@ async def create_sculpture_(
     width: str = Form("100"),
     weight: str = Form("12gm"),
     files: list[UploadFile] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         object_type = ArtObjectType.SCULPTURE
@@ -139,8 +188,10 @@ async def create_sculpture_(
             width=width,
             weight=weight,
         )
-        # first creating art object
+        art_object_id = uuid4()
+        media = await staged_create.stage_media(art_object_id, "sculpture", files)
         new_art_object = ArtObject(
+            id=art_object_id,
             title=object.title,
             description=object.description,
             dimensions=object.dimensions,
@@ -152,30 +203,18 @@ async def create_sculpture_(
             year=object.year,
             artist_id=object.artist_id,
         )
-        db.add(new_art_object)
-        db.commit()
-        db.refresh(new_art_object)
-        results = []
-        if files:
-            for i, file in enumerate(files):
-                result = cloudinary.uploader.upload(
-                    file.file, public_id=f"{new_art_object.id}:img:{i}:_:sculpture"
-                )
-                results.append(result["secure_url"])
-        urls = json.dumps(results)
-
-        # now creating sculpture
         new_sculpture = Sculpture(
-            id=new_art_object.id,
+            id=art_object_id,
             material=object.material,
             height=object.height,
             width=object.width,
             weight=object.weight,
-            image=urls,
+            image=media.image,
+            image_variants=media.variants,
         )
-        db.add(new_sculpture)
-        db.commit()
-        db.refresh(new_sculpture)
+        # both rows in one transaction, after the uploads
+        await staged_create.commit_with_media(db, [new_art_object, new_sculpture], media)
+        urls = media.image
 
         data = {
             "artObjectId": new_art_object.id,
@@ -198,6 +237,8 @@ async def create_sculpture_(
             "message": "Sculpture Art Object created successfully",
             "data": data,
         }
+    except MediaUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
@@ -217,7 +258,7 @@ async def create_painting_(
     paint_type: str = Form("paint_type"),
     drawn_on: str = Form("drawn_on"),
     files: Annotated[list[UploadFile], File(description="upload images")] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         object_type = ArtObjectType.PAINTING
@@ -237,8 +278,10 @@ async def create_painting_(
             dimensions=dimensions,
         )
 
-        # first creating art object
+        art_object_id = uuid4()
+        media = await staged_create.stage_media(art_object_id, "painting", files)
         new_art_object = ArtObject(
+            id=art_object_id,
             title=object.title,
             description=object.description,
             dimensions=object.dimensions,
@@ -250,28 +293,16 @@ async def create_painting_(
             year=object.year,
             artist_id=object.artist_id,
         )
-        db.add(new_art_object)
-        db.commit()
-        db.refresh(new_art_object)
-
-        results = []
-        for i, file in enumerate(files):
-            result = cloudinary.uploader.upload(
-                file.file, public_id=f"{new_art_object.id}:img:{i}:_:painting"
-            )
-            results.append(result["secure_url"])
-        urls = json.dumps(results)
-
-        # now creating sculpture
         new_painting = Painting(
-            id=new_art_object.id,
+            id=art_object_id,
             paint_type=object.paint_type,
             drawn_on=object.drawn_on,
-            image=urls,
+            image=media.image,
+            image_variants=media.variants,
         )
-        db.add(new_painting)
-        db.commit()
-        db.refresh(new_painting)
+        # both rows in one transaction, after the uploads
+        await staged_create.commit_with_media(db, [new_art_object, new_painting], media)
+        urls = media.image
 
         data = {
             "artObjectId": new_art_object.id,
@@ -292,6 +323,8 @@ async def create_painting_(
             "message": "Sculpture Art Object created successfully",
             "data": data,
         }
+    except MediaUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
@@ -310,7 +343,7 @@ async def create_other_(
     artist_id: str = Form(""),
     other_art_type: str = Form("other_art_type"),
     files: Annotated[list[UploadFile], File(description="upload images")] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         object_type = ArtObjectType.OTHER
@@ -328,8 +361,10 @@ async def create_other_(
             type=other_art_type,
         )
 
-        # first creating art object
+        art_object_id = uuid4()
+        media = await staged_create.stage_media(art_object_id, "other_art", files)
         new_art_object = ArtObject(
+            id=art_object_id,
             title=object.title,
             description=object.description,
             dimensions=object.dimensions,
@@ -341,22 +376,12 @@ async def create_other_(
             year=object.year,
             artist_id=object.artist_id,
         )
-        db.add(new_art_object)
-        db.commit()
-        db.refresh(new_art_object)
-
-        results = []
-        for i, file in enumerate(files):
-            result = cloudinary.uploader.upload(
-                file.file, public_id=f"{new_art_object.id}:img:{i}:_:other_art"
-            )
-            results.append(result["secure_url"])
-        urls = json.dumps(results)
-        # now creating sculpture
-        new_other_art = OtherArt(id=new_art_object.id, type=object.type, image=urls)
-        db.add(new_other_art)
-        db.commit()
-        db.refresh(new_other_art)
+        new_other_art = OtherArt(
+            id=art_object_id, type=object.type, image=media.image, image_variants=media.variants
+        )
+        # both rows in one transaction, after the uploads
+        await staged_create.commit_with_media(db, [new_art_object, new_other_art], media)
+        urls = media.image
 
         data = {
             "artObjectId": new_art_object.id,
@@ -376,6 +401,8 @@ async def create_other_(
             "message": f"{object_type} Art Object created successfully",
             "data": data,
         }
+    except MediaUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
@@ -408,53 +435,39 @@ async def create_new_collection_(
 @router.post("/create/collection/borrowed")
 async def create_borrowed_collection_(
     collections: list[BorrowedArtObjectBaseCreate],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    table = BorrowedArtObject.__table__
     try:
-        collection_list = []
-        for collection in collections:
-            new_collection = BorrowedArtObject(
-                date_borrowed=collection.date_borrowed,
-                date_returned=collection.date_returned,
-                art_object_id=collection.art_object_id,
-                collection_id=collection.collection_id,
-            )
-            collection_list.append(new_collection)
-
-        db.add_all(collection_list)
-        db.commit()
-        for i in range(0, len(collection_list)):
-            db.refresh(collection_list[i])
-        return {"message": "Borrowed collections created successfully"}
-    except Exception as e:
+        created = await insert_returning_chunks(
+            db, table, [collection.model_dump() for collection in collections], [table.c.id]
+        )
+        return {
+            "message": "Borrowed collections created successfully",
+            "data": {"ids": [row.id for row in created]},
+        }
+    except BulkInsertError as e:
         print(e)
-        return {"message": f"something went wrong: {e}"}
+        return {"message": f"something went wrong: {e}", "data": {"ids": [row.id for row in e.created]}}
 
 
 @router.post("/create/collection/permanent")
 async def create_permanent_collection_(
     collections: list[PermanentCollectionCreate],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    table = PermanentCollection.__table__
     try:
-        collection_list = []
-        for collection in collections:
-            new_collection = PermanentCollection(
-                date_acquired=collection.date_acquired,
-                status=collection.status,
-                cost=collection.cost,
-                art_object_id=collection.art_object_id,
-            )
-            collection_list.append(new_collection)
-
-        db.add_all(collection_list)
-        db.commit()
-        for i in range(0, len(collection_list)):
-            db.refresh(collection_list[i])
-        return {"message": "Permanent collections created successfully"}
-    except Exception as e:
+        created = await insert_returning_chunks(
+            db, table, [collection.model_dump() for collection in collections], [table.c.id]
+        )
+        return {
+            "message": "Permanent collections created successfully",
+            "data": {"ids": [row.id for row in created]},
+        }
+    except BulkInsertError as e:
         print(e)
-        return {"message": f"something went wrong: {e}"}
+        return {"message": f"something went wrong: {e}", "data": {"ids": [row.id for row in e.created]}}
 
 
 @router.post("/create/exhibition")
@@ -463,31 +476,27 @@ async def create_exhibition_(
     start_date: str = Form(datetime.datetime.date(datetime.datetime.now())),
     end_date: str = Form(datetime.datetime.date(datetime.datetime.now())),
     files: Annotated[list[UploadFile], File(description="upload images")] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         exhibition = ExhibitionCreate(
             name=name, start_date=start_date, end_date=end_date
         )
         exhibition_id = uuid4()
-        results = []
-        for i, file in enumerate(files):
-            result = cloudinary.uploader.upload(
-                file.file, public_id=f"{exhibition_id}:img:{i}:_:exhibition"
-            )
-            results.append(result["secure_url"])
-        urls = json.dumps(results)
+        media = await staged_create.stage_media(exhibition_id, "exhibition", files)
         new_exhibition = Exhibition(
+            id=exhibition_id,
             name=exhibition.name,
             start_date=exhibition.start_date,
             end_date=exhibition.end_date,
-            image=urls,
+            image=media.image,
+            image_variants=media.variants,
         )
 
-        db.add(new_exhibition)
-        db.commit()
-        db.refresh(new_exhibition)
+        await staged_create.commit_with_media(db, [new_exhibition], media)
         return {"message": f"Exhibition created successfully", "data": new_exhibition}
+    except MediaUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
@@ -496,87 +505,111 @@ async def create_exhibition_(
 @router.post("/create/exhibition/upload_data")
 async def create_exhibition_association_(
     exhibitions: list[ExhibitionArtObjectAssociationCreate],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    table = ExhibitionArtObjectAssociation.__table__
+    returning = [table.c.exhibition_id, table.c.art_object_id]
     try:
-        exhibition_list = []
-        for exhibition in exhibitions:
-            new_exhibition = ExhibitionArtObjectAssociation(
-                art_object_id=exhibition.art_object_id,
-                exhibition_id=exhibition.exhibition_id,
-            )
-            exhibition_list.append(new_exhibition)
+        created = await insert_returning_chunks(
+            db, table, [exhibition.model_dump() for exhibition in exhibitions], returning
+        )
+        return {
+            "message": "Exhibitions data uploaded successfully",
+            "data": {"created": [dict(row._mapping) for row in created]},
+        }
+    except BulkInsertError as e:
+        print(e)
+        return {
+            "message": f"something went wrong: {e}",
+            "data": {"created": [dict(row._mapping) for row in e.created]},
+        }
 
-        db.add_all(exhibition_list)
-        db.commit()
-        for i in range(0, len(exhibition_list)):
-            db.refresh(exhibition_list[i])
-        return {"message": "Exhibitions data uploaded successfully"}
+
+# idempotent: the body is the full desired membership, not a list of additions
+@router.put("/sync/exhibition/art_objects/{exhibition_id}")
+async def sync_exhibition_art_objects_(
+    exhibition_id: UUID,
+    membership: ExhibitionMembershipSync,
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        if await db.get(Exhibition, exhibition_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Exhibition not found")
+        changes = await exhibition_membership.sync_members(db, exhibition_id, membership.art_object_ids)
+        await db.commit()
+        return {"message": "Exhibition art objects synced successfully", "data": changes}
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
 
 
-@router.get("/get/artist/all/{skip}/{limit}")
+@router.get("/get/artist/all/{skip}/{limit}", response_model=ArtistPage)
 async def get_artist_(
-    
-   sort_by_dob: bool = Query(True),
+    request: Request,
+    response: Response,
+    sort_by_dob: bool = Query(True),
     sort_by_name: bool = Query(True),
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    db: AsyncSession = Depends(get_async_db)
     ):
     try:
-        if sort_by_dob:
-            query = (
-                db.query(Artist).order_by(Artist.date_of_birth)
-            )
-        else:
-            query = (
-                db.query(Artist).order_by(Artist.date_of_birth.desc())
-            )
-        if sort_by_name:
-            query = query.order_by(Artist.name)
-        else:
-            query = query.order_by(Artist.name.desc())
-        artists = query.offset(skip).limit(limit).all()
+        keyset = Keyset(Artist.id, (Artist.date_of_birth, not sort_by_dob), (Artist.name, not sort_by_name))
+        artists, next_cursor = await listings.artists(db, keyset, limit, cursor=cursor, offset=skip)
+        headers = conditional.validators(
+            request, [(artist.id, artist.updated_at) for artist in artists] + [(next_cursor,)], last_modified=False
+        )
+        not_modified = conditional.respond(request, response, headers)
+        if not_modified is not None:
+            return not_modified
 
-        return {"message": "Artists fetched successfully", "data": artists}
+        return ORJSONResponse(
+            {"message": "Artists fetched successfully", "data": artists, "next_cursor": next_cursor}, headers=headers
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}", "data": []}
 
 
 @router.get("/get/artist/id/{artist_id}")
-async def get_artist_(artist_id: str, db: Session = Depends(get_db)):
+async def get_artist_(artist_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     try:
-        artists_exist = db.query(Artist).filter(Artist.id == artist_id).first()
+        versions = (await db.execute(select(Artist.id, Artist.updated_at).where(Artist.id == UUID(artist_id)))).all()
+        if versions:
+            not_modified = conditional.check(request, response, versions)
+            if not_modified is not None:
+                return not_modified
+        artists_exist = await db.get(Artist, UUID(artist_id))
         if artists_exist is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Artist not found"
             )
-        return {"message": "Artists fetched successfully", "data": artists_exist}
+        return {"message": "Artists fetched successfully", "data": _artist_dict(artists_exist)}
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
 @router.get("/get/artist/all/ids")
-async def get_artist_ids_(db: Session = Depends(get_db)):
+async def get_artist_ids_(db: AsyncSession = Depends(get_async_db)):
     try:
         # Query to get all artist IDs
-            ids = db.query(Artist.id).all()
-            return {"data": [id[0] for id in ids]}
+            ids = (await db.scalars(select(Artist.id))).all()
+            return {"data": ids}
 
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
-# search artist by name
+# search artist by name, tolerating typos; best matches first
 @router.get("/get/artist/name/{artist_name}")
-async def get_artist_(artist_name: str, db: Session = Depends(get_db)):
+async def get_artist_(artist_name: str, db: AsyncSession = Depends(get_async_db)):
     try:
-        artists = (
-            db.query(Artist).filter(Artist.name.like(f"%{artist_name}%")).limit(5).all()
-        )
-        return {"message": "Artists fetched successfully", "data": artists}
+        hits = await fuzzy_match.match(db, "artist", artist_name, limit=5)
+        artists = await fuzzy_match.load(db, Artist, hits)
+        return {"message": "Artists fetched successfully", "data": [_artist_dict(artist) for artist in artists]}
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
@@ -584,21 +617,31 @@ async def get_artist_(artist_name: str, db: Session = Depends(get_db)):
 
 @router.get("/get/art_object/artist/all/{artist_id}")
 async def get_artist_data(
-    artist_id: str,  db: Session = Depends(get_db)
+    artist_id: str,
+    request: Request,
+    response: Response,
+    image_size: ImageSize = Query(ImageSize.THUMBNAIL),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-     
 
-        artist_exist = db.query(Artist).filter(Artist.id == artist_id).first()
+
+        artist_exist = await db.get(Artist, UUID(artist_id))
         if artist_exist is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Artist not found"
             )
+        # art objects can move to another artist, so no Last-Modified
+        versions = [(artist_exist.id, artist_exist.updated_at)]
+        versions += (await db.execute(_art_object_versions(ArtObject.artist_id == artist_exist.id))).all()
+        not_modified = conditional.check(request, response, versions, last_modified=False)
+        if not_modified is not None:
+            return not_modified
 
         # Query for ArtObjects by artist_id with joined loading of related types
         art_objects_query = (
-            db.query(ArtObject)
-            .filter(ArtObject.artist_id == artist_id)
+            select(ArtObject)
+            .where(ArtObject.artist_id == artist_exist.id)
             .options(
                 joinedload(ArtObject.sculpture),
                 joinedload(ArtObject.painting),
@@ -607,7 +650,7 @@ async def get_artist_data(
             )
         )
 
-        art_objects = art_objects_query.all()
+        art_objects = (await db.scalars(art_objects_query)).all()
         if art_objects is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="ArtObjects not found"
@@ -615,184 +658,156 @@ async def get_artist_data(
         data = []
         for art_object in art_objects:
             if art_object.object_type == ArtObjectType.SCULPTURE and not art_object.sculpture.image is  None:
-                
+
                 data.append(
                     {
                     "id": art_object.id,
                     "object_type": art_object.object_type,
-                    "image": art_object.sculpture.image,
+                    "image": image_variants.select_image(
+                        art_object.sculpture.image, art_object.sculpture.image_variants, image_size
+                    ),
                     }
             )
             elif art_object.object_type == ArtObjectType.PAINTING and not art_object.painting.image is  None:
-                
+
                 data.append(
                     {
                     "id": art_object.id,
                     "object_type": art_object.object_type,
-                    "image": art_object.painting.image,
+                    "image": image_variants.select_image(
+                        art_object.painting.image, art_object.painting.image_variants, image_size
+                    ),
                     }
             )
             elif art_object.object_type == ArtObjectType.OTHER and not art_object.other.image is  None:
-                
+
                 data.append(
                     {
                     "id": art_object.id,
                     "object_type": art_object.object_type,
-                    "image": art_object.other.image,
+                    "image": image_variants.select_image(
+                        art_object.other.image, art_object.other.image_variants, image_size
+                    ),
                     }
             )
-        
-        
-        
-        return {"art_objects": data, "artist":artist_exist}
+
+
+
+        return {"art_objects": data, "artist": _artist_dict(artist_exist)}
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
 
 
-@router.get("/get/art_object/sculpture/all/{skip}/{limit}")
+@router.get("/get/art_object/sculpture/all/{skip}/{limit}", response_model=SculpturePage)
 async def get_sculpture_all_(
+    request: Request,
+    response: Response,
     sort_data_asc: bool = Query(True),
     sort_data_title: bool = Query(True),
+    image_size: ImageSize = Query(ImageSize.THUMBNAIL),
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        if sort_data_asc:
-            art_objects_query = (
-                db.query(ArtObject)
-                .options(joinedload(ArtObject.sculpture))
-                .filter(ArtObject.sculpture != None)
-                .order_by(ArtObject.year)
-            )
-        else:
-            art_objects_query = (
-                db.query(ArtObject)
-                .options(joinedload(ArtObject.sculpture))
-                .filter(ArtObject.sculpture != None)
-                .order_by(ArtObject.year.desc())
-            )
-        if sort_data_title:
-            art_objects_query = art_objects_query.order_by(ArtObject.title)
-        else:
-            art_objects_query = art_objects_query.order_by(ArtObject.title.desc())
-
-        art_objects = art_objects_query.offset(skip).limit(limit).all()
-
-        return {"message": "Sculpture fetched successfully", "data": art_objects}
+        keyset = Keyset(ArtObject.id, (ArtObject.year, not sort_data_asc), (ArtObject.title, not sort_data_title))
+        art_objects, next_cursor = await listings.art_objects(
+            db, "sculpture", keyset, limit, image_size, cursor=cursor, offset=skip
+        )
+        versions = [(x.id, x.updated_at, x.sculpture.updated_at) for x in art_objects] + [(next_cursor,)]
+        headers = conditional.validators(request, versions, last_modified=False)
+        not_modified = conditional.respond(request, response, headers)
+        if not_modified is not None:
+            return not_modified
+
+        return ORJSONResponse(
+            {"message": "Sculpture fetched successfully", "data": art_objects, "next_cursor": next_cursor}, headers=headers
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}", "data": []}
 
 
-@router.get("/get/art_object/painting/all/{skip}/{limit}")
+@router.get("/get/art_object/painting/all/{skip}/{limit}", response_model=PaintingPage)
 async def get_painting_all_(
+    request: Request,
+    response: Response,
     sort_data_asc: bool = Query(True),
     sort_data_title: bool = Query(True),
+    image_size: ImageSize = Query(ImageSize.THUMBNAIL),
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        if sort_data_asc:
-            art_objects_query = (
-                db.query(ArtObject)
-                .options(joinedload(ArtObject.painting))
-                .filter(ArtObject.painting != None)
-                .order_by(ArtObject.year)
-            )
-        else:
-            art_objects_query = (
-                db.query(ArtObject)
-                .options(joinedload(ArtObject.painting))
-                .filter(ArtObject.painting != None)
-                .order_by(ArtObject.year.desc())
-            )
-        if sort_data_title:
-            art_objects_query = art_objects_query.order_by(ArtObject.title)
-        else:
-            art_objects_query = art_objects_query.order_by(ArtObject.title.desc())
-
-        art_objects = art_objects_query.offset(skip).limit(limit).all()
-
-        return {"message": "Paintings fetched successfully", "data": art_objects}
+        keyset = Keyset(ArtObject.id, (ArtObject.year, not sort_data_asc), (ArtObject.title, not sort_data_title))
+        art_objects, next_cursor = await listings.art_objects(
+            db, "painting", keyset, limit, image_size, cursor=cursor, offset=skip
+        )
+        versions = [(x.id, x.updated_at, x.painting.updated_at) for x in art_objects] + [(next_cursor,)]
+        headers = conditional.validators(request, versions, last_modified=False)
+        not_modified = conditional.respond(request, response, headers)
+        if not_modified is not None:
+            return not_modified
+
+        return ORJSONResponse(
+            {"message": "Paintings fetched successfully", "data": art_objects, "next_cursor": next_cursor}, headers=headers
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}", "data": []}
 
 
-@router.get("/get/art_object/other_art/all/{skip}/{limit}")
+@router.get("/get/art_object/other_art/all/{skip}/{limit}", response_model=OtherArtPage)
 async def get_other_art_all_(
+    request: Request,
+    response: Response,
     sort_data_asc: bool = Query(True),
     sort_data_title: bool = Query(True),
+    image_size: ImageSize = Query(ImageSize.THUMBNAIL),
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        if sort_data_asc:
-            art_objects_query = (
-                db.query(ArtObject)
-                .options(joinedload(ArtObject.other))
-                .filter(ArtObject.other != None)
-                .order_by(ArtObject.year)
-            )
-        else:
-            art_objects_query = (
-                db.query(ArtObject)
-                .options(joinedload(ArtObject.other))
-                .filter(ArtObject.other != None)
-                .order_by(ArtObject.year.desc())
-            )
-        if sort_data_title:
-            art_objects_query = art_objects_query.order_by(ArtObject.title)
-        else:
-            art_objects_query = art_objects_query.order_by(ArtObject.title.desc())
-
-        art_objects = art_objects_query.offset(skip).limit(limit).all()
-
-        return {"message": "Paintings fetched successfully", "data": art_objects}
+        keyset = Keyset(ArtObject.id, (ArtObject.year, not sort_data_asc), (ArtObject.title, not sort_data_title))
+        art_objects, next_cursor = await listings.art_objects(
+            db, "other", keyset, limit, image_size, cursor=cursor, offset=skip
+        )
+        versions = [(x.id, x.updated_at, x.other.updated_at) for x in art_objects] + [(next_cursor,)]
+        headers = conditional.validators(request, versions, last_modified=False)
+        not_modified = conditional.respond(request, response, headers)
+        if not_modified is not None:
+            return not_modified
+
+        return ORJSONResponse(
+            {"message": "Paintings fetched successfully", "data": art_objects, "next_cursor": next_cursor}, headers=headers
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}", "data": []}
 
 
-# searching paintings with name
+# searching art objects by title, tolerating typos; best matches first
 @router.get("/get/paintings/name/")
 async def get_painting_by_name_(
     painting_name: str = Query(""),
     art_object_type: ArtObjectType = Query(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        if art_object_type.value == "sculpture":
-            query = (
-                db.query(ArtObject)
-                .filter(ArtObject.object_type == ArtObjectType.SCULPTURE)
-                .filter(ArtObject.title.ilike(f"%{painting_name}%"))
-            )
-
-        elif art_object_type.value == "painting":
-            query = (
-                db.query(ArtObject)
-                .filter(ArtObject.object_type == ArtObjectType.PAINTING)
-                .filter(ArtObject.title.ilike(f"%{painting_name}%"))
-            )
-
-        elif art_object_type.value == "other":
-            query = (
-                db.query(ArtObject)
-                .filter(ArtObject.object_type == ArtObjectType.OTHER)
-                .filter(ArtObject.title.ilike(f"%{painting_name}%"))
-            )
-
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid object type"
-            )
-
-        data = query.limit(5).all()
+        hits = await fuzzy_match.match(db, "art_object", painting_name, limit=5, object_type=art_object_type)
+        data = await fuzzy_match.load(db, ArtObject, hits)
         return {"message": "Painting fetched successfully", "data": data}
     except Exception as e:
         print(e)
@@ -801,14 +816,15 @@ async def get_painting_by_name_(
 
 # search exhibition by name
 @router.get("/get/exhibitions/name/{exhibition_name}")
-async def get_exhibitions_by_name_(exhibition_name: str, db: Session = Depends(get_db)):
+async def get_exhibitions_by_name_(exhibition_name: str, db: AsyncSession = Depends(get_async_db)):
     try:
         exhibitions = (
-            db.query(Exhibition)
-            .filter(Exhibition.name.like(f"%{exhibition_name}%"))
-            .limit(5)
-            .all()
-        )
+            await db.scalars(
+                select(Exhibition)
+                .where(Exhibition.name.like(f"%{exhibition_name}%"))
+                .limit(5)
+            )
+        ).all()
         return {"message": "Exhibitions fetched successfully", "data": exhibitions}
     except Exception as e:
         print(e)
@@ -817,12 +833,16 @@ async def get_exhibitions_by_name_(exhibition_name: str, db: Session = Depends(g
 
 @router.get("/get/exhibitions/")
 async def get_exhibitions_by_id_(
-    exhibition_id: str=Query(""), db: Session = Depends(get_db)):
+    request: Request, response: Response, exhibition_id: str=Query(""), db: AsyncSession = Depends(get_async_db)):
     try:
-        exhibition = (
-            db.query(Exhibition)
-            .filter(Exhibition.id==exhibition_id).first()
-        )
+        versions = (
+            await db.execute(select(Exhibition.id, Exhibition.updated_at).where(Exhibition.id == UUID(exhibition_id)))
+        ).all()
+        if versions:
+            not_modified = conditional.check(request, response, versions)
+            if not_modified is not None:
+                return not_modified
+        exhibition = await db.get(Exhibition, UUID(exhibition_id))
         return {"message": "Exhibition fetched successfully", "data": exhibition}
     except Exception as e:
         print(e)
@@ -832,42 +852,41 @@ async def get_exhibitions_by_id_(
 
 @router.get("/get/exhibitions/all/ids")
 async def get_exhibitions_ids_(
-     db: Session = Depends(get_db)):
+     db: AsyncSession = Depends(get_async_db)):
     try:
-        query = db.query(Exhibition.id).all()
-        ids = [id[0] for id in query]
-        return {"data":ids} 
+        ids = (await db.scalars(select(Exhibition.id))).all()
+        return {"data":ids}
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}"}
 
-@router.get("/get/exhibitions/all/{skip}/{limit}")
+@router.get("/get/exhibitions/all/{skip}/{limit}", response_model=ExhibitionPage)
 async def get_exhibitions_all_(
+    request: Request,
+    response: Response,
     sort_data_asc: bool = Query(True),
     sort_data_title: bool = Query(True),
+    image_size: ImageSize = Query(ImageSize.THUMBNAIL),
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        if sort_data_asc:
-            exhibitions_query = (
-                db.query(Exhibition
-                ).order_by(Exhibition.end_date)
-            )
-        else:
-            exhibitions_query = (
-                db.query(Exhibition
-                ).order_by(Exhibition.end_date.desc())
-            )
-        if sort_data_title:
-            exhibitions_query = exhibitions_query.order_by(Exhibition.name)
-        else:
-            exhibitions_query = exhibitions_query.order_by(Exhibition.name.desc())
-
-        exhibitions = exhibitions_query.offset(skip).limit(limit).all()
+        keyset = Keyset(Exhibition.id, (Exhibition.end_date, not sort_data_asc), (Exhibition.name, not sort_data_title))
+        exhibitions, next_cursor = await listings.exhibitions(db, keyset, limit, image_size, cursor=cursor, offset=skip)
+        headers = conditional.validators(
+            request, [(x.id, x.updated_at) for x in exhibitions] + [(next_cursor,)], last_modified=False
+        )
+        not_modified = conditional.respond(request, response, headers)
+        if not_modified is not None:
+            return not_modified
 
-        return {"message": "Paintings fetched successfully", "data": exhibitions}
+        return ORJSONResponse(
+            {"message": "Paintings fetched successfully", "data": exhibitions, "next_cursor": next_cursor}, headers=headers
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(e)
         return {"message": f"something went wrong: {e}", "data": []}
@@ -876,47 +895,64 @@ async def get_exhibitions_all_(
 
 @router.get("/get/exhibitions/art_object/{exhibition_id}")
 async def get_exhibitions_(
-    exhibition_id: str, db: Session = Depends(get_db)
+    exhibition_id: str,
+    request: Request,
+    response: Response,
+    image_size: ImageSize = Query(ImageSize.THUMBNAIL),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
 
-        exhibition_exist = (
-            db.query(Exhibition).filter(Exhibition.id == exhibition_id).first()
-        )
+        exhibition_exist = await db.get(Exhibition, UUID(exhibition_id))
         if exhibition_exist is None:
             return {"message": "Exhibition not found"}
-        exhibition_data = (
-            db.query(ExhibitionArtObjectAssociation)
-            .filter(ExhibitionArtObjectAssociation.exhibition_id == exhibition_id).all()
+        # membership changes bump the exhibition's updated_at
+        members = select(ExhibitionArtObjectAssociation.art_object_id).where(
+            ExhibitionArtObjectAssociation.exhibition_id == exhibition_exist.id
         )
+        versions = [(exhibition_exist.id, exhibition_exist.updated_at)]
+        versions += (await db.execute(_art_object_versions(ArtObject.id.in_(members)))).all()
+        not_modified = conditional.check(request, response, versions)
+        if not_modified is not None:
+            return not_modified
         art_object_data = (
-            db.query(ArtObject
-            ).options(joinedload(ArtObject.sculpture), joinedload(ArtObject.painting), joinedload(ArtObject.other)
-            ).filter(ArtObject.id.in_([x.art_object_id for x in exhibition_data]))
-            .all()
-        )
+            await db.scalars(
+                select(ArtObject
+                ).options(joinedload(ArtObject.sculpture), joinedload(ArtObject.painting), joinedload(ArtObject.other)
+                ).where(ArtObject.id.in_(
+                    select(ExhibitionArtObjectAssociation.art_object_id)
+                    .where(ExhibitionArtObjectAssociation.exhibition_id == exhibition_exist.id)
+                ))
+            )
+        ).all()
         temp_list = []
         for data in art_object_data:
             if data.object_type == ArtObjectType.SCULPTURE and not data.sculpture is None:
                 temp_list.append({
                     "id":data.id,
                     "object_type":data.object_type,
-                    "image":data.sculpture.image            
+                    "image":image_variants.select_image(
+                        data.sculpture.image, data.sculpture.image_variants, image_size
+                    ),
                     })
-            elif data.object_type == ArtObjectType.PAINTING and not data.painting is None: 
+            elif data.object_type == ArtObjectType.PAINTING and not data.painting is None:
                 temp_list.append({
                     "id":data.id,
                     "object_type":data.object_type,
-                    "image":data.painting.image            
+                    "image":image_variants.select_image(
+                        data.painting.image, data.painting.image_variants, image_size
+                    ),
                     })
             elif data.object_type == ArtObjectType.OTHER and not data.other is None:
                 temp_list.append({
                     "id":data.id,
                     "object_type":data.object_type,
-                    "image":data.other.image            
+                    "image":image_variants.select_image(
+                        data.other.image, data.other.image_variants, image_size
+                    ),
                     })
-        
-        data = {"exhibition": exhibition_exist, 
+
+        data = {"exhibition": exhibition_exist,
                 "art_objects":temp_list}
         return {"message": "Exhibitions found successfully", "data": data}
     except Exception as e:
@@ -926,13 +962,18 @@ async def get_exhibitions_(
 
 @router.get("/get/collections/permanent/{permanents_id}/{skip}/{limit}")
 async def get_permanent_collection_(
-    permanents_id: str, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)
+    permanents_id: str,
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
         permanent_collections = (
-            (
-                db.query(PermanentCollection)
-                .filter(PermanentCollection.id == permanents_id)
+            await db.scalars(
+                select(PermanentCollection)
+                .where(PermanentCollection.id == UUID(permanents_id))
                 .options(
                     joinedload(PermanentCollection.art_object).joinedload(
                         ArtObject.sculpture
@@ -944,11 +985,18 @@ async def get_permanent_collection_(
                         ArtObject.other
                     ),
                 )
+                .offset(skip)
+                .limit(limit)
             )
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+        ).all()
+        versions = []
+        for permanent_collection in permanent_collections:
+            art_object = permanent_collection.art_object
+            versions.append((permanent_collection.id, permanent_collection.updated_at, art_object.id, art_object.updated_at))
+            versions += [(row.id, row.updated_at) for row in (art_object.sculpture, art_object.painting, art_object.other) if row]
+        not_modified = conditional.check(request, response, versions, last_modified=False)
+        if not_modified is not None:
+            return not_modified
         art_objects = {"sculpture": [], "painting": [], "other": []}
         for permanent_collection in permanent_collections:
 
@@ -974,33 +1022,31 @@ async def get_permanent_collection_(
 # get art object by id
 @router.get("/get/art_object/")
 async def get_art_object_by_id_(
+    request: Request,
+    response: Response,
     object_type: ArtObjectType = Query(""),
     art_object_id: str = Query(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
+        versions = (await db.execute(_art_object_versions(ArtObject.id == UUID(art_object_id)))).all()
+        if versions:
+            not_modified = conditional.check(request, response, versions)
+            if not_modified is not None:
+                return not_modified
         if object_type == ArtObjectType.SCULPTURE:
-            art_object = (
-                db.query(ArtObject)
-                .filter(ArtObject.id == art_object_id)
-                .options(joinedload(ArtObject.sculpture))
-                .first()
+            art_object = await db.get(
+                ArtObject, UUID(art_object_id), options=[joinedload(ArtObject.sculpture)]
             )
 
         elif object_type == ArtObjectType.PAINTING:
-            art_object = (
-                db.query(ArtObject)
-                .filter(ArtObject.id == art_object_id)
-                .options(joinedload(ArtObject.painting))
-                .first()
+            art_object = await db.get(
+                ArtObject, UUID(art_object_id), options=[joinedload(ArtObject.painting)]
             )
 
         elif object_type == ArtObjectType.OTHER:
-            art_object = (
-                db.query(ArtObject)
-                .filter(ArtObject.id == art_object_id)
-                .options(joinedload(ArtObject.other))
-                .first()
+            art_object = await db.get(
+                ArtObject, UUID(art_object_id), options=[joinedload(ArtObject.other)]
             )
 
         if art_object is None:
@@ -1023,26 +1069,26 @@ async def get_art_object_by_id_(
 # for fetching paths of all art id of art object
 @router.get("/get/art_object/id/all")
 async def get_painting_object_path_(
-    object_type: ArtObjectType = Query(""), db: Session = Depends(get_db)
+    object_type: ArtObjectType = Query(""), db: AsyncSession = Depends(get_async_db)
 ):
     try:
         if object_type == ArtObjectType.SCULPTURE:
-            art_object_ids = db.query(ArtObject.id).filter(
+            art_object_ids = select(ArtObject.id).where(
                 ArtObject.object_type == ArtObjectType.SCULPTURE
             )
         elif object_type == ArtObjectType.PAINTING:
-            art_object_ids = db.query(ArtObject.id).filter(
+            art_object_ids = select(ArtObject.id).where(
                 ArtObject.object_type == ArtObjectType.PAINTING
             )
         elif object_type == ArtObjectType.OTHER:
-            art_object_ids = db.query(ArtObject.id).filter(
+            art_object_ids = select(ArtObject.id).where(
                 ArtObject.object_type == ArtObjectType.OTHER
             )
         else:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid object type"
             )
-        ids = [id[0] for id in art_object_ids.all()]
+        ids = (await db.scalars(art_object_ids)).all()
         return {"data": ids}
     except Exception as e:
         print(e)
@@ -1053,28 +1099,23 @@ async def get_painting_object_path_(
 # fetch homepage data
 @router.get("/get/homepage/data")
 async def get_homepage_data_(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    image_size: ImageSize = Query(ImageSize.THUMBNAIL),
+    db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        sculpture_data = db.query(ArtObject).options(
-            joinedload(ArtObject.sculpture)
-            ).filter(ArtObject.sculpture !=None
-            ).order_by(ArtObject.year).limit(10).all()
-        painting_data = db.query(ArtObject).options(
-            joinedload(ArtObject.painting)
-            ).filter(ArtObject.painting !=None
-            ).order_by(ArtObject.year).limit(10).all()
-        other_data = db.query(ArtObject).options(
-            joinedload(ArtObject.other)
-            ).filter(ArtObject.other !=None
-            ).order_by(ArtObject.year).limit(10).all()
-        exhibition_data = db.query(Exhibition).order_by(Exhibition.end_date).limit(5).all()
-        
-        
-
-        data = {"sculpture_data":sculpture_data,"painting_data":painting_data,"other_data":other_data,"exhibition_data":exhibition_data}
-        
-        return {"message": "Home page data fetched successfully", "data": data}
+        snapshot = homepage_snapshot.get(image_size)
+        if snapshot is not None:
+            body, headers = snapshot
+            not_modified = conditional.respond(request, response, headers)
+            if not_modified is not None:
+                return not_modified
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        # no snapshot yet: query like before
+        rows = await homepage.load(db)
+        return {"message": homepage.MESSAGE, "data": homepage.serialize(rows, image_size)}
     except Exception as e:
         print(e)
-        return {"message": f"something went wrong: {e}"}
\ No newline at end of file
+        return {"message": f"something went wrong: {e}"}
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from db.database import get_async_db
+from db.models.data_types import SearchKind
+from services import search
+from services.autocomplete import autocomplete_index
+
+
+router = APIRouter()
+
+
+# ranked full-text search; matches are wrapped in <mark> in title and snippet
+@router.get("/search")
+async def search_(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[List[SearchKind]] = Query(None),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        kinds = [k.value for k in kind] if kind else None
+        hits = await search.search(db, q, kinds, limit=limit + 1, offset=offset)
+        return {
+            "message": "Search results fetched successfully",
+            "data": hits[:limit],
+            "next_offset": offset + limit if len(hits) > limit else None,
+        }
+    except Exception as e:
+        print(e)
+        return {"message": f"something went wrong: {e}", "data": []}
+
+
+# keystroke suggestions from the in-memory prefix index; never touches the database
+@router.get("/autocomplete")
+async def autocomplete_(
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Optional[List[SearchKind]] = Query(None),
+    limit: int = Query(10, ge=1, le=20),
+):
+    try:
+        if not autocomplete_index.ready:
+            return {"message": "Autocomplete index is still loading", "data": []}
+        kinds = [k.value for k in kind] if kind else None
+        return {"message": "Suggestions fetched successfully", "data": autocomplete_index.suggest(q, kinds, limit)}
+    except Exception as e:
+        print(e)
+        return {"message": f"something went wrong: {e}", "data": []}
@@ -2,13 +2,18 @@ from fastapi import Response,Request,Form,Query, Depends, HTTPException, status,
 from sqlalchemy.orm import Session
 import json
 from db.database import get_db
+from db.replicas import read_from_primary
 import  utils
 from schemas.person import PersonLogin, PersonSignup, PersonUpdate, PersonImage, UserValidateToken
 from db.models.person import User, Admin, Manager
 from fastapi.responses import Response
-import cloudinary.uploader
 from fastapi.responses import JSONResponse
 from db.models.data_types import Role 
+from services import jobs, password_hashing
+from services.media import MediaUnavailable, media_service
+from services.storage import media_key
+from services.session_tokens import SessionClaims, get_account_session, get_optional_session, issue_session_token
+from typing import Optional
 
 
 
@@ -16,9 +21,6 @@ from db.models.data_types import Role
 router = APIRouter()
 
 
-auth_token_file_name = 'app/temp/auth_tokens.npy'
-
-
 
 @router.post("/login")
 async def login(person: PersonLogin,  db: Session = Depends(get_db)):
@@ -29,11 +31,15 @@ async def login(person: PersonLogin,  db: Session = Depends(get_db)):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Invalid Credentials"
             )
-        if person_exist.password != person.password:
+        if not await password_hashing.verify_password(person.password, person_exist.password):
             raise HTTPException(
-                status_code=status.HTTP_401_NOT_FOUND,
+                status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="email or password is invalid",
             )
+        new_hash = await password_hashing.rehash_if_needed(person.password, person_exist.password)
+        if new_hash is not None:
+            person_exist.password = new_hash
+            db.commit()
 
        
         data = {
@@ -42,13 +48,20 @@ async def login(person: PersonLogin,  db: Session = Depends(get_db)):
             "username": person_exist.username,
             "isAuth":person_exist.is_auth,
             "role": person.role.value,
-            "profileImage":person_exist.image
+            "profileImage":person_exist.image,
+            "accessToken": issue_session_token(person_exist.id, person.role),
         }
 
 
         return {"message": "user login successfully", "data": data}
     except HTTPException as http_exc:
         raise http_exc
+    except password_hashing.HashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry.",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(
@@ -59,32 +72,39 @@ async def login(person: PersonLogin,  db: Session = Depends(get_db)):
 
 @router.post("/signup")
 async def signup(
-    person: PersonSignup, db: Session = Depends(get_db)
+    person: PersonSignup,
+    session: Optional[SessionClaims] = Depends(get_optional_session),
+    db: Session = Depends(get_db)
 ):
     try:
-        person_exist = utils.get_person_by_email(person.email, person.role, db)
-        if person_exist:
+        if not utils.may_sign_up(session, person.email, person.role, db):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only an admin can add managers and admins.",
+            )
+        if utils.email_taken(person.email, db):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="email already exist",
             )
+        password = await password_hashing.hash_password(person.password)
 
         if person.role.value == "user":
             new_person = User(
-                username=person.username, email=person.email, password=person.password
+                username=person.username, email=person.email, password=password
             )
 
         elif person.role.value == "manager":
             new_person = Manager(
                 username=person.username,
                 email=person.email,
-                password=person.password,
+                password=password,
             )
         elif person.role.value == "admin":
             new_person = Admin(
                 username=person.username,
                 email=person.email,
-                password=person.password,
+                password=password,
             )
         else:
             raise HTTPException(
@@ -94,14 +114,16 @@ async def signup(
             
 
         db.add(new_person)
+        if person.role.value == "user":
+            db.flush()
+            jobs.enqueue(db, "issue_auth_token", {
+                "user_id": str(new_person.id),
+                "email": person.email,
+                "subject": "Authorize your account",
+                "message": "Kindly authorize your account by using this 6 digit token: {token}",
+            })
         db.commit()
         db.refresh(new_person)
-       
-     
-        if person.role.value == "user":
-            print(new_person.id)       
-            new_token = utils.generate_new_auth_token(new_person.id)
-            utils.sendEmail(person.email, "Authorize your account", f"Kindly authorize your account by using this 6 digit token: {new_token}")
         data = {
             "userId":new_person.id,
             "email": new_person.email,
@@ -112,6 +134,12 @@ async def signup(
         return {"message": "user signup successfully", "data": data}
     except HTTPException as http_exc:
         raise http_exc
+    except password_hashing.HashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many signups in progress, please retry.",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(
@@ -121,10 +149,15 @@ async def signup(
 
 
 @router.put("/update_username")
-async def update(person: PersonUpdate,request:Request, db: Session = Depends(get_db)):
+async def update(
+    person: PersonUpdate,
+    request:Request,
+    session: Optional[SessionClaims] = Depends(get_account_session),
+    db: Session = Depends(get_db),
+):
     try:
         print(f"person: {person}")
-        person_exist = utils.get_person_by_email(person.email, person.role, db)
+        person_exist = utils.resolve_person(session, person.email, person.role, db)
         if person_exist is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Invalid Credentials"
@@ -144,6 +177,7 @@ async def update(person: PersonUpdate,request:Request, db: Session = Depends(get
         #     )
         person_exist.username= person.username
         db.commit()
+        utils.forget_identity(person_exist)
         db.refresh(person_exist)     
         return {"message": "username updated successfully"}  
            
@@ -158,22 +192,17 @@ async def update(person: PersonUpdate,request:Request, db: Session = Depends(get
 async def get_image_(
     email: str = Query(''),
     role: Role = Query(Role.USER),
-    
+    session: Optional[SessionClaims] = Depends(get_optional_session),
      db: Session = Depends(get_db)
     ):
     try:
-        if role == Role.USER:
-            person_exist = db.query(User).filter(User.email == email).first()
-        elif role == Role.MANAGER:
-            person_exist = db.query(Manager).filter(Manager.email == email).first()
-        elif role == Role.ADMIN:
-            person_exist = db.query(Admin).filter(Admin.email == email).first()
+        person_exist = utils.lookup_identity(session, email, role, db)
         
         if person_exist is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST
             )
-        return {"message":"profile image deleted successfully","data":person_exist.image}
+        return {"message":"profile image fetched successfully","data":person_exist.image}
     except Exception as e:
         print(f"error: {e}")
         return {"message": f"Something went wrong: {e}"}
@@ -185,28 +214,27 @@ async def get_image_(
 async def upload_image_(
     email: str = Form("usman"),
     role: Role = Form(Role.USER),
+    session: Optional[SessionClaims] = Depends(get_account_session),
     
      file:UploadFile=File(...), 
      db: Session = Depends(get_db)
     
     ):
     try:
-        if role == Role.USER:
-            person_exist = db.query(User).filter(User.email == email).first()
-        elif role == Role.MANAGER:
-            person_exist = db.query(Manager).filter(Manager.email == email).first()
-        elif role == Role.ADMIN:
-            person_exist = db.query(Admin).filter(Admin.email == email).first()
+        person_exist = utils.resolve_person(session, email, role, db)
         
         if person_exist is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST
             )
-        result = cloudinary.uploader.upload(file.file, public_id=f"{person_exist.id}:_:profile")
-        person_exist.image = result['secure_url']
+        url = await media_service.upload(file.file, media_key(person_exist.id, "profile"))
+        person_exist.image = url
         db.commit()
+        utils.forget_identity(person_exist)
         db.refresh(person_exist)
-        return {"message":"profile image uploaded successfully","url": result['secure_url']}
+        return {"message":"profile image uploaded successfully","url": url}
+    except MediaUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print(f"error: {e}")
         return {"message": f"Something went wrong: {e}"}
@@ -216,27 +244,26 @@ async def upload_image_(
 async def update_image_(
      email: str = Form("usman"),
     role: Role = Form(Role.USER),
+    session: Optional[SessionClaims] = Depends(get_account_session),
     
      file:UploadFile=File(...), 
      db: Session = Depends(get_db)
     ):
     try:
-        if role == Role.USER:
-            person_exist = db.query(User).filter(User.email == email).first()
-        elif role == Role.MANAGER:
-            person_exist = db.query(Manager).filter(Manager.email == email).first()
-        elif role == Role.ADMIN:
-            person_exist = db.query(Admin).filter(Admin.email == email).first()
+        person_exist = utils.resolve_person(session, email, role, db)
         
         if person_exist is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST
             )
-        result = cloudinary.uploader.upload(file.file, public_id=f"{person_exist.id}:_:profile",  overwrite=True)
-        person_exist.image = result['secure_url']
+        url = await media_service.upload(file.file, media_key(person_exist.id, "profile"), overwrite=True)
+        person_exist.image = url
         db.commit()
+        utils.forget_identity(person_exist)
         db.refresh(person_exist)
-        return {"message":"profile image updated successfully","url": result['secure_url']}
+        return {"message":"profile image updated successfully","url": url}
+    except MediaUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
         print(f"error: {e}")
         return {"message": f"Something went wrong: {e}"}
@@ -246,25 +273,26 @@ async def update_image_(
 async def update_image_(
     email: str = Form("usman"),
     role: Role = Form(Role.USER),
+    session: Optional[SessionClaims] = Depends(get_account_session),
     
      db: Session = Depends(get_db)
     ):
     try:
-        if role == Role.USER:
-            person_exist = db.query(User).filter(User.email == email).first()
-        elif role == Role.MANAGER:
-            person_exist = db.query(Manager).filter(Manager.email == email).first()
-        elif role == Role.ADMIN:
-            person_exist = db.query(Admin).filter(Admin.email == email).first()
+        person_exist = utils.resolve_person(session, email, role, db)
         
         if person_exist is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST
             )
-        result = cloudinary.uploader.destroy(public_id=f"{person_exist.id}:_:profile")
-        print(f"deleted profile image result: {result}")
+        if person_exist.image is not None:
+            jobs.enqueue(db, "media_destroy", {
+                "key": media_key(person_exist.id, "profile"),
+                "url": person_exist.image,
+                "person_id": str(person_exist.id),
+            })
         person_exist.image = None
         db.commit()
+        utils.forget_identity(person_exist)
         db.refresh(person_exist)
         return {"message":"profile image deleted successfully"}
     except Exception as e:
@@ -276,26 +304,27 @@ async def update_image_(
 async def delete_user_(
     email: str = Form("usman"),
     role: Role = Form(Role.USER),
+    session: Optional[SessionClaims] = Depends(get_account_session),
     
      db: Session = Depends(get_db)
     ):
     try:
-        if role == Role.USER:
-            person_exist = db.query(User).filter(User.email == email).first()
-        elif role == Role.MANAGER:
-            person_exist = db.query(Manager).filter(Manager.email == email).first()
-        elif role == Role.ADMIN:
-            person_exist = db.query(Admin).filter(Admin.email == email).first()
+        person_exist = utils.resolve_person(session, email, role, db)
         
         if person_exist is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST
             )
-        result = cloudinary.uploader.destroy(public_id=f"{person_exist.id}:_:profile")
-        print(f"deleted profile image result: {result}")
-
+        if person_exist.image is not None:
+            jobs.enqueue(db, "media_destroy", {
+                "key": media_key(person_exist.id, "profile"),
+                "url": person_exist.image,
+                "person_id": str(person_exist.id),
+            })
+        person_id, person_email = person_exist.id, person_exist.email
         db.delete(person_exist)
         db.commit()
+        utils.identity_cache.invalidate(person_id, person_email)
         return {"message":"User deleted successfully"}
     except Exception as e:
         print(f"error: {e}")
@@ -303,11 +332,16 @@ async def delete_user_(
 
 
 @router.get("/user/authorize/generate_new_token")
-async def new_token_(user_id:str, email:str, ):
+@read_from_primary
+async def new_token_(user_id:str, email:str, db: Session = Depends(get_db)):
     try:
-        
-        new_token = utils.generate_new_auth_token(user_id)
-        utils.sendEmail(email, "Authorize your account", f"Kindly authorize your account by using this 6 digit token: {new_token}")
+        jobs.enqueue(db, "issue_auth_token", {
+            "user_id": user_id,
+            "email": email,
+            "subject": "Authorize your account",
+            "message": "Kindly authorize your account by using this 6 digit token: {token}",
+        })
+        db.commit()
         return {"message": "new token generated successfully"}
     except Exception as e:
         print(f"error: {e}")
@@ -324,11 +358,20 @@ async def authorize_user_(token:UserValidateToken, db: Session = Depends(get_db)
             user = db.query(User).filter(User.id == token.user_id).first()
             user.is_auth = True
             db.commit()
+            utils.forget_identity(user)
             db.refresh(user)
             return {"message": "user authorize successfully", "is_auth":True}
         else:
-            new_token = utils.generate_new_auth_token(token.user_id)
-            utils.sendEmail(user.email, "Authorize your account", f"The old token is expired, kindly use this new token: {new_token} \nvalid in 24 hours")
+            user = utils.get_person_by_id(token.user_id, Role.USER, db)
+            if user is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+            jobs.enqueue(db, "issue_auth_token", {
+                "user_id": token.user_id,
+                "email": user.email,
+                "subject": "Authorize your account",
+                "message": "The old token is expired, kindly use this new token: {token} \nvalid in 24 hours",
+            })
+            db.commit()
             return {"message": "User Authorization failed, kindly check your email", "is_auth":False}
             
     except Exception as e:
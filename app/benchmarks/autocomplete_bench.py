@@ -0,0 +1,86 @@
+"""Autocomplete prefix index: build time, memory, keystroke latency and updates.
+
+Run from the ``app`` directory:
+
+    python -m benchmarks.autocomplete_bench --items 1000000
+
+Builds a ``PrefixIndex`` over generated artist names, art object titles
+and exhibition names with skewed popularity weights, then times
+``--queries`` lookups for each prefix length of a stored label, typed one
+keystroke at a time, and ``--updates`` incremental inserts. No database is
+involved, like on the autocomplete endpoint.
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import time
+import uuid
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from benchmarks.fuzzy_match_bench import _names, _title  # noqa: E402
+
+
+def _items(rng, count: int) -> list:
+    artists = count // 4
+    exhibitions = count // 20
+    art_objects = count - artists - exhibitions
+    items = [("artist", uuid.uuid4(), name, int(rng.paretovariate(1.2))) for name in _names(rng, artists)]
+    items += [("art_object", uuid.uuid4(), _title(rng, i), int(rng.paretovariate(1.5))) for i in range(art_objects)]
+    items += [("exhibition", uuid.uuid4(), _title(rng, i), int(rng.paretovariate(1.2))) for i in range(exhibitions)]
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--updates", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from services.autocomplete import PrefixIndex
+
+    rng = random.Random(args.seed)
+    items = _items(rng, args.items)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    index = PrefixIndex(items)
+    print(
+        f"built {len(index)} items, {len(index._keys)} keys in {time.perf_counter() - started:.1f}s, "
+        f"peak RSS +{(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024:.0f} MiB"
+    )
+
+    timings = {}
+    for _ in range(args.queries):
+        label = rng.choice(items)[2].lower()
+        for length in range(1, min(len(label), 8) + 1):
+            started = time.perf_counter()
+            index.query(label[:length], limit=args.limit)
+            timings.setdefault(length, []).append(time.perf_counter() - started)
+    for length, samples in sorted(timings.items()):
+        samples.sort()
+        print(
+            f"prefix length {length}: median={statistics.median(samples) * 1000:.3f}ms "
+            f"p99={samples[int(len(samples) * 0.99)] * 1000:.3f}ms"
+        )
+
+    started = time.perf_counter()
+    for i in range(args.updates):
+        index.update("art_object", uuid.uuid4(), _title(rng, args.items + i), 1)
+    elapsed = time.perf_counter() - started
+    print(f"{args.updates} inserts: {elapsed / args.updates * 1e6:.0f}us each, delta of {index.delta_size} keys")
+    samples = []
+    for _ in range(args.queries):
+        label = rng.choice(items)[2].lower()[:3]
+        started = time.perf_counter()
+        index.query(label, limit=args.limit)
+        samples.append(time.perf_counter() - started)
+    print(f"prefix length 3 with the delta: median={statistics.median(samples) * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
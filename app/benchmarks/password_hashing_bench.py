@@ -0,0 +1,83 @@
+"""Login verify latency with and without a concurrent signup burst.
+
+Run from the ``app`` directory:
+
+    python -m benchmarks.password_hashing_bench --logins 200 --signups 200
+
+Reports p50/p99 of ``verify_password`` alone, then while ``hash_password``
+calls are flooding the hash pool, plus how many calls were fast-rejected.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from services import password_hashing
+
+
+async def _timed_verify(password, stored, latencies):
+    start = time.perf_counter()
+    try:
+        await password_hashing.verify_password(password, stored)
+    except password_hashing.HashingBusy:
+        return
+    latencies.append(time.perf_counter() - start)
+
+
+async def _signup(password):
+    try:
+        await password_hashing.hash_password(password)
+    except password_hashing.HashingBusy:
+        pass
+
+
+async def _logins(count, concurrency, stored):
+    latencies = []
+    for start in range(0, count, concurrency):
+        batch = range(start, min(start + concurrency, count))
+        await asyncio.gather(*(_timed_verify("secret", stored, latencies) for _ in batch))
+    return latencies
+
+
+def _report(label, latencies):
+    if not latencies:
+        print(f"{label:<22} no successful verifications")
+        return
+    latencies = sorted(latencies)
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)]
+    print(
+        f"{label:<22} n={len(latencies):<5} p50={statistics.median(latencies) * 1000:7.1f}ms "
+        f"p99={p99 * 1000:7.1f}ms"
+    )
+
+
+async def run(logins, signups, concurrency):
+    stored = password_hashing.hash_password_sync("secret")
+    # warm the pools so process start-up is not measured
+    await password_hashing.verify_password("secret", stored)
+    await password_hashing.hash_password("secret")
+
+    _report("logins alone", await _logins(logins, concurrency, stored))
+
+    signup_task = asyncio.gather(*(_signup(f"pw{i}") for i in range(signups)))
+    _report("logins during signups", await _logins(logins, concurrency, stored))
+    await signup_task
+
+    print(f"verify pool: {password_hashing.verify_pool.stats()}")
+    print(f"hash pool:   {password_hashing.hash_pool.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--signups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.logins, args.signups, args.concurrency))
+    finally:
+        password_hashing.shutdown()
+
+
+if __name__ == "__main__":
+    main()
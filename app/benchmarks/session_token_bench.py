@@ -0,0 +1,70 @@
+"""Session token verification vs. the per-request person lookup.
+
+Run from the ``app`` directory:
+
+    python -m benchmarks.session_token_bench
+    DATABASE_URL=postgresql://... python -m benchmarks.session_token_bench --persons 10000
+
+Without ``DATABASE_URL`` the lookup side runs against an in-memory SQLite
+database, which flatters it: there is no network round trip.
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from db.database import Base, SessionLocal, engine  # noqa: E402
+from db.models.data_types import Role  # noqa: E402
+from db.models.person import User  # noqa: E402
+from services.session_tokens import issue_session_token, verify_session_token  # noqa: E402
+import utils  # noqa: E402
+
+
+def seed(persons):
+    Base.metadata.create_all(bind=engine, tables=[User.__table__])
+    with SessionLocal() as db:
+        if db.query(User).count() < persons:
+            db.add_all(
+                User(username=f"user{i}", email=f"bench{i}@example.com", password="x")
+                for i in range(persons)
+            )
+            db.commit()
+        return [(row.id, row.email) for row in db.query(User.id, User.email).limit(persons)]
+
+
+def bench_tokens(people, iterations):
+    tokens = [issue_session_token(person_id, Role.USER) for person_id, _ in people]
+    start = time.perf_counter()
+    for i in range(iterations):
+        verify_session_token(tokens[i % len(tokens)])
+    return iterations / (time.perf_counter() - start)
+
+
+def bench_lookup(people, iterations):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        for _ in range(iterations):
+            utils.get_person_by_email(rng.choice(people)[1], Role.USER, db)
+            db.expunge_all()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--persons", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    people = seed(args.persons)
+    token_rate = bench_tokens(people, args.iterations)
+    lookup_rate = bench_lookup(people, max(args.iterations // 10, 1))
+    print(f"session token verify/s : {token_rate:>12.0f}")
+    print(f"email lookup/s         : {lookup_rate:>12.0f}")
+    print(f"speedup                : {token_rate / lookup_rate:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Upload throughput of the media storage backends through ``MediaService``.
+
+Run from the ``app`` directory:
+
+    python -m benchmarks.storage_bench --backend local --uploads 500 --size-kb 200
+    CLOUDINARY_CLOUD_NAME=... python -m benchmarks.storage_bench --backend cloudinary --uploads 20
+
+For the local backend it times unique payloads and then the same payloads
+re-uploaded under new keys, which only write refs thanks to dedupe.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from services.media import MediaService
+from services.storage import LocalContentAddressedStorage, build_storage, media_key
+
+
+async def _upload_all(service, payloads, concurrency):
+    keys = [media_key(uuid.uuid4(), "bench", i) for i in range(len(payloads))]
+    start = time.perf_counter()
+    for offset in range(0, len(payloads), concurrency):
+        await service.upload_many(payloads[offset : offset + concurrency], keys[offset : offset + concurrency])
+    return time.perf_counter() - start
+
+
+def _report(label, count, size_kb, elapsed):
+    print(
+        f"{label:<28} {count / elapsed:>9.1f} uploads/s "
+        f"{count * size_kb / 1024 / elapsed:>9.1f} MB/s"
+    )
+
+
+async def run(backend, uploads, size_kb, concurrency):
+    payloads = [os.urandom(size_kb * 1024) for _ in range(uploads)]
+    root = None
+    if backend == "local":
+        root = tempfile.mkdtemp(prefix="storage_bench_")
+        storage = LocalContentAddressedStorage(root)
+    else:
+        import utils
+
+        utils.initialize_cloudinary()
+        storage = build_storage(backend)
+    service = MediaService(max_concurrency=concurrency, timeout=120, storage=storage)
+    try:
+        _report(f"{backend} unique", uploads, size_kb, await _upload_all(service, payloads, concurrency))
+        if backend == "local":
+            _report(f"{backend} duplicate bytes", uploads, size_kb, await _upload_all(service, payloads, concurrency))
+            print(f"blob writes={storage.writes} dedup hits={storage.dedup_hits}")
+    finally:
+        if root is not None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["local", "cloudinary"], default="local")
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args.backend, args.uploads, args.size_kb, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Issue/validate throughput of the auth token store across worker processes.
+
+Run from the ``app`` directory:
+
+    python -m benchmarks.token_store_bench --backend file --workers 1 2 4 8
+    DATABASE_URL=postgresql://... python -m benchmarks.token_store_bench --backend db
+
+Each worker owns its own store instance (like a uvicorn worker would) and
+works on a shared pool of user ids, so writes from one process are read by
+the others.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+
+
+def _worker(backend, directory, user_ids, operations, validate_ratio, result_queue):
+    if backend == "file":
+        from services.token_store import FileTokenStore
+
+        store = FileTokenStore(directory)
+    else:
+        from services.token_store import DbTokenStore
+
+        store = DbTokenStore()
+
+    rng = random.Random(os.getpid())
+    issued = validated = 0
+    start = time.perf_counter()
+    for _ in range(operations):
+        user_id = rng.choice(user_ids)
+        if rng.random() < validate_ratio:
+            store.validate(user_id, "000000")
+            validated += 1
+        else:
+            store.issue(user_id, f"{rng.randrange(1000000):06d}")
+            issued += 1
+    result_queue.put((issued, validated, time.perf_counter() - start))
+
+
+def run(backend, workers, operations, users, validate_ratio):
+    directory = tempfile.mkdtemp(prefix="token_bench_")
+    try:
+        if backend == "db":
+            from db.database import Base, engine
+            from db.models.person import AuthToken
+
+            Base.metadata.create_all(bind=engine, tables=[AuthToken.__table__])
+
+        user_ids = [str(uuid.uuid4()) for _ in range(users)]
+        result_queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_worker,
+                args=(backend, directory, user_ids, operations, validate_ratio, result_queue),
+            )
+            for _ in range(workers)
+        ]
+        wall_start = time.perf_counter()
+        for p in processes:
+            p.start()
+        results = [result_queue.get() for _ in processes]
+        for p in processes:
+            p.join()
+        wall = time.perf_counter() - wall_start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    issued = sum(r[0] for r in results)
+    validated = sum(r[1] for r in results)
+    print(
+        f"{backend:<5} workers={workers:<3} issue/s={issued / wall:>10.0f} "
+        f"validate/s={validated / wall:>10.0f} total ops/s={(issued + validated) / wall:>10.0f}"
+    )
+
+
+def run_legacy_npy(operations, users):
+    """The old np.load/np.save path, single process, for reference."""
+    try:
+        import numpy as np
+    except ImportError:
+        print("numpy not installed, skipping legacy .npy baseline")
+        return
+    import datetime
+
+    directory = tempfile.mkdtemp(prefix="token_bench_npy_")
+    path = os.path.join(directory, "auth_tokens.npy")
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    np.save(path, {user_id: ["0", datetime.datetime.now()] for user_id in user_ids})
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(operations):
+        token_file = np.load(path, allow_pickle=True).item()
+        token_file[rng.choice(user_ids)] = [str(rng.randrange(1000000)), datetime.datetime.now()]
+        np.save(path, token_file)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(directory, ignore_errors=True)
+    print(f"npy   workers=1   issue/s={operations / elapsed:>10.0f} (legacy whole-file rewrite)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["file", "db"], default="file")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--operations", type=int, default=5000, help="operations per worker")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--validate-ratio", type=float, default=0.9)
+    parser.add_argument("--legacy", action="store_true", help="also time the old .npy file path")
+    args = parser.parse_args()
+
+    if args.legacy:
+        run_legacy_npy(min(args.operations, 2000), args.users)
+    for workers in args.workers:
+        run(args.backend, workers, args.operations, args.users, args.validate_ratio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Set-based write helpers shared by the bulk endpoints, imports and migrations."""
+import os
+from itertools import islice
+from typing import Iterable, List, Optional
+
+from sqlalchemy import insert
+
+
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+# bind parameters per statement; SQLite allows 32766 and Postgres 65535
+MAX_BIND_PARAMS = 32000
+
+
+class BulkInsertError(Exception):
+    """A chunk failed and was rolled back; ``created`` holds what the earlier,
+    already committed chunks returned."""
+
+    def __init__(self, created: list, error: Exception):
+        super().__init__(str(error))
+        self.created = created
+
+
+def insert_ignore(dialect_name: str, table, index_elements: Optional[List[str]] = None):
+    """``INSERT ... ON CONFLICT DO NOTHING`` for ``table``.
+
+    With ``index_elements`` only conflicts on that unique index are ignored;
+    any other violation still raises.
+    """
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"no insert-ignore for {dialect_name}")
+    return insert(table).on_conflict_do_nothing(index_elements=index_elements)
+
+
+def insert_ignore_returning(dialect_name: str, table, rows: List[dict], index_elements, returning):
+    """One multi-row insert-ignore that returns ``returning`` for the rows it inserted."""
+    return insert_ignore(dialect_name, table, index_elements).values(rows).returning(*returning)
+
+
+def chunked(items: Iterable, size: int):
+    """Lists of up to ``size`` items, without materializing ``items``."""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def insert_returning_chunks(db, table, rows: List[dict], returning, chunk_size: Optional[int] = None) -> list:
+    """Insert ``rows`` with one multi-row ``INSERT ... RETURNING`` per chunk.
+
+    Each chunk is committed on its own, so a large payload never holds one
+    long transaction; chunks are also kept under ``MAX_BIND_PARAMS``.
+    Returns the ``returning`` rows of everything inserted.
+    """
+    size = min(chunk_size or BULK_INSERT_CHUNK_SIZE, MAX_BIND_PARAMS // len(table.c))
+    created = []
+    for chunk in chunked(rows, max(size, 1)):
+        try:
+            inserted = (await db.execute(insert(table).values(chunk).returning(*returning))).all()
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise BulkInsertError(created, e) from e
+        created.extend(inserted)
+    return created
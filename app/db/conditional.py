@@ -0,0 +1,72 @@
+"""Conditional GET for responses built from catalog rows.
+
+A handler first selects the *versions* of what its body is made of: the
+ids and ``updated_at`` of every row (``Timestamp`` maintains ``updated_at``
+on every update), usually with a query much lighter than the one that
+loads the rows. ``check`` turns them into validators:
+
+* ``ETag``: a hash of the versions, the path and the query string. The
+  same versions always produce the same body, so the tag is strong.
+* ``Last-Modified``: the newest ``updated_at``. Only for bodies whose rows
+  can change but not disappear (a row by id and what hangs off it);
+  listings leave it out, because a row dropping out of a page makes the
+  page older, not newer.
+
+If the request's ``If-None-Match`` (or, without it, ``If-Modified-Since``)
+still holds, ``check`` returns a bodiless 304 for the handler to send
+before loading or serializing anything. Otherwise it puts the validators
+on the handler's ``response`` and the handler carries on.
+"""
+import datetime
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+
+def http_date(value: datetime.datetime) -> str:
+    # timestamps are stored as naive UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return format_datetime(value.astimezone(datetime.timezone.utc), usegmt=True)
+
+
+def validators(request: Request, versions: Iterable[tuple], last_modified: bool = True) -> dict:
+    versions = [tuple(row) for row in versions]
+    key = (request.url.path, sorted(request.query_params.multi_items()), versions)
+    headers = {"ETag": f'"{hashlib.sha256(repr(key).encode()).hexdigest()[:32]}"', "Cache-Control": "no-cache"}
+    stamps = [value for row in versions for value in row if isinstance(value, datetime.datetime)]
+    if last_modified and stamps:
+        headers["Last-Modified"] = http_date(max(stamps))
+    return headers
+
+
+def _fresh(request: Request, headers: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # GET compares weakly: a W/ prefix added by a proxy still matches
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or headers["ETag"] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or "Last-Modified" not in headers:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    return parsedate_to_datetime(headers["Last-Modified"]) <= since
+
+
+def respond(request: Request, response: Response, headers: dict) -> Optional[Response]:
+    """A 304 when the client's copy is current, else ``None`` with ``headers`` set on ``response``."""
+    if _fresh(request, headers):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def check(request: Request, response: Response, versions: Iterable[tuple], last_modified: bool = True) -> Optional[Response]:
+    return respond(request, response, validators(request, versions, last_modified))
@@ -1,19 +1,81 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
 import os
+from db.pool import instrument, pool_settings
+from db.replicas import replica_router
 connection_string = os.getenv("DATABASE_URL")
-
-
-engine = create_engine(connection_string)
+engine = create_engine(connection_string, **pool_settings.engine_kwargs(connection_string))
+instrument(engine, "primary")
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
-
 Base = declarative_base()
-
-def get_db():
-    db =SessionLocal() 
-    
+def get_db(request: Request = None):
+    # reads go to a replica when one is configured and usable, see db/replicas.py
+    replica = replica_router.for_request(request)
+    db = SessionLocal() if replica is None else SessionLocal(bind=replica.engine, info={"replica": replica.name})
     try:
         yield db
     finally:
         db.close()
+
+
+# async drivers for the sync urls in DATABASE_URL; ASYNC_DATABASE_URL overrides
+# the mapping (e.g. when the sync url carries psycopg2-only query options)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(url: str):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"no async driver configured for {backend} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_engine():
+    """The async engine, created on first use so the async driver is only
+    imported by processes that actually serve async routes."""
+    global _async_engine
+    if _async_engine is None:
+        url = os.getenv("ASYNC_DATABASE_URL") or async_url(connection_string)
+        _async_engine = create_async_engine(url, **pool_settings.engine_kwargs(url, is_async=True))
+        instrument(_async_engine.sync_engine, "primary_async")
+    return _async_engine
+
+
+def AsyncSessionLocal(**kwargs) -> AsyncSession:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        # rows are serialized after the handler returns, so don't expire them on commit
+        _async_sessionmaker = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmaker(**kwargs)
+
+
+async def get_async_db(request: Request = None):
+    replica = replica_router.for_request(request)
+    if replica is None:
+        session = AsyncSessionLocal()
+    else:
+        session = AsyncSessionLocal(bind=replica.async_engine, info={"replica": replica.name})
+    async with session as db:
+        yield db
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
@@ -0,0 +1,190 @@
+"""Declared indexes: build the missing ones and report how the real queries use them.
+
+The indexes live in the models' ``__table_args__``. ``create_all`` only
+builds them with new tables, so ``ensure_schema`` calls ``create_missing``
+for tables that already exist. On Postgres that runs
+``CREATE INDEX CONCURRENTLY``, which does not block writes on a live
+table; an invalid index left by an interrupted build is dropped and built
+again.
+
+From the ``app`` directory, with ``DATABASE_URL`` set:
+
+    python -m db.indexes create    # build declared indexes that are missing
+    python -m db.indexes report    # query plans of the endpoints, unused and missing indexes
+
+``report`` runs EXPLAIN on the query shape of each listing and lookup
+endpoint and flags full scans and sorts. On Postgres it also lists indexes
+that ``pg_stat_user_indexes`` has never seen scanned and tables read mostly
+by sequential scans.
+"""
+import argparse
+import json
+import re
+import uuid
+
+from sqlalchemy import inspect, select
+from sqlalchemy.schema import CreateIndex
+
+
+def declared(metadata) -> list:
+    return [index for table in metadata.sorted_tables for index in sorted(table.indexes, key=lambda index: index.name)]
+
+
+def missing(connection, metadata) -> list:
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    result = []
+    for index in declared(metadata):
+        if index.table.name not in tables:
+            continue
+        if index.name not in {existing["name"] for existing in inspector.get_indexes(index.table.name)}:
+            result.append(index)
+    return result
+
+
+def _invalid_postgres_indexes(connection) -> set:
+    return set(
+        connection.exec_driver_sql(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+        ).scalars()
+    )
+
+
+def create_missing(engine, metadata) -> list:
+    """Build declared indexes the database lacks; returns their names."""
+    if engine.dialect.name != "postgresql":
+        with engine.begin() as connection:
+            indexes = missing(connection, metadata)
+            for index in indexes:
+                index.create(connection)
+    else:
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            names = {index.name for index in declared(metadata)}
+            for name in _invalid_postgres_indexes(connection) & names:
+                print(f"dropping invalid index {name} left by an interrupted build")
+                connection.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+            indexes = missing(connection, metadata)
+            for index in indexes:
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=connection.dialect))
+                connection.exec_driver_sql(re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX CONCURRENTLY ", ddl))
+    for index in indexes:
+        print(f"created index {index.name}")
+    return [index.name for index in indexes]
+
+
+def workload():
+    """``(label, statement)`` for the WHERE/ORDER BY shape of each endpoint."""
+    from db.models.data_types import ArtObjectType, StatusTypeEnum
+    from db.models.person import (
+        ArtObject,
+        Artist,
+        BorrowedArtObject,
+        Exhibition,
+        ExhibitionArtObjectAssociation,
+        PermanentCollection,
+        Sculpture,
+    )
+    from db.pagination import Keyset
+
+    some_id = uuid.UUID(int=0)
+    art_objects = Keyset(ArtObject.id, (ArtObject.year, False), (ArtObject.title, False))
+    artists = Keyset(Artist.id, (Artist.date_of_birth, False), (Artist.name, False))
+    exhibitions = Keyset(Exhibition.id, (Exhibition.end_date, False), (Exhibition.name, False))
+    return [
+        ("artist listing", select(Artist).order_by(*artists.order_by()).limit(10)),
+        ("artist by name", select(Artist).where(Artist.name == "name")),
+        ("art object listing", select(ArtObject).where(ArtObject.sculpture != None).order_by(*art_objects.order_by()).limit(10)),
+        ("art objects by type", select(ArtObject.id).where(ArtObject.object_type == ArtObjectType.SCULPTURE)),
+        ("art objects of an artist", select(ArtObject).where(ArtObject.artist_id == some_id)),
+        ("sculpture by id", select(Sculpture).where(Sculpture.id == some_id)),
+        ("exhibition listing", select(Exhibition).order_by(*exhibitions.order_by()).limit(10)),
+        ("exhibition members", select(ExhibitionArtObjectAssociation).where(ExhibitionArtObjectAssociation.exhibition_id == some_id)),
+        ("permanent collection by status", select(PermanentCollection).where(PermanentCollection.status == StatusTypeEnum.DISPLAY)),
+        ("borrowed by collection", select(BorrowedArtObject).where(BorrowedArtObject.collection_id == some_id)),
+    ]
+
+
+def _explain(connection, statement) -> list:
+    """Problems in the plan of ``statement``: full scans and sorts."""
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    if connection.dialect.name == "postgresql":
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        problems = []
+
+        def walk(node):
+            if node["Node Type"] == "Seq Scan":
+                problems.append(f"seq scan on {node['Relation Name']} (~{node['Plan Rows']} rows)")
+            elif node["Node Type"] in ("Sort", "Incremental Sort"):
+                problems.append(f"sort on {', '.join(node.get('Sort Key', []))}")
+            for child in node.get("Plans", []):
+                walk(child)
+
+        walk(plan[0]["Plan"])
+        return problems
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    problems = []
+    for row in rows:
+        detail = row[-1]
+        if re.match(r"SCAN \w+$", detail):
+            problems.append(f"full scan: {detail}")
+        elif detail.startswith("USE TEMP B-TREE"):
+            problems.append(f"sort: {detail}")
+    return problems
+
+
+def _postgres_statistics(connection) -> list:
+    lines = []
+    unused = connection.exec_driver_sql(
+        "SELECT s.relname, s.indexrelname, pg_size_pretty(pg_relation_size(s.indexrelid)) "
+        "FROM pg_stat_user_indexes s JOIN pg_index i ON i.indexrelid = s.indexrelid "
+        "WHERE s.idx_scan = 0 AND NOT i.indisunique AND NOT i.indisprimary "
+        "ORDER BY pg_relation_size(s.indexrelid) DESC"
+    ).all()
+    lines.append("unused indexes (no scans since statistics were reset):")
+    lines += [f"  {table}.{index} ({size})" for table, index, size in unused] or ["  none"]
+    scanned = connection.exec_driver_sql(
+        "SELECT relname, seq_scan, seq_tup_read, coalesce(idx_scan, 0), n_live_tup FROM pg_stat_user_tables "
+        "WHERE seq_scan > 0 AND n_live_tup > 1000 AND seq_tup_read / seq_scan > 1000 "
+        "AND seq_scan > coalesce(idx_scan, 0) ORDER BY seq_tup_read DESC"
+    ).all()
+    lines.append("tables read mostly by sequential scans (candidates for missing indexes):")
+    lines += [
+        f"  {table}: {seq} seq scans reading {rows} rows, {idx} index scans, {live} live rows"
+        for table, seq, rows, idx, live in scanned
+    ] or ["  none"]
+    return lines
+
+
+def report(engine, metadata) -> list:
+    lines = []
+    with engine.connect() as connection:
+        absent = missing(connection, metadata)
+        lines.append("declared but missing:")
+        lines += [f"  {index.table.name}.{index.name}" for index in absent] or ["  none"]
+        lines.append("endpoint query plans:")
+        for label, statement in workload():
+            problems = _explain(connection, statement)
+            lines.append(f"  {label}: {'; '.join(problems) if problems else 'ok'}")
+        if connection.dialect.name == "postgresql":
+            lines += _postgres_statistics(connection)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["create", "report"])
+    args = parser.parse_args()
+    from db.database import engine
+    from db.models.person import Base
+
+    if args.command == "create":
+        created = create_missing(engine, Base.metadata)
+        print(f"{len(created)} indexes created")
+    else:
+        print("\n".join(report(engine, Base.metadata)))
+
+
+if __name__ == "__main__":
+    main()
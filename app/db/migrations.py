@@ -0,0 +1,221 @@
+"""Data migrations that ``create_all`` cannot express.
+
+Each migration runs once per database; applied versions are recorded in
+``schema_migrations``. ``ensure_schema`` is called from the app lifespan: it
+runs ``create_all``, the migrations and builds declared indexes that older
+tables lack, but only when the stored schema fingerprint differs from the
+one computed from the models, so a boot against an up-to-date database
+costs a single query.
+"""
+import datetime
+import hashlib
+import uuid
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, bindparam, exc, inspect, select, update
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from db.bulk import insert_ignore
+from db.indexes import create_missing as create_missing_indexes
+from db.models.data_types import Role
+
+
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.datetime.utcnow),
+)
+schema_fingerprints = Table(
+    "schema_fingerprint",
+    migration_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("updated_at", DateTime, nullable=False, default=datetime.datetime.utcnow),
+)
+
+
+def _as_uuid(value):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+
+def merge_legacy_person_tables(connection):
+    """Copy rows from the old ``admin``/``managers``/``users`` tables into ``persons``.
+
+    Admins go first so managers' ``authorized_by`` points at an existing row.
+    A later row whose email is already taken is skipped. The old tables are
+    left in place for manual cleanup.
+    """
+    from db.models.person import Person
+
+    existing = set(inspect(connection).get_table_names())
+    persons = Person.__table__
+    legacy = MetaData()
+    for table_name, role in (("admin", Role.ADMIN), ("managers", Role.MANAGER), ("users", Role.USER)):
+        if table_name not in existing:
+            continue
+        table = Table(table_name, legacy, autoload_with=connection)
+        rows = []
+        for row in connection.execute(select(table)).mappings():
+            rows.append(
+                {
+                    "id": _as_uuid(row["id"]),
+                    "role": role,
+                    "username": row["username"],
+                    "email": row["email"],
+                    "password": row["password"],
+                    "image": row.get("image"),
+                    "is_active": row.get("is_active", True),
+                    "is_auth": row.get("is_auth", False),
+                    "authorized_by": _as_uuid(row.get("authorized_by")),
+                    "created_at": row["created_at"],
+                    "updated_at": row["updated_at"],
+                }
+            )
+        if rows:
+            connection.execute(insert_ignore(connection.dialect.name, persons), rows)
+            print(f"migrated {len(rows)} rows from {table_name} into persons")
+
+
+def add_column_if_missing(connection, model, column_name):
+    """``ALTER TABLE ... ADD COLUMN`` for a model column an older database lacks."""
+    table = model.__table__
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.c[column_name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column_name} {column_type}')
+
+
+def add_image_variant_columns(connection):
+    from db.models.person import Exhibition, OtherArt, Painting, Sculpture
+
+    for model in (Sculpture, Painting, OtherArt, Exhibition):
+        add_column_if_missing(connection, model, "image_variants")
+
+
+def add_artist_name_normalized(connection):
+    """Add and backfill ``artists.name_normalized`` and its unique index.
+
+    When older rows share a normalized name only the oldest gets the key;
+    the others keep NULL (which the unique index allows) for manual review.
+    """
+    from db.models.person import Artist, normalize_name
+
+    add_column_if_missing(connection, Artist, "name_normalized")
+    table = Artist.__table__
+    taken = set(
+        connection.execute(select(table.c.name_normalized).where(table.c.name_normalized.is_not(None))).scalars()
+    )
+    rows = connection.execute(
+        select(table.c.id, table.c.name).where(table.c.name_normalized.is_(None)).order_by(table.c.created_at)
+    ).all()
+    updates = []
+    for artist_id, name in rows:
+        key = normalize_name(name)
+        if key in taken:
+            continue
+        taken.add(key)
+        updates.append({"artist_id": artist_id, "key": key})
+    if updates:
+        connection.execute(
+            update(table).where(table.c.id == bindparam("artist_id")).values(name_normalized=bindparam("key")),
+            updates,
+        )
+    if len(updates) < len(rows):
+        print(f"{len(rows) - len(updates)} artists share a normalized name and were left without one")
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def create_search_index(connection):
+    """Create the full-text search storage and index the existing catalog."""
+    from services import search
+
+    search.create_index(connection)
+    search.reindex(connection)
+
+
+def create_trigram_indexes(connection):
+    """``pg_trgm`` and trigram indexes for fuzzy matching; other databases match in process."""
+    if connection.dialect.name != "postgresql":
+        return
+    from services import fuzzy_match
+
+    fuzzy_match.create_postgres_indexes(connection)
+
+
+MIGRATIONS = [
+    (1, "merge legacy person tables", merge_legacy_person_tables),
+    (2, "image variant columns", add_image_variant_columns),
+    (3, "artist normalized names", add_artist_name_normalized),
+    (4, "full-text search index", create_search_index),
+    (5, "trigram indexes", create_trigram_indexes),
+]
+
+
+def run_migrations(engine):
+    migration_metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            migrate(connection)
+            connection.execute(schema_migrations.insert().values(version=version, name=name))
+
+
+def schema_fingerprint(metadata, dialect) -> str:
+    """Hash of the DDL ``create_all`` would emit plus the known migrations."""
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+        for column in table.columns:
+            # native enum types are created separately, so their labels are not in the table DDL
+            enums = getattr(column.type, "enums", None)
+            if enums:
+                digest.update(repr((column.name, list(enums))).encode())
+    digest.update(repr([(version, name) for version, name, _ in MIGRATIONS]).encode())
+    return digest.hexdigest()
+
+
+def _stored_fingerprint(engine):
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(schema_fingerprints.c.fingerprint)).scalar()
+    except exc.DBAPIError:
+        # first boot: the fingerprint table does not exist yet
+        return None
+
+
+def ensure_schema(engine, metadata) -> bool:
+    """Bring the database up to the models; returns False when it already was."""
+    fingerprint = schema_fingerprint(metadata, engine.dialect)
+    if _stored_fingerprint(engine) == fingerprint:
+        return False
+    metadata.create_all(bind=engine)
+    run_migrations(engine)
+    create_missing_indexes(engine, metadata)
+    with engine.begin() as connection:
+        connection.execute(schema_fingerprints.delete())
+        connection.execute(schema_fingerprints.insert().values(id=1, fingerprint=fingerprint))
+    print(f"database schema updated, fingerprint {fingerprint[:12]}")
+    return True
+
+
+def forget_schema_fingerprint(engine, migrations: bool = False):
+    """Make the next ``ensure_schema`` run the DDL again (e.g. after dropping tables).
+
+    With ``migrations`` the applied migrations are forgotten as well, so
+    they run again against the recreated tables.
+    """
+    with engine.begin() as connection:
+        connection.execute(schema_fingerprints.delete())
+        if migrations:
+            connection.execute(schema_migrations.delete())
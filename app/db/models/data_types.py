@@ -78,6 +78,23 @@ class Role( Enum):
 class ObjectOwnership(Enum):
     PERMANENT = "permanent"
     BORROWED = "borrowed"
-    
-    
 
+
+class ImageSize(Enum):
+    THUMBNAIL = "thumbnail"
+    MEDIUM = "medium"
+    LARGE = "large"
+    ORIGINAL = "original"
+
+
+class JobStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    DEAD = "dead"
+
+
+class SearchKind(Enum):
+    ART_OBJECT = "art_object"
+    ARTIST = "artist"
+    EXHIBITION = "exhibition"
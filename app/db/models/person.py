@@ -1,5 +1,5 @@
 from db.database import Base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy import (
     Table,
     Column,
@@ -10,25 +10,43 @@ from sqlalchemy import (
     Boolean,
     Enum,
     Date,
+    DateTime,
+    Integer,
     JSON,
+    Index,
 )
 from db.models.mixin import Timestamp
 from uuid import uuid4
+import unicodedata
+from datetime import datetime
 from db.models.data_types import (
     EpochTypeEnum,
     OriginEnum,
     ObjectStyleEnum,
     StatusTypeEnum,
     GenderEnum,
-    ArtObjectType
-    
+    ArtObjectType,
+    JobStatus,
+    Role,
 )
 
 
 
 
+def normalize_name(name):
+    """Dedupe key for names: NFKC, case-folded, whitespace collapsed."""
+    if name is None:
+        return None
+    return " ".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
 class Artist(Base, Timestamp):
     __tablename__ = "artists"
+    __table_args__ = (
+        Index("ix_artists_name_normalized", "name_normalized", unique=True),
+        # artist listing: ORDER BY date_of_birth, name, id
+        Index("ix_artists_date_of_birth_name_id", "date_of_birth", "name", "id"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     name = Column(VARCHAR(255), index=True, nullable=False)
     description = Column(String, nullable=True)
@@ -39,15 +57,28 @@ class Artist(Base, Timestamp):
     date_of_died = Column(Date, nullable=True)
     wiki_qid = Column(String, nullable=True)
     ulan = Column(String, nullable=True)
+    name_normalized = Column(VARCHAR(255), nullable=True)
     
     art_objects = relationship(
         "ArtObject",back_populates="artist", cascade="save-update"
     )
 
+    @validates("name")
+    def _set_name_normalized(self, key, name):
+        self.name_normalized = normalize_name(name)
+        return name
+
 
 
 class ArtObject(Base, Timestamp):
     __tablename__ = "art_objects"
+    __table_args__ = (
+        # subtype listings and the homepage: ORDER BY year, title, id
+        Index("ix_art_objects_year_title_id", "year", "title", "id"),
+        # ids by type: WHERE object_type = ?
+        Index("ix_art_objects_object_type", "object_type"),
+        Index("ix_art_objects_artist_id", "artist_id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     title = Column(VARCHAR(255), nullable=False)
@@ -77,6 +108,8 @@ class ArtObject(Base, Timestamp):
 
 class ExhibitionArtObjectAssociation(Base, Timestamp):
     __tablename__ = "exhibition_art_object_association"
+    # the primary key leads with art_object_id; members of an exhibition need their own
+    __table_args__ = (Index("ix_exhibition_art_object_association_exhibition_id", "exhibition_id"),)
   
     art_object_id = Column(UUID, ForeignKey('art_objects.id', ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
     exhibition_id = Column(UUID, ForeignKey('exhibitions.id', ondelete="CASCADE", onupdate="CASCADE"), primary_key=True)
@@ -84,11 +117,14 @@ class ExhibitionArtObjectAssociation(Base, Timestamp):
 
 class Exhibition(Base, Timestamp):
     __tablename__ = "exhibitions"
+    # exhibition listing and the homepage: ORDER BY end_date, name, id
+    __table_args__ = (Index("ix_exhibitions_end_date_name_id", "end_date", "name", "id"),)
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     name = Column(VARCHAR(255), nullable=False)
     start_date = Column(Date, nullable=False)
     end_date = Column(Date, nullable=False)
     image = Column(JSON, nullable=True)
+    image_variants = Column(JSON, nullable=True)
 
     art_objects = relationship(
         "ArtObject",secondary="exhibition_art_object_association", back_populates="exhibitions"
@@ -107,6 +143,7 @@ class Sculpture(Base, Timestamp):
     width = Column(VARCHAR(50), nullable=True)
     weight = Column(VARCHAR(50), nullable=True)
     image = Column(JSON, nullable=True)
+    image_variants = Column(JSON, nullable=True)
 
     art_object = relationship("ArtObject", back_populates="sculpture")
 
@@ -122,6 +159,7 @@ class Painting(Base, Timestamp):
     paint_type = Column(VARCHAR(50), nullable=False)
     drawn_on = Column(VARCHAR(50), nullable=False)
     image = Column(JSON, nullable=True)
+    image_variants = Column(JSON, nullable=True)
 
     art_object = relationship("ArtObject", back_populates="painting")
 
@@ -134,12 +172,17 @@ class OtherArt(Base, Timestamp):
     )
     type = Column(VARCHAR(100), nullable=False)
     image = Column(JSON, nullable=True)
+    image_variants = Column(JSON, nullable=True)
 
     art_object = relationship("ArtObject", back_populates="other")
 
 
 class PermanentCollection(Base, Timestamp):
     __tablename__ = "permanents_collections"
+    __table_args__ = (
+        Index("ix_permanents_collections_status", "status"),
+        Index("ix_permanents_collections_art_object_id", "art_object_id"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     date_acquired = Column(Date, nullable=False)
     status = Column(Enum(StatusTypeEnum), nullable=False)
@@ -151,6 +194,10 @@ class PermanentCollection(Base, Timestamp):
 
 class BorrowedArtObject(Base, Timestamp):
     __tablename__ = "borrowed_art_objects"
+    __table_args__ = (
+        Index("ix_borrowed_art_objects_collection_id", "collection_id"),
+        Index("ix_borrowed_art_objects_art_object_id", "art_object_id"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     date_borrowed = Column(Date, nullable=False)
     date_returned = Column(Date, nullable=True)
@@ -177,35 +224,68 @@ class Collection(Base, Timestamp):
 
 
 
-class User(Base, Timestamp):
-    __tablename__ = "users"
+class Person(Base, Timestamp):
+    """Users, managers and admins in one table, told apart by ``role``."""
+
+    __tablename__ = "persons"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    role = Column(Enum(Role), nullable=False)
     username = Column(VARCHAR(255), index=True, nullable=False)
     email = Column(String, nullable=False)
     password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     is_auth = Column(Boolean, default=False)
     image = Column(String, nullable=True)
+    authorized_by = Column(UUID(as_uuid=True), ForeignKey("persons.id"), nullable=True)
 
+    __table_args__ = (
+        Index("ix_persons_email", "email", unique=True),
+        Index("ix_persons_authorized_by", "authorized_by"),
+    )
+    __mapper_args__ = {"polymorphic_on": role}
 
-class Manager(Base, Timestamp):
-    __tablename__ = "managers"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
-    username = Column(String(255), index=True, nullable=False)
-    email = Column(String, nullable=False)
-    password = Column(String, nullable=False)
-    image = Column(String, nullable=True)
 
-    authorized_by = Column(UUID(as_uuid=True), ForeignKey("admin.id"), nullable=True)
-    authorized_by_admin = relationship("Admin", back_populates="authorized_managers")
+class User(Person):
+    __mapper_args__ = {"polymorphic_identity": Role.USER}
 
 
-class Admin(Base, Timestamp):
-    __tablename__ = "admin"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
-    username = Column(String(255), index=True, nullable=False)
-    email = Column(String, nullable=False)
-    password = Column(String, nullable=False)
-    image = Column(String, nullable=True)
+class Manager(Person):
+    __mapper_args__ = {"polymorphic_identity": Role.MANAGER}
+
+    authorized_by_admin = relationship(
+        "Admin",
+        back_populates="authorized_managers",
+        foreign_keys=[Person.authorized_by],
+        remote_side=[Person.id],
+    )
+
+
+class Admin(Person):
+    __mapper_args__ = {"polymorphic_identity": Role.ADMIN}
+
+    authorized_managers = relationship(
+        "Manager", back_populates="authorized_by_admin", foreign_keys=[Person.authorized_by]
+    )
+
+
+class AuthToken(Base):
+    __tablename__ = "auth_tokens"
+    key = Column(String(64), primary_key=True)
+    token = Column(String(16), nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+
+class Job(Base, Timestamp):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(VARCHAR(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
 
-    authorized_managers = relationship("Manager", back_populates="authorized_by_admin")
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
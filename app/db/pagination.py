@@ -0,0 +1,115 @@
+"""Keyset (cursor) pagination for the listing endpoints.
+
+A cursor is the sort key of the last row served, as url-safe base64 JSON
+that clients treat as opaque. The next page is "rows after that key" in
+the listing's order, which an index on the sort keys answers with a range
+scan: page 10,000 costs what page 1 does, and rows inserted meanwhile do
+not shift later pages. The primary key is appended as a tiebreaker so the
+order is total.
+
+NULLs in the leading key keep the database's own placement (after every
+value on Postgres, before them on SQLite), so the order is the one offset
+mode always had and a plain index serves both directions. A page that
+crosses between the NULL and non-NULL rows takes one extra query.
+"""
+import base64
+import datetime
+import json
+import uuid
+from typing import Optional
+
+from sqlalchemy import and_, or_, tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _load(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type in (datetime.date, datetime.datetime):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def _beyond(keys, values):
+    """Rows strictly after ``values`` in the order of ``keys``; no NULLs."""
+    if len({descending for _, descending in keys}) == 1:
+        row, bound = tuple_(*(column for column, _ in keys)), tuple_(*values)
+        return row < bound if keys[0][1] else row > bound
+    # mixed directions have no row-value form; the leading range keeps it indexable
+    (column, descending), value = keys[0], values[0]
+    if descending:
+        return and_(column <= value, or_(column < value, and_(column == value, _beyond(keys[1:], values[1:]))))
+    return and_(column >= value, or_(column > value, and_(column == value, _beyond(keys[1:], values[1:]))))
+
+
+class Keyset:
+    """The order of one listing: ``(column, descending)`` keys, then ``tiebreaker``.
+
+    Only the leading key may be nullable; the tiebreaker sorts like the last key.
+    """
+
+    def __init__(self, tiebreaker, *keys):
+        self.keys = list(keys) + [(tiebreaker, keys[-1][1])]
+        if any(column.expression.nullable for column, _ in self.keys[1:]):
+            raise ValueError("only the leading keyset column may be nullable")
+        self.nullable = self.keys[0][0].expression.nullable
+        self.signature = "".join("d" if descending else "a" for _, descending in self.keys)
+
+    def order_by(self):
+        return [column.desc() if descending else column.asc() for column, descending in self.keys]
+
+    def encode(self, row) -> str:
+        payload = {"o": self.signature, "k": [_dump(getattr(row, column.key)) for column, _ in self.keys]}
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> list:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if payload["o"] != self.signature or len(payload["k"]) != len(self.keys):
+                raise ValueError("cursor belongs to a different sort order")
+            return [_load(column, value) for (column, _), value in zip(self.keys, payload["k"])]
+        except (ValueError, KeyError, TypeError) as e:
+            raise InvalidCursor(f"invalid cursor: {e}") from None
+
+    def _segments(self, dialect_name: str, values: list) -> list:
+        leading, descending = self.keys[0]
+        if not self.nullable:
+            return [_beyond(self.keys, values)]
+        nulls_last = (dialect_name == "postgresql") != descending
+        if values[0] is None:
+            segments = [and_(leading.is_(None), _beyond(self.keys[1:], values[1:]))]
+            return segments if nulls_last else segments + [leading.is_not(None)]
+        segments = [_beyond(self.keys, values)]
+        return segments + [leading.is_(None)] if nulls_last else segments
+
+    async def page(self, db, query, limit: int, cursor: Optional[str] = None, offset: int = 0, core: bool = False):
+        """``(rows, next_cursor)`` for the page after ``cursor``, or at ``offset`` without one.
+
+        With ``core`` the page holds the Core rows of a column select (which
+        must include the keyset columns under their own names) instead of
+        ORM instances.
+        """
+        fetch = db.execute if core else db.scalars
+        ordered = query.order_by(*self.order_by())
+        if cursor is None:
+            rows = (await fetch(ordered.offset(offset).limit(limit + 1))).all()
+        else:
+            rows = []
+            for segment in self._segments(db.bind.dialect.name, self.decode(cursor)):
+                rows += (await fetch(ordered.where(segment).limit(limit + 1 - len(rows)))).all()
+                if len(rows) > limit:
+                    break
+        next_cursor = self.encode(rows[limit - 1]) if 0 < limit < len(rows) else None
+        return rows[:limit], next_cursor
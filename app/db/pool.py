@@ -0,0 +1,299 @@
+"""Connection pool configuration and instrumentation.
+
+Pool settings come from the environment and are validated when
+``db.database`` is imported, so a bad value stops the app at startup:
+
+* ``DB_POOL_SIZE`` (5) connections kept open per engine
+* ``DB_MAX_OVERFLOW`` (10) extra connections allowed during bursts
+* ``DB_POOL_TIMEOUT`` (30) seconds a request waits for a free connection
+* ``DB_POOL_RECYCLE`` (1800) seconds before a connection is replaced, -1 to never
+* ``DB_POOL_PRE_PING`` (true) test connections on checkout, dropping stale ones
+* ``DB_SLOW_CHECKOUT_SECONDS`` (5) hold time after which a warning is printed
+
+Every engine gets a ``PoolMonitor`` that records checkout waits, timeouts and
+how long each route holds its connection. ``RouteContextMiddleware`` tells the
+monitor which route a connection belongs to.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+_current_scope = contextvars.ContextVar("db_pool_request_scope", default=None)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    if value.lower() in ("1", "true", "yes", "on"):
+        return True
+    if value.lower() in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"{name} must be true or false, got {value!r}")
+
+
+def _env_number(name: str, default, cast):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}")
+
+
+class PoolSettings:
+    def __init__(
+        self,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = True,
+        slow_checkout_seconds: float = 5.0,
+    ):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pool_pre_ping = pool_pre_ping
+        self.slow_checkout_seconds = slow_checkout_seconds
+        self.validate()
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        return cls(
+            pool_size=_env_number("DB_POOL_SIZE", 5, int),
+            max_overflow=_env_number("DB_MAX_OVERFLOW", 10, int),
+            pool_timeout=_env_number("DB_POOL_TIMEOUT", 30.0, float),
+            pool_recycle=_env_number("DB_POOL_RECYCLE", 1800, int),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+            slow_checkout_seconds=_env_number("DB_SLOW_CHECKOUT_SECONDS", 5.0, float),
+        )
+
+    def validate(self):
+        if self.pool_size < 1:
+            raise ValueError("DB_POOL_SIZE must be at least 1")
+        if self.max_overflow < -1:
+            raise ValueError("DB_MAX_OVERFLOW must be -1 (unlimited) or more")
+        if self.pool_timeout <= 0:
+            raise ValueError("DB_POOL_TIMEOUT must be greater than 0")
+        if self.pool_recycle == 0 or self.pool_recycle < -1:
+            raise ValueError("DB_POOL_RECYCLE must be -1 (never) or a positive number of seconds")
+        if self.slow_checkout_seconds <= 0:
+            raise ValueError("DB_SLOW_CHECKOUT_SECONDS must be greater than 0")
+
+    def engine_kwargs(self, url, is_async: bool = False) -> dict:
+        """``create_engine`` pool arguments for ``url``.
+
+        SQLite keeps the pool its dialect picks (single-thread, static or
+        null pools do not take size/overflow settings).
+        """
+        if make_url(url).get_backend_name() == "sqlite":
+            return {}
+        return {
+            "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+            "slow_checkout_seconds": self.slow_checkout_seconds,
+        }
+
+
+class _TimedCheckout:
+    """Times how long ``_do_get`` waits for a connection; see ``PoolMonitor``."""
+
+    _monitor = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self._monitor is not None:
+                self._monitor.record_timeout(time.perf_counter() - started)
+            raise
+        if self._monitor is not None:
+            self._monitor.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool._monitor = self._monitor
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def current_route() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {path}".strip()
+
+
+class RouteContextMiddleware:
+    """Remembers the request scope so pool events can name the route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+class _RouteStats:
+    __slots__ = ("checkouts", "total_seconds", "max_seconds", "slow")
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.slow = 0
+
+
+class PoolMonitor:
+    def __init__(self, name: str, slow_checkout_seconds: float = 5.0):
+        self.name = name
+        self.slow_checkout_seconds = slow_checkout_seconds
+        self.engine = None
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_total = 0.0
+        self.waits = 0
+        self.timeouts = 0
+        self.routes = {}
+        self._held = {}
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        """Start recording for ``engine`` (a sync ``Engine``)."""
+        self.engine = engine
+        if isinstance(engine.pool, _TimedCheckout):
+            engine.pool._monitor = self
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        return self
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_counts[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+            self.wait_total += seconds
+            self.waits += 1
+
+    def record_timeout(self, seconds: float):
+        with self._lock:
+            self.timeouts += 1
+        print(f"db pool {self.name}: no connection after {seconds:.1f}s for {current_route()}")
+
+    def _on_checkout(self, dbapi_connection, record, proxy):
+        route = current_route()
+        with self._lock:
+            self._held[id(record)] = (route, time.monotonic())
+
+    def _on_checkin(self, dbapi_connection, record):
+        with self._lock:
+            held = self._held.pop(id(record), None)
+            if held is None:
+                return
+            route, since = held
+            seconds = time.monotonic() - since
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = _RouteStats()
+            stats.checkouts += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            slow = seconds >= self.slow_checkout_seconds
+            if slow:
+                stats.slow += 1
+        if slow:
+            print(f"db pool {self.name}: connection held {seconds:.2f}s by {route}")
+
+    def _pool_counts(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None
+        counts = {"pool_class": type(pool).__name__ if pool is not None else None}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, name, None)
+            counts[name] = method() if callable(method) else None
+        return counts
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            histogram = {f"le_{bound:g}s": count for bound, count in zip(WAIT_BUCKETS, self.wait_counts)}
+            histogram["inf"] = self.wait_counts[-1]
+            routes = {
+                route: {
+                    "checkouts": stats.checkouts,
+                    "avg_seconds": round(stats.total_seconds / stats.checkouts, 4),
+                    "max_seconds": round(stats.max_seconds, 4),
+                    "slow": stats.slow,
+                }
+                for route, stats in self.routes.items()
+            }
+            held = sorted(
+                ({"route": route, "seconds": round(now - since, 3)} for route, since in self._held.values()),
+                key=lambda entry: -entry["seconds"],
+            )
+            waits = self.waits
+            wait_avg = self.wait_total / waits if waits else None
+            timeouts = self.timeouts
+        return {
+            **self._pool_counts(),
+            "checkout_wait": {
+                "count": waits,
+                "avg_seconds": None if wait_avg is None else round(wait_avg, 5),
+                "timeouts": timeouts,
+                "histogram": histogram,
+            },
+            "held_now": held,
+            "routes": routes,
+        }
+
+
+monitors = {}
+
+
+def instrument(engine, name: str, settings: Optional[PoolSettings] = None) -> PoolMonitor:
+    settings = settings or pool_settings
+    monitor = PoolMonitor(name, settings.slow_checkout_seconds).attach(engine)
+    monitors[name] = monitor
+    return monitor
+
+
+pool_settings = PoolSettings.from_env()
@@ -0,0 +1,242 @@
+"""Read-replica routing for ``get_db`` and ``get_async_db``.
+
+``DATABASE_REPLICA_URLS`` lists replica urls (comma separated). With none
+configured every session uses the primary, exactly as before. Otherwise a
+request gets a replica session when
+
+* it is a ``GET``/``HEAD`` request, or its endpoint is marked with
+  ``read_from_replica``, and it is not marked ``read_from_primary``,
+* the client has not written in the last ``READ_YOUR_WRITES_SECONDS``
+  (``ReadYourWritesMiddleware`` sets a cookie after successful writes), and
+* a replica is healthy and at most ``REPLICA_MAX_LAG_SECONDS`` behind.
+
+Health and lag are checked every ``REPLICA_HEALTH_INTERVAL_SECONDS`` by a
+task started in the app lifespan, and a connection error on a replica takes
+it out of rotation immediately; reads fall back to the primary until the
+next successful check.
+
+To try it locally, point ``DATABASE_URL`` and ``DATABASE_REPLICA_URLS`` at
+two SQLite files (copy the primary file to create the replica) or at two
+local Postgres instances.
+"""
+import asyncio
+import itertools
+import os
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from db.pool import instrument, pool_settings
+
+
+READ_YOUR_WRITES_COOKIE = "db_read_primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# seconds the replica is behind; 0 while it has replayed everything it received
+_POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def read_from_primary(endpoint):
+    """Mark a route that must see the primary, e.g. a GET that writes."""
+    endpoint.db_target = "primary"
+    return endpoint
+
+
+def read_from_replica(endpoint):
+    """Mark a read-only route that may use a replica despite its method."""
+    endpoint.db_target = "replica"
+    return endpoint
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.engine = create_engine(url, **pool_settings.engine_kwargs(url))
+        instrument(self.engine, name)
+        self._async_engine = None
+        self.healthy = True
+        self.lag_seconds = 0.0
+        self.last_checked = None
+        self.last_error = None
+        event.listen(self.engine, "handle_error", self._on_error)
+
+    @property
+    def async_engine(self):
+        if self._async_engine is None:
+            from db.database import async_url
+
+            url = async_url(self.url)
+            self._async_engine = create_async_engine(url, **pool_settings.engine_kwargs(url, is_async=True))
+            instrument(self._async_engine.sync_engine, f"{self.name}_async")
+            event.listen(self._async_engine.sync_engine, "handle_error", self._on_error)
+        return self._async_engine
+
+    def _on_error(self, context):
+        if context.is_disconnect or context.connection is None:
+            self.mark_unhealthy(str(context.original_exception))
+
+    def mark_unhealthy(self, reason: str):
+        if self.healthy:
+            print(f"replica {self.name} taken out of rotation: {reason}")
+        self.healthy = False
+        self.last_error = reason
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    lag = float(connection.execute(_POSTGRES_LAG_SQL).scalar() or 0)
+                else:
+                    connection.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            self.mark_unhealthy(str(e))
+        else:
+            if not self.healthy:
+                print(f"replica {self.name} is back in rotation")
+            self.healthy = True
+            self.lag_seconds = lag
+            self.last_error = None
+        self.last_checked = time.time()
+
+    async def dispose(self):
+        self.engine.dispose()
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "last_checked": self.last_checked,
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        urls: List[str],
+        max_lag_seconds: float = 10.0,
+        health_interval: float = 5.0,
+        read_your_writes_seconds: float = 5.0,
+    ):
+        self.replicas = [Replica(f"replica_{i}", url) for i, url in enumerate(urls)]
+        self.max_lag_seconds = max_lag_seconds
+        self.health_interval = health_interval
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.primary_fallbacks = 0
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()
+        self._task = None
+
+    @classmethod
+    def from_env(cls) -> "ReplicaRouter":
+        urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+        return cls(
+            urls,
+            max_lag_seconds=float(os.getenv("REPLICA_MAX_LAG_SECONDS", 10)),
+            health_interval=float(os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", 5)),
+            read_your_writes_seconds=float(os.getenv("READ_YOUR_WRITES_SECONDS", 5)),
+        )
+
+    def _usable(self, replica: Replica) -> bool:
+        return replica.healthy and replica.lag_seconds <= self.max_lag_seconds
+
+    def pick(self) -> Optional[Replica]:
+        """Next usable replica in round-robin order, or None for the primary."""
+        if not self.replicas:
+            return None
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = next(self._cycle)
+                if self._usable(replica):
+                    return replica
+            self.primary_fallbacks += 1
+        return None
+
+    def for_request(self, request) -> Optional[Replica]:
+        if not self.replicas or request is None:
+            return None
+        route = request.scope.get("route")
+        target = getattr(getattr(route, "endpoint", None), "db_target", None)
+        if target == "primary":
+            return None
+        if target != "replica" and request.method not in SAFE_METHODS:
+            return None
+        try:
+            if float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time():
+                return None
+        except ValueError:
+            pass
+        return self.pick()
+
+    def check_all(self):
+        for replica in self.replicas:
+            replica.check()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.check_all)
+            except Exception as e:
+                print(f"replica health check failed: {e}")
+            await asyncio.sleep(self.health_interval)
+
+    def start(self):
+        if self.replicas:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            await replica.dispose()
+
+    def status(self) -> dict:
+        return {
+            "max_lag_seconds": self.max_lag_seconds,
+            "read_your_writes_seconds": self.read_your_writes_seconds,
+            "primary_fallbacks": self.primary_fallbacks,
+            "replicas": [replica.status() for replica in self.replicas],
+        }
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary for a short while after it writes."""
+
+    def __init__(self, app, router: Optional[ReplicaRouter] = None):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        router = self.router or replica_router
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not router.replicas:
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                seconds = router.read_your_writes_seconds
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={time.time() + seconds:.3f}; "
+                    f"Max-Age={int(seconds) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+replica_router = ReplicaRouter.from_env()
@@ -2,17 +2,26 @@
 from fastapi import FastAPI, HTTPException, status
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 
 
-from db.database import engine
+from db.database import engine, dispose_async_engine
 from db.database import Base
-
-from api import user, museum
-import utils
+from db.pool import RouteContextMiddleware
+from db.replicas import ReadYourWritesMiddleware, replica_router
+from db.migrations import ensure_schema, forget_schema_fingerprint
+
+from api import user, museum, internal
+from api import search as search_api
+from services import image_variants, password_hashing, search, session_tokens
+from services.autocomplete import autocomplete_index
+from services.homepage import homepage_snapshot
+from services.jobs import job_worker
+from services.media import media_service
+from services.storage import LocalContentAddressedStorage
 
 import os
 from fastapi.responses import JSONResponse
-import cloudinary.uploader
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -20,9 +29,21 @@ from dotenv import load_dotenv
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     load_dotenv()
-    Base.metadata.create_all(bind=engine)
-    utils.initialize_cloudinary()
+    # fail at boot, not on the first login, when the signing keys are missing
+    session_tokens.get_key_ring()
+    ensure_schema(engine, Base.metadata)
+    job_worker.start()
+    replica_router.start()
+    autocomplete_index.start()
+    homepage_snapshot.start()
     yield
+    await homepage_snapshot.stop()
+    await autocomplete_index.stop()
+    await replica_router.stop()
+    await job_worker.stop()
+    password_hashing.shutdown()
+    image_variants.shutdown()
+    await dispose_async_engine()
     
 
 app = FastAPI(lifespan=lifespan)
@@ -41,6 +62,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(RouteContextMiddleware)
 
 
 
@@ -48,11 +71,23 @@ app.add_middleware(
 # routers
 app.include_router(user.router, prefix="/api/v1/user")
 app.include_router(museum.router, prefix="/api/v1/museum")
+app.include_router(internal.router, prefix="/api/v1/internal")
+app.include_router(search_api.router, prefix="/api/v1")
+
+if isinstance(media_service.storage, LocalContentAddressedStorage):
+    app.mount(
+        media_service.storage.blob_url,
+        StaticFiles(directory=media_service.storage.blob_dir),
+        name="media",
+    )
 
 
 @app.get('/api/v1/drop_all_tables')
 async def drop_tables():
     Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        search.drop_index(connection)
+    forget_schema_fingerprint(engine, migrations=True)
     return {"message": "Tables dropped successfully"}
 @app.get("/api/v1/health")
 async def health():
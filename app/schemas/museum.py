@@ -1,4 +1,4 @@
-from pydantic import BaseModel, UUID4, Json
+from pydantic import BaseModel, UUID4, Json, conlist
 from db.models.data_types import Role
 from db.models.data_types import (
     EpochTypeEnum,
@@ -9,8 +9,9 @@ from db.models.data_types import (
     ArtObjectType
 )
 import datetime
+import uuid
 from fastapi import Form
-from typing import Optional
+from typing import List, Optional
 
 class ArtistCreate(BaseModel):
     name: str
@@ -82,4 +83,122 @@ class ExhibitionCreate(BaseModel):
     
 class ExhibitionArtObjectAssociationCreate(BaseModel):
     art_object_id: UUID4
-    exhibition_id: UUID4   
\ No newline at end of file
+    exhibition_id: UUID4   
+
+class ExhibitionMembershipSync(BaseModel):
+    # the whole desired membership; it travels as bind parameters of one statement
+    art_object_ids: conlist(UUID4, max_length=30000)
+
+
+# response models of the listings; they document the payload, the handlers
+# send slotted rows through ORJSONResponse without validating against them
+class ArtistRead(BaseModel):
+    id: uuid.UUID
+    name: str
+    description: Optional[str] = None
+    artist_bio: Optional[str] = None
+    gender: Optional[GenderEnum] = None
+    origin_country: Optional[str] = None
+    date_of_birth: Optional[datetime.date] = None
+    date_of_died: Optional[datetime.date] = None
+    wiki_qid: Optional[str] = None
+    ulan: Optional[str] = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+class ArtObjectRead(BaseModel):
+    id: uuid.UUID
+    title: str
+    description: Optional[str] = None
+    dimensions: Optional[str] = None
+    department: Optional[str] = None
+    style: ObjectStyleEnum
+    object_type: ArtObjectType
+    epoch: Optional[str] = None
+    origin_country: Optional[str] = None
+    year: str
+    artist_id: Optional[uuid.UUID] = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+class SculptureRead(BaseModel):
+    id: uuid.UUID
+    material: str
+    height: Optional[str] = None
+    width: Optional[str] = None
+    weight: Optional[str] = None
+    # JSON list of urls in the requested image size
+    image: Optional[str] = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+class PaintingRead(BaseModel):
+    id: uuid.UUID
+    paint_type: str
+    drawn_on: str
+    image: Optional[str] = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+class OtherArtRead(BaseModel):
+    id: uuid.UUID
+    type: str
+    image: Optional[str] = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+class SculptureListingRead(ArtObjectRead):
+    sculpture: SculptureRead
+
+
+class PaintingListingRead(ArtObjectRead):
+    painting: PaintingRead
+
+
+class OtherArtListingRead(ArtObjectRead):
+    other: OtherArtRead
+
+
+class ExhibitionRead(BaseModel):
+    id: uuid.UUID
+    name: str
+    start_date: datetime.date
+    end_date: datetime.date
+    image: Optional[str] = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+class ArtistPage(BaseModel):
+    message: str
+    data: List[ArtistRead] = []
+    next_cursor: Optional[str] = None
+
+
+class SculpturePage(BaseModel):
+    message: str
+    data: List[SculptureListingRead] = []
+    next_cursor: Optional[str] = None
+
+
+class PaintingPage(BaseModel):
+    message: str
+    data: List[PaintingListingRead] = []
+    next_cursor: Optional[str] = None
+
+
+class OtherArtPage(BaseModel):
+    message: str
+    data: List[OtherArtListingRead] = []
+    next_cursor: Optional[str] = None
+
+
+class ExhibitionPage(BaseModel):
+    message: str
+    data: List[ExhibitionRead] = []
+    next_cursor: Optional[str] = None
@@ -0,0 +1,160 @@
+"""Set-based artist ingestion.
+
+Artists are deduplicated on ``name_normalized``, which has a unique index.
+A chunk of artists costs one ``INSERT ... ON CONFLICT DO NOTHING RETURNING``
+and, only when some names already existed, one ``SELECT`` for their ids.
+``ingest_ndjson`` reads a request body one line at a time and commits and
+reports after every chunk, so memory stays bounded by the chunk size no
+matter how long the upload is.
+"""
+import json
+from typing import AsyncIterator, List
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import StreamingResponse
+
+from db.bulk import insert_ignore_returning
+from db.models.person import Artist, normalize_name
+from schemas.museum import ArtistCreate
+from services import catalog_events
+
+
+ARTIST_FIELDS = (
+    "name",
+    "description",
+    "artist_bio",
+    "gender",
+    "origin_country",
+    "date_of_birth",
+    "date_of_died",
+    "wiki_qid",
+    "ulan",
+)
+
+MAX_ERRORS_PER_CHUNK = 10
+
+
+class ChunkResult:
+    __slots__ = ("inserted", "existing", "duplicates")
+
+    def __init__(self, inserted, existing, duplicates):
+        self.inserted = inserted
+        self.existing = existing
+        self.duplicates = duplicates
+
+
+async def ingest_chunk(db: AsyncSession, artists: List[ArtistCreate], returning=None) -> ChunkResult:
+    """Insert the artists whose normalized name is new; the caller commits.
+
+    ``inserted`` holds the ``returning`` columns (default id and name) of
+    new rows, ``existing`` the id and name of artists that were already
+    stored, and ``duplicates`` counts repeats within ``artists`` itself.
+    """
+    table = Artist.__table__
+    rows = {}
+    duplicates = 0
+    for artist in artists:
+        values = {field: getattr(artist, field) for field in ARTIST_FIELDS}
+        values["name_normalized"] = key = normalize_name(artist.name)
+        if key in rows:
+            duplicates += 1
+            continue
+        rows[key] = values
+    if not rows:
+        return ChunkResult([], [], duplicates)
+
+    returning = list(returning if returning is not None else (table.c.id, table.c.name))
+    statement = insert_ignore_returning(
+        db.bind.dialect.name, table, list(rows.values()), ["name_normalized"], returning
+    )
+    inserted = [dict(row) for row in (await db.execute(statement)).mappings()]
+    catalog_events.record(db, "artist", [row["id"] for row in inserted])
+    missing = set(rows) - {normalize_name(row["name"]) for row in inserted}
+    existing = []
+    if missing:
+        existing = [
+            dict(row)
+            for row in (
+                await db.execute(select(table.c.id, table.c.name).where(table.c.name_normalized.in_(missing)))
+            ).mappings()
+        ]
+    return ChunkResult(inserted, existing, duplicates)
+
+
+async def _lines(stream: AsyncIterator[bytes]):
+    pending = b""
+    async for data in stream:
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+async def ingest_ndjson(stream: AsyncIterator[bytes], session_factory, chunk_size: int = 1000):
+    """Progress dicts, one per committed chunk, then a final summary."""
+    totals = {"lines": 0, "inserted": 0, "existing": 0, "duplicates": 0, "invalid": 0}
+    chunk, errors, chunk_number = [], [], 0
+
+    async def flush():
+        nonlocal chunk, errors, chunk_number
+        chunk_number += 1
+        async with session_factory() as db:
+            result = await ingest_chunk(db, chunk)
+            await db.commit()
+        progress = {
+            "chunk": chunk_number,
+            "rows": len(chunk),
+            "inserted": len(result.inserted),
+            "existing": len(result.existing),
+            "duplicates": result.duplicates,
+            "errors": errors,
+        }
+        totals["inserted"] += progress["inserted"]
+        totals["existing"] += progress["existing"]
+        totals["duplicates"] += progress["duplicates"]
+        chunk, errors = [], []
+        return progress
+
+    async for line in _lines(stream):
+        totals["lines"] += 1
+        if not line.strip():
+            continue
+        try:
+            chunk.append(ArtistCreate.model_validate_json(line))
+        except ValidationError as e:
+            totals["invalid"] += 1
+            if len(errors) < MAX_ERRORS_PER_CHUNK:
+                errors.append({"line": totals["lines"], "error": e.errors(include_url=False)[0]["msg"]})
+        if len(chunk) >= chunk_size:
+            yield await flush()
+    if chunk or errors:
+        yield await flush()
+    yield {"done": True, **totals}
+
+
+async def ndjson_progress(stream, session_factory, chunk_size: int):
+    try:
+        async for progress in ingest_ndjson(stream, session_factory, chunk_size):
+            yield json.dumps(progress, default=str) + "\n"
+    except Exception as e:
+        # the status line is long gone; report the failure in the stream
+        print(f"artist ingest failed: {e}")
+        yield json.dumps({"done": False, "error": str(e)}) + "\n"
+
+
+class StreamingDuplexResponse(StreamingResponse):
+    """A ``StreamingResponse`` whose body may still read the request body.
+
+    ``StreamingResponse`` listens on ``receive`` for a disconnect while
+    streaming, which would swallow request body messages the generator
+    still needs.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,339 @@
+"""Prefix autocomplete over artist names, art object titles and exhibition names.
+
+Served entirely from memory, so a keystroke never reaches the database.
+Every item is indexed under the start of each of its first
+``MAX_WORDS_PER_ITEM`` words ("van gogh" and "gogh" both find "Vincent van
+Gogh"), normalized like ``normalize_name`` without accents and cut to
+``KEY_BYTES`` of UTF-8. Keys sit in one sorted fixed-width numpy array, so a prefix is a
+``searchsorted`` range (results for one- and two-byte prefixes, which span
+much of the index, are cached until the next change), and matches are
+ranked by popularity:
+
+* artist: number of art objects
+* art object: number of exhibitions showing it
+* exhibition: number of art objects shown
+
+The lifespan starts ``autocomplete_index``, which builds the index in the
+background. Catalog commits reach it through a ``catalog_events`` hook;
+the worker reloads the changed rows and adds them to a small sorted delta
+next to the built keys (replaced entries are recognised by a stale
+generation). The index is built again when the delta grows past
+``MAX_DELTA_ENTRIES`` or ``AUTOCOMPLETE_REBUILD_SECONDS`` have passed, which
+also picks up writes from other processes and membership changes.
+"""
+import asyncio
+import bisect
+import os
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+
+from db.models.person import normalize_name
+from services import catalog_events
+
+
+KINDS = ("artist", "art_object", "exhibition")
+KEY_BYTES = 32
+MAX_WORDS_PER_ITEM = 5
+MAX_DELTA_ENTRIES = 10_000
+# results for prefixes this short span much of the index and are kept until the next change
+CACHED_PREFIX_BYTES = 2
+AUTOCOMPLETE_REBUILD_SECONDS = float(os.getenv("AUTOCOMPLETE_REBUILD_SECONDS", "3600"))
+
+
+def _fold(text: str) -> str:
+    # "Élisabeth Vigée" is found by "elisabeth vigee" too
+    decomposed = unicodedata.normalize("NFKD", normalize_name(text))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _keys(label: Optional[str]) -> List[bytes]:
+    words = _fold(label or "").split(" ")
+    keys = []
+    for start in range(min(len(words), MAX_WORDS_PER_ITEM)):
+        key = " ".join(words[start:]).encode()[:KEY_BYTES]
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def _prefix(query: str) -> bytes:
+    # one byte short of a key, so ``prefix + b"\xff"`` still fits the key width
+    return _fold(query).encode()[: KEY_BYTES - 1]
+
+
+class PrefixIndex:
+    """Items ``(kind, id, label, weight)`` reachable by the prefixes of their keys.
+
+    Items are numbered; per item the index keeps its kind, id, label, weight
+    and a generation that ``update`` bumps. Built keys are a sorted numpy
+    ``S{KEY_BYTES}`` array with the item and generation of each key; keys
+    added later go to a sorted list. A key whose generation is no longer
+    its item's is skipped.
+    """
+
+    def __init__(self, items: Iterable[tuple] = ()):
+        import numpy as np
+
+        self._number = {}
+        self._kind, self._id, self._label = [], [], []
+        weights, keys, owners = [], [], []
+        for kind, id, label, weight in items:
+            number = self._number[(kind, id)] = len(self._id)
+            self._kind.append(KINDS.index(kind))
+            self._id.append(id)
+            self._label.append(label)
+            weights.append(weight)
+            for key in _keys(label):
+                keys.append(key)
+                owners.append(number)
+        keys = np.array(keys, dtype=f"S{KEY_BYTES}")
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._owner = np.asarray(owners, dtype=np.int32)[order]
+        self._owner_generation = np.zeros(len(self._owner), dtype=np.int32)
+        self._weight = np.asarray(weights, dtype=np.int64)
+        self._generation = np.zeros(len(self._id), dtype=np.int32)
+        self._kind_code = np.asarray(self._kind, dtype=np.int8)
+        self._delta = []
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return len(self._number)
+
+    @property
+    def delta_size(self) -> int:
+        return len(self._delta)
+
+    def _grow(self):
+        import numpy as np
+
+        if len(self._id) > len(self._weight):
+            size = max(len(self._id), 2 * len(self._weight))
+            self._weight = np.resize(self._weight, size)
+            self._generation = np.resize(self._generation, size)
+            self._kind_code = np.resize(self._kind_code, size)
+
+    def update(self, kind: str, id, label: str, weight: int):
+        self._cache.clear()
+        number = self._number.get((kind, id))
+        if number is None:
+            number = self._number[(kind, id)] = len(self._id)
+            self._kind.append(KINDS.index(kind))
+            self._id.append(id)
+            self._label.append(None)
+            self._grow()
+            self._kind_code[number] = KINDS.index(kind)
+            self._generation[number] = 0
+        self._weight[number] = weight
+        if label == self._label[number]:
+            return
+        self._label[number] = label
+        self._generation[number] += 1
+        for key in _keys(label):
+            bisect.insort(self._delta, (key, number, int(self._generation[number])))
+
+    def remove(self, kind: str, id):
+        number = self._number.pop((kind, id), None)
+        if number is not None:
+            self._cache.clear()
+            # no key carries a negative generation
+            self._generation[number] = -1
+
+    def query(self, text: str, kinds: Optional[Iterable[str]] = None, limit: int = 10) -> List[dict]:
+        import numpy as np
+
+        prefix = _prefix(text)
+        if not prefix:
+            return []
+        codes = sorted({KINDS.index(kind) for kind in kinds}) if kinds else None
+        cache_key = (prefix, tuple(codes or ()), limit)
+        if len(prefix) <= CACHED_PREFIX_BYTES and cache_key in self._cache:
+            return self._cache[cache_key]
+        # every key starting with ``prefix`` sorts between these two
+        low, high = np.searchsorted(self._keys, [prefix, prefix + b"\xff"])
+        owners = self._owner[low:high]
+        generations = self._owner_generation[low:high]
+        live = self._generation[owners] == generations
+        if codes is not None:
+            live &= np.isin(self._kind_code[owners], codes)
+        owners = owners[live]
+        # best first; an item has up to MAX_WORDS_PER_ITEM keys under one prefix
+        if len(owners) > limit * MAX_WORDS_PER_ITEM:
+            top = np.argpartition(-self._weight[owners], limit * MAX_WORDS_PER_ITEM)[: limit * MAX_WORDS_PER_ITEM]
+            owners = owners[top]
+        found = set(owners.tolist())
+        at = bisect.bisect_left(self._delta, (prefix,))
+        while at < len(self._delta) and self._delta[at][0].startswith(prefix):
+            _, number, generation = self._delta[at]
+            if self._generation[number] == generation and (codes is None or self._kind[number] in codes):
+                found.add(number)
+            at += 1
+        ranked = sorted(found, key=lambda number: (-int(self._weight[number]), len(self._label[number]), self._label[number]))
+        results = [
+            {"kind": KINDS[self._kind[number]], "id": self._id[number], "label": self._label[number]}
+            for number in ranked[:limit]
+        ]
+        if len(prefix) <= CACHED_PREFIX_BYTES:
+            self._cache[cache_key] = results
+        return results
+
+
+def _load(connection, kind: str, ids=None) -> list:
+    """``(kind, id, label, weight)`` of the rows of ``kind`` (all, or ``ids``)."""
+    from db.models.person import ArtObject, Artist, Exhibition, ExhibitionArtObjectAssociation as Member
+
+    if kind == "artist":
+        statement = (
+            select(Artist.id, Artist.name, func.count(ArtObject.id))
+            .outerjoin(ArtObject, ArtObject.artist_id == Artist.id)
+            .group_by(Artist.id, Artist.name)
+        )
+        model = Artist
+    elif kind == "art_object":
+        statement = (
+            select(ArtObject.id, ArtObject.title, func.count(Member.exhibition_id))
+            .outerjoin(Member, Member.art_object_id == ArtObject.id)
+            .group_by(ArtObject.id, ArtObject.title)
+        )
+        model = ArtObject
+    else:
+        statement = (
+            select(Exhibition.id, Exhibition.name, func.count(Member.art_object_id))
+            .outerjoin(Member, Member.exhibition_id == Exhibition.id)
+            .group_by(Exhibition.id, Exhibition.name)
+        )
+        model = Exhibition
+    if ids is None:
+        return [(kind, id, label, weight) for id, label, weight in connection.execute(statement)]
+    rows = []
+    ids = list(ids)
+    for start in range(0, len(ids), 1000):
+        chunk = statement.where(model.id.in_(ids[start:start + 1000]))
+        rows += [(kind, id, label, weight) for id, label, weight in connection.execute(chunk)]
+    return rows
+
+
+class AutocompleteIndex:
+    """The process's ``PrefixIndex``, built and kept current by a background task."""
+
+    def __init__(self, rebuild_seconds: float = AUTOCOMPLETE_REBUILD_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self.index: Optional[PrefixIndex] = None
+        self.built_at = None
+        self._pending: Dict[str, Set] = {}
+        self._lock = threading.Lock()
+        self._task = None
+        self._wake = None
+        self._loop = None
+
+    @property
+    def ready(self) -> bool:
+        return self.index is not None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self, changes):
+        """Queue committed changes; safe to call from any thread."""
+        if self._task is None:
+            # this process does not serve autocomplete
+            return
+        with self._lock:
+            for kind in KINDS:
+                if changes.get(kind):
+                    self._pending.setdefault(kind, set()).update(changes[kind])
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def suggest(self, text: str, kinds: Optional[List[str]] = None, limit: int = 10) -> List[dict]:
+        if self.index is None:
+            return []
+        with self._lock:
+            return self.index.query(text, kinds, limit)
+
+    def build(self):
+        from db.database import engine
+
+        started = time.monotonic()
+        with engine.connect() as connection:
+            items = [item for kind in KINDS for item in _load(connection, kind)]
+        index = PrefixIndex(items)
+        with self._lock:
+            self.index, self.built_at = index, started
+        print(f"autocomplete index built: {len(index)} items in {time.monotonic() - started:.1f}s")
+
+    def apply_pending(self):
+        from db.database import engine
+        from db.models.person import ArtObject
+
+        if self.index is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        with engine.connect() as connection:
+            art_objects = pending.get("art_object")
+            if art_objects:
+                # an artist's weight counts their art objects
+                artists = pending.setdefault("artist", set())
+                for start in range(0, len(art_objects), 1000):
+                    chunk = list(art_objects)[start:start + 1000]
+                    artists.update(
+                        connection.execute(
+                            select(ArtObject.artist_id).where(ArtObject.id.in_(chunk), ArtObject.artist_id.is_not(None))
+                        ).scalars()
+                    )
+            rows = {kind: _load(connection, kind, ids) for kind, ids in pending.items() if ids}
+        with self._lock:
+            for kind, ids in pending.items():
+                found = set()
+                for _, id, label, weight in rows.get(kind, ()):
+                    self.index.update(kind, id, label, weight)
+                    found.add(id)
+                for id in ids:
+                    if id not in found:
+                        self.index.remove(kind, id)
+
+    def _due(self) -> bool:
+        return (
+            self.index is None
+            or self.index.delta_size > MAX_DELTA_ENTRIES
+            or time.monotonic() - self.built_at > self.rebuild_seconds
+        )
+
+    async def _run(self):
+        while True:
+            # cleared first, so a commit during the work below runs another round
+            self._wake.clear()
+            try:
+                if self._due():
+                    await asyncio.to_thread(self.build)
+                await asyncio.to_thread(self.apply_pending)
+            except Exception as e:
+                print(f"autocomplete index: update failed: {e}")
+            try:
+                # the timeout retries a failed build and ages the index
+                await asyncio.wait_for(self._wake.wait(), timeout=min(self.rebuild_seconds, 60))
+            except asyncio.TimeoutError:
+                pass
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+@catalog_events.after_commit
+def _on_catalog_change(changes):
+    autocomplete_index.notify(changes)
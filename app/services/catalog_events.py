@@ -0,0 +1,115 @@
+"""Change notifications for structures derived from the catalog.
+
+Art objects (including their sculpture, painting and other-art rows),
+artists and exhibitions written through an ORM session are collected at
+flush time as ``{kind: {id, ...}}``. Subscribers see them in two places:
+
+* ``in_transaction`` hooks run in ``before_commit`` on the session's
+  connection, so what they write commits or rolls back with the change;
+* ``after_commit`` hooks run once the change is committed, for in-process
+  caches. Their errors are logged, never raised.
+
+Hooks get every touched id and reload what they need, so inserts, updates
+and deletes look the same to them. Core statements bypass the ORM; bulk
+writers report their rows with ``record`` (inside a session) or with
+``run_in_transaction`` and ``run_after_commit`` (on a bare connection).
+
+Subscribers are the modules in ``SUBSCRIBERS``, imported on first use, so
+every process that writes to the catalog keeps them up to date.
+"""
+import importlib
+from typing import Callable, Dict, Iterable, List, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+KINDS_BY_TABLE = {
+    "art_objects": "art_object",
+    "sculptures": "art_object",
+    "paintings": "art_object",
+    "other_arts": "art_object",
+    "artists": "artist",
+    "exhibitions": "exhibition",
+}
+SUBSCRIBERS = ("services.search", "services.fuzzy_match", "services.autocomplete", "services.homepage")
+
+Changes = Dict[str, Set]
+
+_in_transaction: List[Callable] = []
+_after_commit: List[Callable] = []
+_loaded = False
+
+
+def in_transaction(hook: Callable):
+    """Register ``hook(connection, changes)``; usable as a decorator."""
+    _in_transaction.append(hook)
+    return hook
+
+
+def after_commit(hook: Callable):
+    """Register ``hook(changes)``; usable as a decorator."""
+    _after_commit.append(hook)
+    return hook
+
+
+def _load_subscribers():
+    global _loaded
+    if not _loaded:
+        _loaded = True
+        for module in SUBSCRIBERS:
+            importlib.import_module(module)
+
+
+def _pending(session) -> Changes:
+    return session.info.setdefault("catalog_changes", {})
+
+
+def record(session, kind: str, ids: Iterable):
+    """Report rows written with Core statements through ``session``."""
+    session = getattr(session, "sync_session", session)
+    _pending(session).setdefault(kind, set()).update(ids)
+
+
+def run_in_transaction(connection, changes: Changes):
+    _load_subscribers()
+    for hook in _in_transaction:
+        hook(connection, changes)
+
+
+def run_after_commit(changes: Changes):
+    _load_subscribers()
+    for hook in _after_commit:
+        try:
+            hook(changes)
+        except Exception as e:
+            print(f"catalog after-commit hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        kind = KINDS_BY_TABLE.get(getattr(instance, "__tablename__", None))
+        if kind is not None:
+            _pending(session).setdefault(kind, set()).add(instance.id)
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    # flush first so changes still pending in the session are collected too
+    session.flush()
+    changes = session.info.get("catalog_changes")
+    if changes:
+        run_in_transaction(session.connection(), changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session):
+    changes = session.info.pop("catalog_changes", None)
+    if changes:
+        run_after_commit(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _rolled_back(session):
+    session.info.pop("catalog_changes", None)
@@ -0,0 +1,233 @@
+"""Bulk catalog import of art objects and their subtype rows from CSV or Parquet.
+
+Columns (header names are case-insensitive):
+
+* required: ``title``, ``style``, ``object_type``, ``year``
+* by type: ``material`` (sculpture), ``paint_type`` and ``drawn_on``
+  (painting), ``other_art_type`` (other)
+* optional: ``description``, ``dimensions``, ``department``, ``epoch``,
+  ``origin_country``, ``height``, ``width``, ``weight``, ``artist_id`` and
+  ``artist_name`` (used when ``artist_id`` is blank, matched on the
+  normalized name)
+
+Validation runs on whole columns: required values, enum values and column
+lengths. Artists are resolved for all distinct names with one query and a
+merge. Valid rows are inserted in one transaction with batched executemany
+(which SQLAlchemy sends as multi-row INSERTs) and reported to
+``catalog_events``, which indexes them for search in the same transaction.
+Invalid rows are skipped and listed in the report with their row number
+(1 = first data row).
+
+From the ``app`` directory, with ``DATABASE_URL`` set:
+
+    python -m services.catalog_import catalog.csv [--dry-run]
+"""
+import argparse
+import json
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy import select
+
+from db.bulk import chunked
+from db.models.data_types import ArtObjectType, ObjectStyleEnum
+from db.models.person import ArtObject, Artist, OtherArt, Painting, Sculpture, normalize_name
+from services import catalog_events
+
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+UUID_PATTERN = r"[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}"
+
+REQUIRED_COLUMNS = ("title", "style", "object_type", "year")
+ART_OBJECT_COLUMNS = ("title", "description", "dimensions", "department", "epoch", "origin_country", "year")
+# catalog column -> model column, per subtype
+SUBTYPES = {
+    ArtObjectType.SCULPTURE: (Sculpture, {"material": "material", "height": "height", "width": "width", "weight": "weight"}),
+    ArtObjectType.PAINTING: (Painting, {"paint_type": "paint_type", "drawn_on": "drawn_on"}),
+    ArtObjectType.OTHER: (OtherArt, {"other_art_type": "type"}),
+}
+
+
+class CatalogError(Exception):
+    """The file as a whole cannot be imported (unreadable, missing columns)."""
+
+
+def read_catalog(source, filename: Optional[str] = None):
+    """The catalog as a frame of stripped strings, with blanks as NA."""
+    import pandas as pd
+
+    name = (filename or (source if isinstance(source, str) else "")).lower()
+    try:
+        if name.endswith((".parquet", ".pq")):
+            frame = pd.read_parquet(source)
+        else:
+            frame = pd.read_csv(source, dtype=str, keep_default_na=False)
+    except Exception as e:
+        raise CatalogError(f"could not read catalog: {e}")
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    frame = frame.astype("string")
+    for column in frame.columns:
+        frame[column] = frame[column].str.strip().replace("", pd.NA)
+    return frame.reset_index(drop=True)
+
+
+class _Errors:
+    def __init__(self, frame):
+        self.frame = frame
+        self.parts = []
+
+    def flag(self, mask, column: str, message: str):
+        import pandas as pd
+
+        mask = mask.fillna(False).astype(bool)
+        if mask.any():
+            rows = self.frame.index[mask.to_numpy()]
+            self.parts.append(pd.DataFrame({"row": rows + 1, "column": column, "error": message}))
+
+    def rows(self):
+        import pandas as pd
+
+        if not self.parts:
+            return pd.DataFrame({"row": [], "column": [], "error": []})
+        return pd.concat(self.parts, ignore_index=True).sort_values("row", kind="stable")
+
+
+def _check_lengths(frame, errors, column: str, model_column):
+    length = getattr(model_column.type, "length", None)
+    if length and column in frame:
+        errors.flag(frame[column].str.len() > length, column, f"longer than {length} characters")
+
+
+def _resolve_artists(frame, errors, connection):
+    """Artist ids for every row: ``artist_id`` when given, else ``artist_name``.
+
+    Each column costs one lookup of its distinct values (in chunks of
+    ``BATCH_SIZE``) and a vectorized match, never a query per row.
+    """
+    import pandas as pd
+
+    table = Artist.__table__
+    resolved = pd.Series([None] * len(frame), index=frame.index, dtype=object)
+    if "artist_id" in frame:
+        valid = frame["artist_id"].str.fullmatch(UUID_PATTERN).fillna(False).astype(bool)
+        errors.flag(frame["artist_id"].notna() & ~valid, "artist_id", "not a uuid")
+        ids = frame["artist_id"].where(valid).map(uuid.UUID, na_action="ignore")
+        known = set()
+        for chunk in chunked(ids.dropna().unique().tolist(), BATCH_SIZE):
+            known.update(connection.execute(select(table.c.id).where(table.c.id.in_(chunk))).scalars())
+        errors.flag(valid & ~ids.isin(known), "artist_id", "unknown artist")
+        resolved = ids.where(ids.isin(known), None)
+    if "artist_name" in frame:
+        by_name = resolved.isna() & frame["artist_name"].notna()
+        if "artist_id" in frame:
+            by_name &= frame["artist_id"].isna()
+        keys = frame["artist_name"].where(by_name).map(normalize_name, na_action="ignore")
+        matches = []
+        for names in chunked(keys.dropna().unique().tolist(), BATCH_SIZE):
+            matches.extend(
+                connection.execute(
+                    select(table.c.name_normalized, table.c.id).where(table.c.name_normalized.in_(names))
+                ).all()
+            )
+        artists = pd.DataFrame(matches, columns=["artist_key", "artist_id"])
+        merged = pd.DataFrame({"artist_key": keys}).merge(artists, on="artist_key", how="left")
+        found = merged["artist_id"].set_axis(frame.index)
+        errors.flag(keys.notna() & found.isna(), "artist_name", "unknown artist")
+        resolved = resolved.where(~by_name, found.astype(object))
+    return resolved.where(resolved.notna(), None)
+
+
+def _records(frame):
+    """Rows as dicts with NA turned into None."""
+    # to_dict("records") boxes every cell one by one; the values are already plain objects
+    frame = frame.astype(object).where(frame.notna(), None)
+    columns = list(frame.columns)
+    return [dict(zip(columns, row)) for row in frame.itertuples(index=False, name=None)]
+
+
+def import_catalog(source, filename: Optional[str] = None, dry_run: bool = False, engine=None) -> dict:
+    started = time.perf_counter()
+    if engine is None:
+        from db.database import engine
+    frame = read_catalog(source, filename)
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame]
+    if missing:
+        raise CatalogError(f"missing required columns: {', '.join(missing)}")
+
+    errors = _Errors(frame)
+    for column in REQUIRED_COLUMNS:
+        errors.flag(frame[column].isna(), column, "required")
+    object_type = frame["object_type"].str.lower()
+    style = frame["style"].str.lower()
+    types = [member.value for member in ArtObjectType]
+    styles = [member.value for member in ObjectStyleEnum]
+    errors.flag(object_type.notna() & ~object_type.isin(types), "object_type", f"must be one of {', '.join(types)}")
+    errors.flag(style.notna() & ~style.isin(styles), "style", f"must be one of {', '.join(styles)}")
+    art_objects = ArtObject.__table__
+    for column in ART_OBJECT_COLUMNS:
+        _check_lengths(frame, errors, column, art_objects.c[column])
+    for kind, (model, columns) in SUBTYPES.items():
+        is_kind = object_type == kind.value
+        for column, model_column in columns.items():
+            if not model.__table__.c[model_column].nullable:
+                if column not in frame:
+                    errors.flag(is_kind, column, f"required for {kind.value}")
+                    continue
+                errors.flag(is_kind & frame[column].isna(), column, f"required for {kind.value}")
+            _check_lengths(frame, errors, column, model.__table__.c[model_column])
+
+    changes = None
+    with engine.begin() as connection:
+        artist_ids = _resolve_artists(frame, errors, connection)
+        error_rows = errors.rows()
+        invalid = frame.index.isin(error_rows["row"] - 1)
+        valid = frame[~invalid]
+        imported = {kind.value: 0 for kind in ArtObjectType}
+        if not dry_run and len(valid):
+            ids = [uuid.uuid4() for _ in range(len(valid))]
+            base = valid.reindex(columns=list(ART_OBJECT_COLUMNS))
+            base.insert(0, "id", ids)
+            base["style"] = style[~invalid].map(ObjectStyleEnum).to_numpy()
+            base["object_type"] = object_type[~invalid].map(ArtObjectType).to_numpy()
+            base["artist_id"] = artist_ids[~invalid].to_numpy()
+            for batch in chunked(_records(base), BATCH_SIZE):
+                connection.execute(art_objects.insert(), batch)
+            for kind, (model, columns) in SUBTYPES.items():
+                rows = valid[(object_type[~invalid] == kind.value).to_numpy()]
+                if not len(rows):
+                    continue
+                subtype = rows.reindex(columns=list(columns)).rename(columns=columns)
+                subtype.insert(0, "id", base["id"][(base["object_type"] == kind).to_numpy()].to_numpy())
+                for batch in chunked(_records(subtype), BATCH_SIZE):
+                    connection.execute(model.__table__.insert(), batch)
+                imported[kind.value] = len(rows)
+            changes = {"art_object": set(ids)}
+            catalog_events.run_in_transaction(connection, changes)
+    if changes:
+        catalog_events.run_after_commit(changes)
+
+    return {
+        "rows": len(frame),
+        "valid": len(valid),
+        "invalid": int(invalid.sum()),
+        "imported": imported if not dry_run else None,
+        "dry_run": dry_run,
+        "seconds": round(time.perf_counter() - started, 3),
+        "errors": _records(error_rows.head(MAX_REPORTED_ERRORS)),
+        "errors_truncated": len(error_rows) > MAX_REPORTED_ERRORS,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="a .csv or .parquet file")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    args = parser.parse_args()
+    report = import_catalog(args.path, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
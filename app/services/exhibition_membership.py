@@ -0,0 +1,58 @@
+"""Replace the art objects of an exhibition with a desired set.
+
+The diff is computed by the database, one statement per direction:
+
+* ``DELETE ... WHERE art_object_id NOT IN (desired) RETURNING`` for removals
+* ``INSERT ... SELECT id FROM art_objects WHERE id IN (desired)
+  ON CONFLICT DO NOTHING RETURNING`` for additions, which also skips ids
+  that are not art objects instead of failing on the foreign key
+
+Both run in one transaction, so sending the same set twice changes nothing
+the second time and a retry never needs special handling. A change bumps
+the exhibition's ``updated_at``, which dates its art object listing.
+"""
+import datetime
+from typing import List
+from uuid import UUID
+
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.bulk import insert_ignore
+from db.models.person import ArtObject, Exhibition, ExhibitionArtObjectAssociation
+
+
+async def sync_members(db: AsyncSession, exhibition_id: UUID, art_object_ids: List[UUID]) -> dict:
+    """Make ``art_object_ids`` the exhibition's members; the caller commits."""
+    table = ExhibitionArtObjectAssociation.__table__
+    desired = set(art_object_ids)
+    removed = (
+        await db.execute(
+            delete(table)
+            .where(table.c.exhibition_id == exhibition_id, table.c.art_object_id.not_in(desired))
+            .returning(table.c.art_object_id)
+        )
+    ).scalars().all()
+
+    added = []
+    now = datetime.datetime.utcnow()
+    if desired:
+        members = select(
+            ArtObject.id, literal(exhibition_id, table.c.exhibition_id.type), literal(now), literal(now)
+        ).where(ArtObject.id.in_(desired))
+        statement = (
+            insert_ignore(db.bind.dialect.name, table, ["art_object_id", "exhibition_id"])
+            .from_select(["art_object_id", "exhibition_id", "created_at", "updated_at"], members)
+            .returning(table.c.art_object_id)
+        )
+        added = (await db.execute(statement)).scalars().all()
+    if added or removed:
+        await db.execute(update(Exhibition).where(Exhibition.id == exhibition_id).values(updated_at=now))
+
+    current = set((await db.scalars(select(table.c.art_object_id).where(table.c.exhibition_id == exhibition_id))).all())
+    return {
+        "added": added,
+        "removed": removed,
+        "unchanged": len(current) - len(added),
+        "unknown_art_objects": sorted(desired - current, key=str),
+    }
@@ -0,0 +1,376 @@
+"""Typo-tolerant matching of artist names and art object titles.
+
+Both backends compare trigram sets the way ``pg_trgm`` does: every word,
+case-folded and padded with two blanks in front and one behind, is cut
+into three-letter grams. A row matches when it contains at least
+``FUZZY_MATCH_THRESHOLD`` of the query's grams ("word similarity", so a
+surname alone finds the full name). Hits are ranked by that share, then
+by how close the whole string is to the query.
+
+* Postgres: ``pg_trgm`` with GIN trigram indexes on ``artists.name`` and
+  ``art_objects.title`` (migration 5), queried with ``<%`` and
+  ``word_similarity``.
+* Anything else (local runs on SQLite): an in-process ``NgramIndex`` per
+  kind, built from the database on first use. Committed changes mark ids
+  dirty through ``catalog_events``; they are reloaded before the next
+  query. The index is rebuilt in the background after
+  ``FUZZY_INDEX_TTL_SECONDS`` to pick up writes made by other processes.
+"""
+import asyncio
+import math
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, literal, select
+
+from services import catalog_events
+
+
+FUZZY_MATCH_THRESHOLD = float(os.getenv("FUZZY_MATCH_THRESHOLD", "0.5"))
+FUZZY_INDEX_TTL_SECONDS = float(os.getenv("FUZZY_INDEX_TTL_SECONDS", "600"))
+KINDS = ("artist", "art_object")
+# work bounds of a local query, see NgramIndex.query
+MAX_POSTINGS = 50_000
+MAX_CANDIDATES = 5_000
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def trigrams(text: Optional[str]) -> set:
+    grams = set()
+    for word in _WORD.findall((text or "").casefold()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NgramIndex:
+    """Trigram postings over ``(id, text[, tag])`` rows.
+
+    Rows present at build time are stored twice in numpy arrays: postings
+    (the slots of every gram, ascending) to find candidates, and each
+    slot's gram ids to count what a candidate shares with the query. Rows
+    written later are appended slots kept in plain lists and sets;
+    replaced or removed rows are tombstoned. ``compact`` folds both back
+    into the arrays.
+    """
+
+    def __init__(self, rows: Iterable[Tuple] = ()):
+        self._ids = []
+        self._texts = []
+        self._slot_by_id = {}
+        self._tag_codes = {None: 0}
+        self._extra_postings = {}
+        self._extra_grams = {}
+        self._build(rows)
+
+    def __len__(self) -> int:
+        return len(self._slot_by_id)
+
+    def _tag_code(self, tag) -> int:
+        return self._tag_codes.setdefault(tag, len(self._tag_codes))
+
+    def _build(self, rows):
+        import numpy as np
+
+        padded, tags = [], []
+        for id, text, *tag in rows:
+            self._slot_by_id[id] = len(self._ids)
+            self._ids.append(id)
+            self._texts.append(text)
+            padded.append("".join(f"  {word} " for word in _WORD.findall((text or "").casefold())))
+            tags.append(self._tag_code(tag[0] if tag else None))
+        self._built = len(self._ids)
+        # Cut every row at once: the padded words of all rows as one array of
+        # code points, a gram per position packed into an int64 (21 bits a
+        # character). Only the two windows after a word's last letter end in
+        # two blanks; they span into the next word and are dropped.
+        lengths = np.fromiter(map(len, padded), dtype=np.int64, count=self._built)
+        codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        keys = (codes[:-2] << 42) | (codes[1:-1] << 21) | codes[2:]
+        inside = (codes[1:-1] != 32) | (codes[2:] != 32)
+        slots = np.repeat(np.arange(self._built, dtype=np.int64), lengths)[: len(keys)][inside]
+        gram_keys, grams = np.unique(keys[inside], return_inverse=True)
+        # one entry per (slot, gram), ordered by slot
+        pairs = np.unique(slots * len(gram_keys) + grams)
+        self._grams = (pairs % len(gram_keys)).astype(np.int32)
+        counts = np.bincount(pairs // len(gram_keys), minlength=self._built).astype(np.int32)
+        self._vocabulary = {
+            chr(key >> 42) + chr((key >> 21) & 0x1FFFFF) + chr(key & 0x1FFFFF): gram
+            for gram, key in enumerate(gram_keys.tolist())
+        }
+        self._gram_offsets = np.zeros(self._built + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._gram_offsets[1:])
+        # a stable sort keeps every gram's slots ascending
+        order = np.argsort(self._grams, kind="stable")
+        self._postings = np.repeat(np.arange(self._built, dtype=np.int32), counts)[order]
+        self._offsets = np.zeros(len(gram_keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._grams, minlength=len(gram_keys)), out=self._offsets[1:])
+        size = max(self._built, 1)
+        self._counts = np.zeros(size, dtype=np.int32)
+        self._counts[: self._built] = counts
+        self._tag_array = np.zeros(size, dtype=np.int16)
+        self._tag_array[: self._built] = tags
+        self._alive = np.zeros(size, dtype=bool)
+        self._alive[: self._built] = True
+
+    def _grow(self, size: int):
+        import numpy as np
+
+        capacity = len(self._counts)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        self._counts = np.resize(self._counts, capacity)
+        self._tag_array = np.resize(self._tag_array, capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self._alive)] = self._alive
+        self._alive = alive
+
+    def remove(self, ids: Iterable):
+        for id in ids:
+            slot = self._slot_by_id.pop(id, None)
+            if slot is not None:
+                self._alive[slot] = False
+
+    def upsert(self, rows: Iterable[Tuple]):
+        rows = list(rows)
+        self.remove(id for id, *_ in rows)
+        self._grow(len(self._ids) + len(rows))
+        for id, text, *tag in rows:
+            slot = len(self._ids)
+            grams = trigrams(text)
+            self._slot_by_id[id] = slot
+            self._ids.append(id)
+            self._texts.append(text)
+            self._counts[slot] = len(grams)
+            self._tag_array[slot] = self._tag_code(tag[0] if tag else None)
+            self._alive[slot] = True
+            self._extra_grams[slot] = grams
+            for gram in grams:
+                self._extra_postings.setdefault(gram, []).append(slot)
+        if len(self._ids) - self._built > max(10_000, len(self) // 10):
+            self.compact()
+
+    def compact(self):
+        codes = {code: tag for tag, code in self._tag_codes.items()}
+        rows = [
+            (id, self._texts[slot], codes[int(self._tag_array[slot])]) for id, slot in self._slot_by_id.items()
+        ]
+        self.__init__(rows)
+
+    def _shared(self, slots, grams: set, query_mask):
+        """How many of ``grams`` each of ``slots`` has."""
+        import numpy as np
+
+        built = slots[slots < self._built]
+        lengths = self._counts[built]
+        starts = np.cumsum(lengths) - lengths
+        # positions of every gram of every slot in ``_grams``
+        positions = np.repeat(self._gram_offsets[built] - starts, lengths) + np.arange(lengths.sum())
+        found = np.add.reduceat(query_mask[self._grams[positions]].astype(np.int32), starts) if len(built) else starts
+        appended = [len(self._extra_grams[slot] & grams) for slot in slots[len(built):]]
+        return np.concatenate([found.astype(np.int32), np.asarray(appended, dtype=np.int32)])
+
+    def query(self, text: str, limit: int = 10, threshold: float = FUZZY_MATCH_THRESHOLD, tag=None) -> List[Tuple]:
+        """``(id, text, score)`` best first; ``score`` is the share of the query's grams found."""
+        import numpy as np
+
+        grams = trigrams(text)
+        if not grams or (tag is not None and tag not in self._tag_codes):
+            return []
+        query_mask = np.zeros(len(self._vocabulary), dtype=bool)
+        postings = []
+        for gram in grams:
+            gram_id = self._vocabulary.get(gram)
+            parts = []
+            if gram_id is not None:
+                query_mask[gram_id] = True
+                parts.append(self._postings[self._offsets[gram_id]:self._offsets[gram_id + 1]])
+            if gram in self._extra_postings:
+                # appended slots come after every built one, so this stays ascending
+                parts.append(np.asarray(self._extra_postings[gram], dtype=np.int32))
+            if parts:
+                postings.append(np.concatenate(parts) if len(parts) > 1 else parts[0])
+        postings.sort(key=len)
+        need = max(1, math.ceil(threshold * len(grams) - 1e-9))
+        # A row sharing ``need`` grams is in at least one of the
+        # len(postings) - need + 1 rarest postings. Candidates are the rows of
+        # those postings (up to MAX_POSTINGS read), most frequent first (up
+        # to MAX_CANDIDATES checked); within both limits the result is exact.
+        prefix, read = [], 0
+        for slots in postings[: len(postings) - need + 1]:
+            if prefix and read + len(slots) > MAX_POSTINGS:
+                break
+            prefix.append(slots)
+            read += len(slots)
+        if not prefix:
+            return []
+        if len(prefix) == 1:
+            candidates, hits = prefix[0], np.ones(len(prefix[0]), dtype=np.int64)
+        else:
+            candidates, hits = np.unique(np.concatenate(prefix), return_counts=True)
+        usable = self._alive[candidates]
+        if tag is not None:
+            usable &= self._tag_array[candidates] == self._tag_codes[tag]
+        candidates, hits = candidates[usable], hits[usable]
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = np.sort(candidates[np.argpartition(-hits, MAX_CANDIDATES)[:MAX_CANDIDATES]])
+        found = self._shared(candidates, grams, query_mask)
+        keep = found >= need
+        candidates, found = candidates[keep], found[keep]
+        if not len(candidates):
+            return []
+        coverage = found / len(grams)
+        similarity = found / (len(grams) + self._counts[candidates] - found)
+        best = np.lexsort((similarity, coverage))[::-1][:limit]
+        return [(self._ids[candidates[i]], self._texts[candidates[i]], float(coverage[i])) for i in best]
+
+
+def _source(kind: str):
+    from db.models.person import ArtObject, Artist
+
+    if kind == "artist":
+        return select(Artist.id, Artist.name), Artist.id
+    return select(ArtObject.id, ArtObject.title, ArtObject.object_type), ArtObject.id
+
+
+def _rows(result):
+    # tags are the plain enum values, e.g. "painting"
+    return [(id, text, *(getattr(tag, "value", tag) for tag in tags)) for id, text, *tags in result]
+
+
+class _LocalIndex:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.index = None
+        self.built_at = 0.0
+        self.dirty = set()
+        self.rebuilding = False
+        self._reloaded = set()
+        # ``lock`` guards ``dirty`` and the rebuild flags and is only ever held
+        # briefly, since the after-commit hook takes it on the event loop;
+        # ``apply_lock`` serializes reloading dirty rows into and querying ``index``
+        self.lock = threading.Lock()
+        self.apply_lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def _load(self, ids=None) -> list:
+        from db.database import engine
+
+        statement, id_column = _source(self.kind)
+        with engine.connect() as connection:
+            if ids is None:
+                return _rows(connection.execute(statement))
+            rows = []
+            ids = list(ids)
+            for start in range(0, len(ids), 1000):
+                rows += _rows(connection.execute(statement.where(id_column.in_(ids[start:start + 1000]))))
+            return rows
+
+    def _rebuild(self, background: bool = True):
+        try:
+            started = time.monotonic()
+            index = NgramIndex(self._load())
+            with self.apply_lock, self.lock:
+                # ids reloaded while the snapshot was read may be newer than it
+                self.dirty |= self._reloaded
+                self.index, self.built_at = index, started
+        except Exception as e:
+            if not background:
+                raise
+            print(f"fuzzy index rebuild for {self.kind} failed: {e}")
+        finally:
+            with self.lock:
+                self.rebuilding = False
+                self._reloaded = set()
+
+    def match(self, query: str, limit: int, tag=None) -> list:
+        if self.index is None:
+            # the first build runs outside ``lock`` so commits can still mark ids dirty
+            with self.build_lock:
+                if self.index is None:
+                    with self.lock:
+                        self.rebuilding = True
+                    self._rebuild(background=False)
+        with self.lock:
+            if not self.rebuilding and time.monotonic() - self.built_at > FUZZY_INDEX_TTL_SECONDS:
+                self.rebuilding = True
+                threading.Thread(target=self._rebuild, name=f"fuzzy-index-{self.kind}", daemon=True).start()
+        with self.apply_lock:
+            with self.lock:
+                dirty, self.dirty = self.dirty, set()
+                if dirty and self.rebuilding:
+                    self._reloaded |= dirty
+            if dirty:
+                try:
+                    rows = self._load(dirty)
+                except BaseException:
+                    with self.lock:
+                        self.dirty |= dirty
+                    raise
+                self.index.remove(dirty)
+                self.index.upsert(rows)
+            return self.index.query(query, limit, tag=tag)
+
+
+_local: Dict[str, _LocalIndex] = {kind: _LocalIndex(kind) for kind in KINDS}
+
+
+@catalog_events.after_commit
+def _on_catalog_change(changes):
+    for kind in KINDS:
+        entry = _local[kind]
+        if changes.get(kind) and (entry.index is not None or entry.rebuilding):
+            with entry.lock:
+                entry.dirty.update(changes[kind])
+
+
+def _postgres_statement(kind: str, query: str, limit: int, object_type=None):
+    from db.models.person import ArtObject, Artist
+
+    column = Artist.name if kind == "artist" else ArtObject.title
+    score = func.word_similarity(query, column)
+    statement = (
+        select(column.table.c.id, column, score.label("score"))
+        .where(literal(query).op("<%")(column))
+        .order_by(score.desc(), func.similarity(query, column).desc(), column.table.c.id)
+        .limit(limit)
+    )
+    if object_type is not None:
+        statement = statement.where(ArtObject.object_type == object_type)
+    return statement
+
+
+async def match(db, kind: str, query: str, limit: int = 10, object_type=None) -> List[Tuple]:
+    """``(id, text, score)`` of the rows of ``kind`` closest to ``query``, best first."""
+    if db.bind.dialect.name == "postgresql":
+        # SET LOCAL: the threshold only applies to this transaction
+        await db.execute(
+            select(func.set_config("pg_trgm.word_similarity_threshold", str(FUZZY_MATCH_THRESHOLD), True))
+        )
+        rows = await db.execute(_postgres_statement(kind, query, limit, object_type))
+        return [tuple(row) for row in rows]
+    tag = getattr(object_type, "value", object_type)
+    return await asyncio.to_thread(_local[kind].match, query, limit, tag)
+
+
+async def load(db, model, hits: List[Tuple]) -> list:
+    """The ``model`` rows of ``hits``, in rank order."""
+    if not hits:
+        return []
+    rows = {row.id: row for row in (await db.scalars(select(model).where(model.id.in_([hit[0] for hit in hits]))))}
+    return [rows[hit[0]] for hit in hits if hit[0] in rows]
+
+
+def create_postgres_indexes(connection):
+    connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_artists_name_trgm ON artists USING gin (name gin_trgm_ops)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_art_objects_title_trgm ON art_objects USING gin (title gin_trgm_ops)"
+    )
@@ -0,0 +1,178 @@
+"""The homepage payload, kept as pre-serialized bytes.
+
+``load`` runs the homepage queries (the first ten sculptures, paintings and
+other art objects by year and five exhibitions by end date). The lifespan
+starts ``homepage_snapshot``, which runs them once, serializes the response
+for every ``ImageSize`` and serves those bytes until something changes, so
+a homepage hit costs no query at all. Each body carries a strong ``ETag``
+(its hash) and ``Last-Modified`` (when it was built) for conditional GET.
+
+Catalog commits of art objects and exhibitions reach it through a
+``catalog_events`` hook and trigger a rebuild in the background, after
+``HOMEPAGE_SNAPSHOT_DEBOUNCE_SECONDS`` so a bulk import causes one rebuild.
+Writes by other processes are picked up when the snapshot is older than
+``HOMEPAGE_SNAPSHOT_MAX_AGE_SECONDS``. With ``HOMEPAGE_SNAPSHOT_PATH`` set
+every snapshot is also written to that file, and a restarted process
+serves it until its own first build is done.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from db.conditional import http_date
+from db.models.data_types import ImageSize
+from services import catalog_events, image_variants
+
+
+HOMEPAGE_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("HOMEPAGE_SNAPSHOT_MAX_AGE_SECONDS", "300"))
+HOMEPAGE_SNAPSHOT_DEBOUNCE_SECONDS = float(os.getenv("HOMEPAGE_SNAPSHOT_DEBOUNCE_SECONDS", "0.5"))
+HOMEPAGE_SNAPSHOT_PATH = os.getenv("HOMEPAGE_SNAPSHOT_PATH")
+MESSAGE = "Home page data fetched successfully"
+
+
+async def load(db) -> dict:
+    """The homepage rows: ``{section: [rows]}``."""
+    from db.models.person import ArtObject, Exhibition
+
+    rows = {}
+    for relation in ("sculpture", "painting", "other"):
+        column = getattr(ArtObject, relation)
+        rows[relation] = (await db.scalars(
+            select(ArtObject).options(joinedload(column)).where(column != None).order_by(ArtObject.year).limit(10)
+        )).all()
+    rows["exhibition"] = (await db.scalars(select(Exhibition).order_by(Exhibition.end_date).limit(5))).all()
+    return rows
+
+
+def serialize(rows: dict, image_size: ImageSize) -> dict:
+    return {
+        "sculpture_data": [image_variants.art_object_with_image_size(x, "sculpture", image_size) for x in rows["sculpture"]],
+        "painting_data": [image_variants.art_object_with_image_size(x, "painting", image_size) for x in rows["painting"]],
+        "other_data": [image_variants.art_object_with_image_size(x, "other", image_size) for x in rows["other"]],
+        "exhibition_data": [image_variants.row_with_image_size(x, image_size) for x in rows["exhibition"]],
+    }
+
+
+def render(data: dict) -> bytes:
+    """The response body, byte for byte what ``JSONResponse`` would send."""
+    return JSONResponse(jsonable_encoder({"message": MESSAGE, "data": data})).body
+
+
+class HomepageSnapshot:
+    """Serialized homepage bodies per image size, rebuilt by a background task."""
+
+    def __init__(
+        self,
+        path: Optional[str] = HOMEPAGE_SNAPSHOT_PATH,
+        max_age_seconds: float = HOMEPAGE_SNAPSHOT_MAX_AGE_SECONDS,
+        debounce_seconds: float = HOMEPAGE_SNAPSHOT_DEBOUNCE_SECONDS,
+    ):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.debounce_seconds = debounce_seconds
+        self.bodies: Dict[str, bytes] = {}
+        self.etags: Dict[str, str] = {}
+        self.built_at = None
+        self._stale = True
+        self._task = None
+        self._wake = None
+        self._loop = None
+
+    def get(self, image_size: ImageSize):
+        """``(body, headers)``, or ``None`` before the first snapshot."""
+        body = self.bodies.get(image_size.value)
+        if body is None:
+            return None
+        return body, {
+            "ETag": self.etags[image_size.value],
+            "Last-Modified": http_date(datetime.datetime.fromtimestamp(self.built_at, datetime.timezone.utc)),
+            "Cache-Control": "no-cache",
+            "X-Snapshot-Age": str(int(max(time.time() - self.built_at, 0))),
+        }
+
+    def _set(self, bodies: Dict[str, bytes], built_at: float):
+        etags = {size: f'"{hashlib.sha256(body).hexdigest()[:32]}"' for size, body in bodies.items()}
+        self.bodies, self.etags, self.built_at = bodies, etags, built_at
+
+    def start(self):
+        self._read()
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self, changes):
+        """Mark the snapshot stale; safe to call from any thread."""
+        if self._task is None or not (changes.get("art_object") or changes.get("exhibition")):
+            return
+        self._stale = True
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def build(self):
+        from db.database import AsyncSessionLocal
+
+        started = time.time()
+        async with AsyncSessionLocal() as db:
+            rows = await load(db)
+            bodies = {size.value: render(serialize(rows, size)) for size in ImageSize}
+        self._set(bodies, started)
+        if self.path:
+            await asyncio.to_thread(self._write)
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as file:
+                stored = json.load(file)
+            self._set({size: body.encode() for size, body in stored["bodies"].items()}, stored["built_at"])
+        except Exception as e:
+            print(f"homepage snapshot: could not read {self.path}: {e}")
+
+    def _write(self):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({"built_at": self.built_at, "bodies": {size: body.decode() for size, body in self.bodies.items()}}, file)
+        os.replace(temporary, self.path)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            if self._stale or time.time() - self.built_at > self.max_age_seconds:
+                # cleared before the queries, so a commit during the build runs another one
+                self._stale = False
+                try:
+                    await self.build()
+                except Exception as e:
+                    self._stale = True
+                    print(f"homepage snapshot: build failed: {e}")
+            try:
+                # the timeout retries a failed build and ages the snapshot
+                await asyncio.wait_for(self._wake.wait(), timeout=min(self.max_age_seconds, 60))
+            except asyncio.TimeoutError:
+                pass
+            else:
+                await asyncio.sleep(self.debounce_seconds)
+
+
+homepage_snapshot = HomepageSnapshot()
+
+
+@catalog_events.after_commit
+def _on_catalog_change(changes):
+    homepage_snapshot.notify(changes)
@@ -0,0 +1,113 @@
+"""Per-process LRU cache of person identities.
+
+Entries are plain snapshots (no password, no ORM state) reachable by id or by
+email. Routes that change a person call ``invalidate`` after committing;
+entries also expire after ``IDENTITY_CACHE_TTL_SECONDS`` so changes made by
+another worker are picked up eventually.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class PersonIdentity:
+    __slots__ = ("id", "role", "email", "username", "image", "is_auth", "is_active")
+
+    def __init__(self, id, role, email, username, image, is_auth, is_active):
+        self.id = id
+        self.role = role
+        self.email = email
+        self.username = username
+        self.image = image
+        self.is_auth = is_auth
+        self.is_active = is_active
+
+    @classmethod
+    def from_person(cls, person) -> "PersonIdentity":
+        return cls(
+            person.id,
+            person.role,
+            person.email,
+            person.username,
+            person.image,
+            person.is_auth,
+            person.is_active,
+        )
+
+
+class IdentityCache:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._by_id = OrderedDict()
+        self._id_by_email = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_by_id(self, person_id) -> Optional[PersonIdentity]:
+        with self._lock:
+            entry = self._by_id.get(str(person_id))
+            if entry is None:
+                self.misses += 1
+                return None
+            identity, cached_at = entry
+            if time.monotonic() - cached_at > self.ttl_seconds:
+                self._remove(str(person_id))
+                self.misses += 1
+                return None
+            self._by_id.move_to_end(str(person_id))
+            self.hits += 1
+            return identity
+
+    def get_by_email(self, email: str) -> Optional[PersonIdentity]:
+        with self._lock:
+            person_id = self._id_by_email.get(email)
+        if person_id is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return self.get_by_id(person_id)
+
+    def put(self, person) -> PersonIdentity:
+        identity = person if isinstance(person, PersonIdentity) else PersonIdentity.from_person(person)
+        key = str(identity.id)
+        with self._lock:
+            self._remove(key)
+            self._by_id[key] = (identity, time.monotonic())
+            self._id_by_email[identity.email] = key
+            while len(self._by_id) > self.max_entries:
+                oldest, (evicted, _) = self._by_id.popitem(last=False)
+                self._drop_email(oldest, evicted.email)
+        return identity
+
+    def invalidate(self, person_id=None, email: Optional[str] = None):
+        with self._lock:
+            if person_id is None and email is not None:
+                person_id = self._id_by_email.get(email)
+            if person_id is not None:
+                self._remove(str(person_id))
+            if email is not None:
+                self._id_by_email.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_email.clear()
+
+    def _remove(self, key: str):
+        entry = self._by_id.pop(key, None)
+        if entry is not None:
+            self._drop_email(key, entry[0].email)
+
+    def _drop_email(self, key: str, email: str):
+        if self._id_by_email.get(email) == key:
+            del self._id_by_email[email]
+
+
+identity_cache = IdentityCache(
+    max_entries=int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", 10000)),
+    ttl_seconds=float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", 60)),
+)
@@ -0,0 +1,109 @@
+"""Thumbnail, medium and large variants of uploaded images.
+
+Backends that can resize on the fly (Cloudinary) just get transformation
+urls. For the others, variants are rendered with Pillow in a process pool and
+uploaded next to the original under ``<key>:<variant>``. Each image ends up
+with ``{"thumbnail": url, "medium": url, "large": url}`` in the owner's
+``image_variants`` column, in the same order as the urls in ``image``.
+"""
+import asyncio
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from db.models.data_types import ImageSize
+from services.media import media_service
+
+
+VARIANT_SIZES = {
+    ImageSize.THUMBNAIL.value: 200,
+    ImageSize.MEDIUM.value: 800,
+    ImageSize.LARGE.value: 1600,
+}
+
+_executor = None
+
+
+def render_variants(data: bytes) -> Optional[dict]:
+    """JPEG bytes per variant, or None when ``data`` is not a readable image."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        source = Image.open(io.BytesIO(data))
+        source.load()
+    except (UnidentifiedImageError, OSError):
+        return None
+    if source.mode not in ("RGB", "L"):
+        background = Image.new("RGB", source.size, (255, 255, 255))
+        background.paste(source.convert("RGBA"), mask=source.convert("RGBA").split()[-1])
+        source = background
+    rendered = {}
+    for name, edge in VARIANT_SIZES.items():
+        image = source.copy()
+        image.thumbnail((edge, edge))
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=80, optimize=True, progressive=True)
+        rendered[name] = out.getvalue()
+    return rendered
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=int(os.getenv("IMAGE_VARIANT_WORKERS", 2)))
+    return _executor
+
+
+async def _variants_for(data: bytes, key: str, url: str) -> dict:
+    urls = media_service.storage.variant_urls(key)
+    if urls is not None:
+        return urls
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(_get_executor(), render_variants, data)
+    if rendered is None:
+        return {name: url for name in VARIANT_SIZES}
+    names = list(rendered)
+    uploaded = await media_service.upload_many(
+        [rendered[name] for name in names], [f"{key}:{name}" for name in names], overwrite=True
+    )
+    return dict(zip(names, uploaded))
+
+
+async def build_variants(contents: List[bytes], keys: List[str], urls: List[str]) -> List[dict]:
+    """Variant urls for each uploaded image, in input order."""
+    return list(await asyncio.gather(*(_variants_for(*args) for args in zip(contents, keys, urls))))
+
+
+def select_image(image, variants, size: ImageSize):
+    """``image`` (a JSON list of urls) with each url swapped for its ``size`` variant.
+
+    Rows created before variants existed keep their original urls.
+    """
+    if size == ImageSize.ORIGINAL or not variants:
+        return image
+    return json.dumps([variant.get(size.value) for variant in variants])
+
+
+def row_with_image_size(row, size: ImageSize) -> dict:
+    """The columns of ORM ``row`` as a dict whose ``image`` holds the ``size`` urls."""
+    data = {k: v for k, v in row.__dict__.items() if not k.startswith("_")}
+    variants = data.pop("image_variants", None)
+    data["image"] = select_image(data.get("image"), variants, size)
+    return data
+
+
+def art_object_with_image_size(art_object, relation: str, size: ImageSize) -> dict:
+    """``art_object`` as a dict with its loaded ``relation`` subtype row sized like ``row_with_image_size``."""
+    data = {k: v for k, v in art_object.__dict__.items() if not k.startswith("_")}
+    subtype = getattr(art_object, relation)
+    data[relation] = None if subtype is None else row_with_image_size(subtype, size)
+    return data
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
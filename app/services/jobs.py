@@ -0,0 +1,293 @@
+"""Durable in-process job queue backed by the ``jobs`` table.
+
+Handlers call ``enqueue(db, kind, payload)`` before they commit, so a job
+exists exactly when the change that caused it does. Worker tasks started in
+the app lifespan claim due jobs (``FOR UPDATE SKIP LOCKED`` on Postgres, so
+several workers and processes can share the table), run the registered
+handler off the event loop, and then mark the job done, schedule a retry
+with exponential backoff, or move it to ``dead`` after ``max_attempts``.
+A job left ``running`` by a crashed worker is picked up again once its lease
+expires.
+"""
+import asyncio
+import datetime
+import os
+import random
+import time
+import traceback
+import uuid
+from collections import deque
+
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session
+
+from db.models.data_types import JobStatus
+
+
+_handlers = {}
+
+
+def job_handler(kind: str):
+    """Register a plain function as the handler for ``kind`` jobs."""
+
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: dict, max_attempts: int = 5, delay_seconds: float = 0):
+    from db.models.person import Job
+
+    if kind not in _handlers:
+        raise ValueError(f"no job handler registered for {kind!r}")
+    job = Job(
+        kind=kind,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=delay_seconds),
+    )
+    db.add(job)
+    db.info["jobs_enqueued"] = True
+    return job
+
+
+class JobMetrics:
+    def __init__(self, samples: int = 1000):
+        self.succeeded = 0
+        self.retried = 0
+        self.dead = 0
+        self.queue_latency = deque(maxlen=samples)
+        self.run_time = deque(maxlen=samples)
+
+    @staticmethod
+    def _percentiles(values) -> dict:
+        if not values:
+            return {"p50": None, "p95": None, "p99": None}
+        ordered = sorted(values)
+
+        def pick(q):
+            return round(ordered[min(int(len(ordered) * q), len(ordered) - 1)], 4)
+
+        return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99)}
+
+    def snapshot(self) -> dict:
+        return {
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "dead": self.dead,
+            "queue_latency_seconds": self._percentiles(self.queue_latency),
+            "run_time_seconds": self._percentiles(self.run_time),
+        }
+
+
+class JobWorker:
+    def __init__(
+        self,
+        session_factory=None,
+        concurrency: int = 1,
+        batch_size: int = 10,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 300.0,
+        backoff_base: float = 2.0,
+        backoff_max: float = 600.0,
+    ):
+        self._session_factory = session_factory
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics = JobMetrics()
+        self._tasks = []
+        self._wake = None
+        self._loop = None
+
+    @classmethod
+    def from_env(cls) -> "JobWorker":
+        return cls(
+            concurrency=int(os.getenv("JOB_WORKERS", 1)),
+            batch_size=int(os.getenv("JOB_BATCH_SIZE", 10)),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL_SECONDS", 1)),
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", 300)),
+        )
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from db.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers; safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                print(f"job worker: claiming failed: {e}")
+                claimed = []
+            for job_id, kind, payload, attempts, max_attempts, created_at in claimed:
+                await self._execute(job_id, kind, payload, attempts, max_attempts, created_at)
+            if len(claimed) < self.batch_size:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _claim(self):
+        from db.models.person import Job
+
+        now = datetime.datetime.utcnow()
+        lease_expired = now - datetime.timedelta(seconds=self.lease_seconds)
+        with self.session_factory() as db:
+            jobs = (
+                db.query(Job)
+                .filter(
+                    or_(
+                        (Job.status == JobStatus.PENDING) & (Job.run_at <= now),
+                        (Job.status == JobStatus.RUNNING) & (Job.locked_at < lease_expired),
+                    )
+                )
+                .order_by(Job.run_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            claimed = []
+            for job in jobs:
+                job.status = JobStatus.RUNNING
+                job.locked_at = now
+                job.attempts += 1
+                claimed.append((job.id, job.kind, job.payload, job.attempts, job.max_attempts, job.created_at))
+            db.commit()
+        return claimed
+
+    async def _execute(self, job_id, kind, payload, attempts, max_attempts, created_at):
+        started = time.perf_counter()
+        error = None
+        try:
+            handler = _handlers[kind]
+            if asyncio.iscoroutinefunction(handler):
+                await handler(payload)
+            else:
+                await asyncio.to_thread(handler, payload)
+        except Exception:
+            error = traceback.format_exc(limit=5)
+        self.metrics.run_time.append(time.perf_counter() - started)
+        try:
+            await asyncio.to_thread(self._finish, job_id, attempts, max_attempts, created_at, error)
+        except Exception as e:
+            print(f"job worker: could not record outcome of job {job_id}: {e}")
+
+    def _finish(self, job_id, attempts, max_attempts, created_at, error):
+        from db.models.person import Job
+
+        now = datetime.datetime.utcnow()
+        values = {"locked_at": None, "last_error": error}
+        if error is None:
+            values.update(status=JobStatus.DONE, finished_at=now)
+            self.metrics.succeeded += 1
+            self.metrics.queue_latency.append((now - created_at).total_seconds())
+        elif attempts >= max_attempts:
+            values.update(status=JobStatus.DEAD, finished_at=now)
+            self.metrics.dead += 1
+            print(f"job {job_id} moved to dead letter after {attempts} attempts")
+        else:
+            delay = min(self.backoff_base ** attempts, self.backoff_max) * random.uniform(0.5, 1.0)
+            values.update(status=JobStatus.PENDING, run_at=now + datetime.timedelta(seconds=delay))
+            self.metrics.retried += 1
+        with self.session_factory() as db:
+            db.query(Job).filter(Job.id == job_id).update(values, synchronize_session=False)
+            db.commit()
+
+    def queue_stats(self) -> dict:
+        from db.models.person import Job
+
+        with self.session_factory() as db:
+            depth = {status.value: 0 for status in JobStatus}
+            for status, count in db.query(Job.status, func.count(Job.id)).group_by(Job.status):
+                depth[status.value] = count
+            oldest = (
+                db.query(func.min(Job.run_at))
+                .filter(Job.status == JobStatus.PENDING)
+                .scalar()
+            )
+        oldest_age = None
+        if oldest is not None:
+            oldest_age = max((datetime.datetime.utcnow() - oldest).total_seconds(), 0)
+        return {"depth": depth, "oldest_pending_age_seconds": oldest_age, **self.metrics.snapshot()}
+
+
+job_worker = JobWorker.from_env()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("jobs_enqueued", False):
+        job_worker.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("jobs_enqueued", None)
+
+
+@job_handler("send_email")
+def send_email_job(payload: dict):
+    import utils
+
+    utils.sendEmail(payload["email"], payload["subject"], payload["message"])
+
+
+@job_handler("issue_auth_token")
+def issue_auth_token_job(payload: dict):
+    import utils
+
+    new_token = utils.generate_new_auth_token(payload["user_id"])
+    utils.sendEmail(payload["email"], payload["subject"], payload["message"].format(token=new_token))
+
+
+def _has_image(person_id) -> bool:
+    from db.database import SessionLocal
+    from db.models.person import Person
+
+    with SessionLocal() as db:
+        return db.query(Person.image).filter(Person.id == uuid.UUID(person_id)).scalar() is not None
+
+
+@job_handler("media_destroy")
+def media_destroy_job(payload: dict):
+    """Delete ``key``; a profile image job (``person_id`` and ``url``) only deletes the upload it was enqueued for.
+
+    The job is enqueued in the commit that clears the person's image (or
+    deletes the person), and a later upload reuses the same key. An image
+    on the person again, or a different url under the key, means a newer
+    upload that must stay.
+    """
+    from services.media import media_service
+
+    if payload.get("person_id") is not None and _has_image(payload["person_id"]):
+        print(f"kept media {payload['key']}: the person has a newer image")
+        return
+    result = media_service.storage.delete(payload["key"], if_url=payload.get("url"))
+    print(f"deleted media {payload['key']}: {result}")
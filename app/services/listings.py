@@ -0,0 +1,90 @@
+"""Listing pages read as Core rows into slotted dataclasses.
+
+The listing endpoints used to load ORM instances (identity map, attribute
+instrumentation, a ``joinedload`` per subtype) only to turn each one back
+into a dict for ``jsonable_encoder``, which then walked every value. Here
+a listing selects plain columns and copies each row into a dataclass with
+``__slots__``, one class per table with a field per column. ``orjson``
+encodes those (and their UUIDs, dates and enums) natively, so the
+endpoints return them in an ``ORJSONResponse`` as is.
+
+Art objects are joined to the subtype of the listing, whose columns are
+selected under a ``<relation>_`` prefix and nested under ``relation`` like
+before. ``image_variants`` never reaches the client: ``image`` already
+holds the urls of the requested ``ImageSize``.
+"""
+from dataclasses import make_dataclass
+from typing import Any, Optional
+
+from sqlalchemy import select
+
+from db.models.person import ArtObject, Artist, Exhibition, OtherArt, Painting, Sculpture
+from db.pagination import Keyset
+from services import image_variants
+
+
+def _row_class(name: str, table, exclude=(), extra=()):
+    fields = [column.key for column in table.columns if column.key not in exclude] + list(extra)
+    return make_dataclass(name, [(field, Any) for field in fields], namespace={"__slots__": tuple(fields)})
+
+
+# ``name_normalized`` is the internal dedupe key, not part of an artist's payload
+ARTIST_COLUMNS = [column for column in Artist.__table__.c if column.key != "name_normalized"]
+ArtistRow = _row_class("ArtistRow", Artist.__table__, exclude=("name_normalized",))
+ExhibitionRow = _row_class("ExhibitionRow", Exhibition.__table__, exclude=("image_variants",))
+SUBTYPES = {"sculpture": Sculpture, "painting": Painting, "other": OtherArt}
+SUBTYPE_ROWS = {
+    relation: _row_class(f"{model.__name__}Row", model.__table__, exclude=("image_variants",))
+    for relation, model in SUBTYPES.items()
+}
+ART_OBJECT_ROWS = {
+    relation: _row_class(f"{model.__name__}ArtObjectRow", ArtObject.__table__, extra=(relation,))
+    for relation, model in SUBTYPES.items()
+}
+
+
+async def artists(db, keyset: Keyset, limit: int, cursor: Optional[str] = None, offset: int = 0):
+    """``(rows, next_cursor)`` of the artist listing as ``ArtistRow``."""
+    rows, next_cursor = await keyset.page(db, select(*ARTIST_COLUMNS), limit, cursor=cursor, offset=offset, core=True)
+    return [ArtistRow(*row) for row in rows], next_cursor
+
+
+async def exhibitions(db, keyset: Keyset, limit: int, image_size, cursor: Optional[str] = None, offset: int = 0):
+    """``(rows, next_cursor)`` of the exhibition listing as ``ExhibitionRow``."""
+    columns = [column for column in Exhibition.__table__.c if column.key != "image_variants"]
+    image = columns.index(Exhibition.__table__.c.image)
+    statement = select(*columns, Exhibition.__table__.c.image_variants)
+    rows, next_cursor = await keyset.page(db, statement, limit, cursor=cursor, offset=offset, core=True)
+    page = []
+    for row in rows:
+        values = list(row[:-1])
+        values[image] = image_variants.select_image(values[image], row[-1], image_size)
+        page.append(ExhibitionRow(*values))
+    return page, next_cursor
+
+
+async def art_objects(
+    db, relation: str, keyset: Keyset, limit: int, image_size, cursor: Optional[str] = None, offset: int = 0
+):
+    """``(rows, next_cursor)`` of the art objects with a ``relation`` subtype row."""
+    model = SUBTYPES[relation]
+    table = model.__table__
+    subtype_columns = [column for column in table.c if column.key != "image_variants"]
+    image = subtype_columns.index(table.c.image)
+    statement = (
+        select(
+            *ArtObject.__table__.c,
+            *(column.label(f"{relation}_{column.key}") for column in subtype_columns),
+            table.c.image_variants.label(f"{relation}_image_variants"),
+        )
+        .join(table, table.c.id == ArtObject.id)
+    )
+    rows, next_cursor = await keyset.page(db, statement, limit, cursor=cursor, offset=offset, core=True)
+    width = len(ArtObject.__table__.c)
+    row_class, subtype_class = ART_OBJECT_ROWS[relation], SUBTYPE_ROWS[relation]
+    page = []
+    for row in rows:
+        subtype = list(row[width:-1])
+        subtype[image] = image_variants.select_image(subtype[image], row[-1], image_size)
+        page.append(row_class(*row[:width], subtype_class(*subtype)))
+    return page, next_cursor
@@ -0,0 +1,159 @@
+"""Non-blocking media uploads.
+
+Storage backends (see ``services.storage``) are synchronous, so every call
+runs on a small thread pool instead of the event loop. A semaphore bounds how
+many uploads one worker has in flight, each call gets a timeout (a slot is
+only freed once its thread is done, even after the caller gave up), and a
+circuit breaker stops sending work to the media backend after repeated
+failures. While the breaker is open,
+media calls fail immediately with ``MediaUnavailable`` (the routes answer
+503) and requests that do not touch media are unaffected.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from services.storage import StorageBackend, build_storage
+
+
+class MediaUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    After ``reset_timeout`` seconds one trial call is let through (half-open);
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """The call ended without an outcome (cancelled); let another trial through."""
+        self._trial_in_flight = False
+
+
+class MediaService:
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        timeout: float = 30.0,
+        breaker: Optional[CircuitBreaker] = None,
+        storage: Optional[StorageBackend] = None,
+    ):
+        self.storage = storage or build_storage()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="media")
+        self._semaphore = None
+
+    @classmethod
+    def from_env(cls) -> "MediaService":
+        return cls(
+            max_concurrency=int(os.getenv("MEDIA_MAX_CONCURRENCY", 8)),
+            timeout=float(os.getenv("MEDIA_TIMEOUT_SECONDS", 30)),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("MEDIA_BREAKER_FAILURES", 5)),
+                reset_timeout=float(os.getenv("MEDIA_BREAKER_RESET_SECONDS", 30)),
+            ),
+        )
+
+    async def _call(self, fn, *args, **kwargs):
+        if not self.breaker.allow():
+            raise MediaUnavailable("media backend is unavailable, try again later")
+        try:
+            result = await self._run(fn, *args, **kwargs)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            raise MediaUnavailable(f"media backend timed out after {self.timeout:g}s")
+        except Exception as e:
+            self.breaker.record_failure()
+            raise MediaUnavailable(f"media backend error: {e}")
+        except BaseException:
+            # a cancelled half-open trial would otherwise keep the breaker open for good
+            self.breaker.abandon()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        await self._semaphore.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # a timed-out call keeps its thread busy, so the slot is freed when the
+        # thread finishes rather than when we stop waiting for it
+        future.add_done_callback(lambda _: self._release(loop))
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+
+    def _release(self, loop):
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._semaphore.release)
+
+    async def upload(self, file, key: str, overwrite: bool = False) -> str:
+        return await self._call(self.storage.put, file, key, overwrite=overwrite)
+
+    async def upload_many(self, files, keys: List[str], overwrite: bool = False) -> List[str]:
+        """Upload ``files`` concurrently; urls come back in input order."""
+        if not files:
+            return []
+        return list(
+            await asyncio.gather(*(self.upload(file, key, overwrite) for file, key in zip(files, keys)))
+        )
+
+    async def destroy(self, key: str):
+        return await self._call(self.storage.delete, key)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.storage.name,
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout,
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+media_service = MediaService.from_env()
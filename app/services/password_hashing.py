@@ -0,0 +1,156 @@
+"""Password hashing with scrypt, run in bounded process pools.
+
+Hashing and verifying are CPU bound by design, so they never run on the event
+loop. Verification (login) and hashing (signup, rehash) get separate pools so
+a burst of signups cannot queue in front of logins. Each pool has a cap on
+pending jobs; past it the call fails fast with ``HashingBusy`` instead of
+growing an unbounded queue, and the route answers 503.
+
+Stored hashes look like ``scrypt$<n>$<r>$<p>$<salt>$<hash>``. Anything else
+is a legacy plaintext password, which is accepted once and rehashed.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+
+SCHEME = "scrypt"
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 2**14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=128 * n * r * 2, dklen=KEY_BYTES
+    )
+
+
+def hash_password_sync(password: str) -> str:
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return "$".join(
+        [
+            SCHEME,
+            str(SCRYPT_N),
+            str(SCRYPT_R),
+            str(SCRYPT_P),
+            base64.b64encode(salt).decode("ascii"),
+            base64.b64encode(key).decode("ascii"),
+        ]
+    )
+
+
+def verify_password_sync(password: str, stored: str) -> bool:
+    try:
+        _, n, r, p, salt, key = stored.split("$")
+        expected = base64.b64decode(key)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def is_hashed(stored: Optional[str]) -> bool:
+    return bool(stored) and stored.startswith(SCHEME + "$")
+
+
+def needs_rehash(stored: Optional[str]) -> bool:
+    if not is_hashed(stored):
+        return True
+    parts = stored.split("$")
+    return parts[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+
+class BoundedProcessPool:
+    """A process pool that refuses work once ``max_pending`` jobs are queued."""
+
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingBusy(f"{self.name} pool is saturated")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _pool_from_env(name: str, default_workers: int) -> BoundedProcessPool:
+    prefix = f"PASSWORD_{name.upper()}"
+    workers = int(os.getenv(f"{prefix}_WORKERS", default_workers))
+    max_pending = int(os.getenv(f"{prefix}_MAX_PENDING", workers * 8))
+    return BoundedProcessPool(name, workers, max_pending)
+
+
+verify_pool = _pool_from_env("verify", max((os.cpu_count() or 2) // 2, 1))
+hash_pool = _pool_from_env("hash", 1)
+
+
+async def hash_password(password: str) -> str:
+    return await hash_pool.run(hash_password_sync, password)
+
+
+async def verify_password(password: str, stored: Optional[str]) -> bool:
+    if not stored:
+        return False
+    if not is_hashed(stored):
+        # legacy plaintext row; the caller rehashes it on success
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    return await verify_pool.run(verify_password_sync, password, stored)
+
+
+async def rehash_if_needed(password: str, stored: Optional[str]) -> Optional[str]:
+    """A fresh hash when ``stored`` is plaintext or uses old parameters.
+
+    Returns None when no rehash is needed or the hash pool is busy; in the
+    latter case the next successful login tries again.
+    """
+    if not needs_rehash(stored):
+        return None
+    try:
+        return await hash_password(password)
+    except HashingBusy:
+        return None
+
+
+def shutdown():
+    verify_pool.shutdown()
+    hash_pool.shutdown()
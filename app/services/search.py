@@ -0,0 +1,225 @@
+"""Full-text search over art objects, artists and exhibitions.
+
+Every searchable row has one document in ``search_documents``
+(``kind``, ``id``, ``title``, ``body``):
+
+* art object: its title; description, department and artist name
+* artist: name; description and bio
+* exhibition: name
+
+The Postgres backend keeps a weighted ``tsvector`` (title A, body B) in
+the same row under a GIN index and ranks with ``ts_rank_cd``. The SQLite
+backend, for local runs, indexes the table with an external-content FTS5
+table kept in step by triggers and ranks with ``bm25``. Both match every
+query word as a prefix. Backends delimit matches with private-use
+sentinel characters; ``search`` HTML-escapes the title and snippet and only
+then turns the sentinels into ``<mark>`` tags, so stored text can never
+inject markup into a highlight.
+
+Documents are rewritten in the transaction that changes the catalog, by
+an ``in_transaction`` hook on ``catalog_events``, so search never lags
+behind a commit. ``python -m services.search reindex`` rebuilds them all.
+"""
+import argparse
+import html
+import os
+import re
+from typing import List, Optional
+
+from sqlalchemy import bindparam, select, text
+
+from db.bulk import chunked
+from services import catalog_events
+
+
+KINDS = ("art_object", "artist", "exhibition")
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "english")
+MARK_OPEN, MARK_CLOSE = "<mark>", "</mark>"
+# never stored: ``refresh`` strips them from documents
+_SENTINEL_OPEN, _SENTINEL_CLOSE = "\ue000", "\ue001"
+BATCH_SIZE = 1000
+
+_POSTGRES_DDL = (
+    "CREATE TABLE IF NOT EXISTS search_documents ("
+    " kind VARCHAR(20) NOT NULL, id VARCHAR(36) NOT NULL, title TEXT NOT NULL, body TEXT NOT NULL,"
+    " document TSVECTOR NOT NULL, PRIMARY KEY (kind, id))",
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_document ON search_documents USING gin (document)",
+)
+_SQLITE_DDL = (
+    "CREATE TABLE IF NOT EXISTS search_documents ("
+    " rowid INTEGER PRIMARY KEY, kind VARCHAR(20) NOT NULL, id VARCHAR(36) NOT NULL,"
+    " title TEXT NOT NULL, body TEXT NOT NULL, UNIQUE (kind, id))",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    " title, body, content='search_documents', content_rowid='rowid', tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN"
+    " INSERT INTO search_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN"
+    " INSERT INTO search_fts (search_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN"
+    " INSERT INTO search_fts (search_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);"
+    " INSERT INTO search_fts (rowid, title, body) VALUES (new.rowid, new.title, new.body); END",
+)
+
+_POSTGRES_UPSERT = text(
+    "INSERT INTO search_documents (kind, id, title, body, document) VALUES (:kind, :id, :title, :body,"
+    " setweight(to_tsvector(CAST(:config AS regconfig), :title), 'A')"
+    " || setweight(to_tsvector(CAST(:config AS regconfig), :body), 'B'))"
+    " ON CONFLICT (kind, id) DO UPDATE SET title = excluded.title, body = excluded.body, document = excluded.document"
+)
+_SQLITE_UPSERT = text(
+    "INSERT INTO search_documents (kind, id, title, body) VALUES (:kind, :id, :title, :body)"
+    " ON CONFLICT (kind, id) DO UPDATE SET title = excluded.title, body = excluded.body"
+)
+_DELETE = text("DELETE FROM search_documents WHERE kind = :kind AND id IN :ids").bindparams(
+    bindparam("ids", expanding=True)
+)
+
+_POSTGRES_SEARCH = text(
+    "SELECT page.kind, page.id, page.score,"
+    " ts_headline(CAST(:config AS regconfig), page.title, page.query, :title_options) AS title,"
+    " ts_headline(CAST(:config AS regconfig), page.body, page.query, :body_options) AS snippet"
+    " FROM (SELECT kind, id, title, body, query, ts_rank_cd(document, query) AS score"
+    "  FROM search_documents, to_tsquery(CAST(:config AS regconfig), :query) AS query"
+    "  WHERE document @@ query AND kind IN :kinds"
+    "  ORDER BY score DESC, kind, id LIMIT :limit OFFSET :offset) AS page"
+    " ORDER BY page.score DESC, page.kind, page.id"
+).bindparams(bindparam("kinds", expanding=True))
+_SQLITE_SEARCH = text(
+    "SELECT d.kind, d.id, -bm25(search_fts, 10.0, 1.0) AS score,"
+    " highlight(search_fts, 0, :open, :close) AS title,"
+    " snippet(search_fts, 1, :open, :close, '…', 16) AS snippet"
+    " FROM search_fts JOIN search_documents d ON d.rowid = search_fts.rowid"
+    " WHERE search_fts MATCH :query AND d.kind IN :kinds"
+    " ORDER BY bm25(search_fts, 10.0, 1.0), d.kind, d.id LIMIT :limit OFFSET :offset"
+).bindparams(bindparam("kinds", expanding=True))
+
+
+def _words(query: str) -> List[str]:
+    return re.findall(r"\w+", query)
+
+
+def create_index(connection):
+    for ddl in _POSTGRES_DDL if connection.dialect.name == "postgresql" else _SQLITE_DDL:
+        connection.exec_driver_sql(ddl)
+
+
+def drop_index(connection):
+    connection.exec_driver_sql("DROP TABLE IF EXISTS search_fts")
+    connection.exec_driver_sql("DROP TABLE IF EXISTS search_documents")
+
+
+def _join(*parts) -> str:
+    return " ".join(part for part in parts if part)
+
+
+def _clean(text: str) -> str:
+    return text.replace(_SENTINEL_OPEN, "").replace(_SENTINEL_CLOSE, "")
+
+
+def _highlight(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return html.escape(text).replace(_SENTINEL_OPEN, MARK_OPEN).replace(_SENTINEL_CLOSE, MARK_CLOSE)
+
+
+def _documents(connection, kind: str, ids) -> list:
+    from db.models.person import ArtObject, Artist, Exhibition
+
+    if kind == "art_object":
+        rows = connection.execute(
+            select(ArtObject.id, ArtObject.title, ArtObject.description, ArtObject.department, Artist.name)
+            .outerjoin(Artist, Artist.id == ArtObject.artist_id)
+            .where(ArtObject.id.in_(ids))
+        )
+        return [(id, title, _join(description, department, artist)) for id, title, description, department, artist in rows]
+    if kind == "artist":
+        rows = connection.execute(
+            select(Artist.id, Artist.name, Artist.description, Artist.artist_bio).where(Artist.id.in_(ids))
+        )
+        return [(id, name, _join(description, bio)) for id, name, description, bio in rows]
+    rows = connection.execute(select(Exhibition.id, Exhibition.name).where(Exhibition.id.in_(ids)))
+    return [(id, name, "") for id, name in rows]
+
+
+def refresh(connection, kind: str, ids):
+    """Rewrite the documents of ``ids``; ids whose row is gone lose theirs."""
+    upsert = _POSTGRES_UPSERT if connection.dialect.name == "postgresql" else _SQLITE_UPSERT
+    for chunk in chunked(ids, BATCH_SIZE):
+        documents = _documents(connection, kind, chunk)
+        gone = {str(id) for id in chunk} - {str(id) for id, _, _ in documents}
+        if gone:
+            connection.execute(_DELETE, {"kind": kind, "ids": list(gone)})
+        if documents:
+            connection.execute(
+                upsert,
+                [
+                    {"kind": kind, "id": str(id), "title": _clean(title or ""), "body": _clean(body), "config": SEARCH_TEXT_CONFIG}
+                    for id, title, body in documents
+                ],
+            )
+
+
+@catalog_events.in_transaction
+def _on_catalog_change(connection, changes):
+    from db.models.person import ArtObject
+
+    art_objects = set(changes.get("art_object", ()))
+    artists = changes.get("artist")
+    if artists:
+        # art object documents carry the artist's name
+        for chunk in chunked(artists, BATCH_SIZE):
+            art_objects.update(connection.execute(select(ArtObject.id).where(ArtObject.artist_id.in_(chunk))).scalars())
+        refresh(connection, "artist", artists)
+    if art_objects:
+        refresh(connection, "art_object", art_objects)
+    if changes.get("exhibition"):
+        refresh(connection, "exhibition", changes["exhibition"])
+
+
+def reindex(connection):
+    from db.models.person import ArtObject, Artist, Exhibition
+
+    connection.exec_driver_sql("DELETE FROM search_documents")
+    for kind, model in (("art_object", ArtObject), ("artist", Artist), ("exhibition", Exhibition)):
+        refresh(connection, kind, connection.execute(select(model.id)).scalars().all())
+
+
+async def search(db, query: str, kinds: Optional[List[str]] = None, limit: int = 20, offset: int = 0) -> list:
+    """Ranked hits for ``query``, best first; each word matches as a prefix."""
+    words = _words(query)
+    if not words:
+        return []
+    params = {"kinds": list(kinds or KINDS), "limit": limit, "offset": offset}
+    if db.bind.dialect.name == "postgresql":
+        statement = _POSTGRES_SEARCH
+        params.update(
+            query=" & ".join(f"{word}:*" for word in words),
+            config=SEARCH_TEXT_CONFIG,
+            title_options=f"StartSel={_SENTINEL_OPEN}, StopSel={_SENTINEL_CLOSE}, HighlightAll=true",
+            body_options=f"StartSel={_SENTINEL_OPEN}, StopSel={_SENTINEL_CLOSE}, MaxWords=30, MinWords=10",
+        )
+    else:
+        statement = _SQLITE_SEARCH
+        params.update(query=" ".join(f'"{word}"*' for word in words), open=_SENTINEL_OPEN, close=_SENTINEL_CLOSE)
+    rows = (await db.execute(statement, params)).mappings()
+    return [
+        {**row, "title": _highlight(row["title"]), "snippet": _highlight(row["snippet"])}
+        for row in rows
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["reindex"])
+    parser.parse_args()
+    from db.database import engine
+
+    with engine.begin() as connection:
+        create_index(connection)
+        reindex(connection)
+        count = connection.exec_driver_sql("SELECT count(*) FROM search_documents").scalar()
+    print(f"{count} search documents indexed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Stateless signed session tokens issued at login.
+
+A token is ``<kid>.<payload>.<signature>``: the payload is compact JSON with
+the person id, role and expiry, base64url encoded, and the signature is an
+HMAC-SHA256 over ``<kid>.<payload>`` with the key named by ``kid``. Checking
+a token is a dictionary lookup and one HMAC, no database or file access.
+
+Keys come from ``SESSION_SIGNING_KEYS`` as ``kid:secret`` pairs separated by
+commas. The first pair signs new tokens; every listed pair is accepted when
+verifying, so a rotation is: prepend the new key, deploy, and drop the old
+one once ``SESSION_TOKEN_TTL_SECONDS`` has passed. The app refuses to start
+without them: a key made up per process would reject tokens issued by the
+other workers and by the process before a restart. For local development
+only, ``SESSION_DEV_RANDOM_KEY=1`` allows exactly that random key.
+
+Routes that change an account require a token (``get_account_session``).
+Clients that still identify the account by email alone can be let through
+for a migration window with ``SESSION_EMAIL_FALLBACK=true``; it is off by
+default and every use is logged.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Optional
+
+from fastapi import Header, HTTPException, Request, status
+
+from db.models.data_types import Role
+
+
+DEFAULT_SESSION_TTL_SECONDS = 12 * 3600
+SESSION_EMAIL_FALLBACK = os.getenv("SESSION_EMAIL_FALLBACK", "false").lower() in ("1", "true", "yes", "on")
+
+
+class InvalidSessionToken(Exception):
+    pass
+
+
+class SessionClaims:
+    __slots__ = ("person_id", "role", "expires_at")
+
+    def __init__(self, person_id: str, role: Role, expires_at: int):
+        self.person_id = person_id
+        self.role = role
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f"SessionClaims(person_id={self.person_id!r}, role={self.role.value!r}, expires_at={self.expires_at})"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class SessionKeyRing:
+    """Signing keys by id; the active key signs, all keys verify."""
+
+    def __init__(self, keys: Optional[list] = None):
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._active_kid = None
+        for kid, secret in keys or []:
+            self.add(kid, secret)
+
+    @classmethod
+    def from_env(cls) -> "SessionKeyRing":
+        raw = os.getenv("SESSION_SIGNING_KEYS", "").strip()
+        if not raw:
+            if os.getenv("SESSION_DEV_RANDOM_KEY", "false").lower() not in ("1", "true", "yes", "on"):
+                raise RuntimeError(
+                    "SESSION_SIGNING_KEYS is not set; set it, or SESSION_DEV_RANDOM_KEY=1 for local development"
+                )
+            print("SESSION_DEV_RANDOM_KEY: using a random per-process session key, tokens will not survive a restart")
+            return cls([("dev", secrets.token_urlsafe(32))])
+        pairs = []
+        for item in raw.split(","):
+            kid, sep, secret = item.strip().partition(":")
+            if not sep or not kid or not secret or "." in kid:
+                raise ValueError("SESSION_SIGNING_KEYS must be comma separated kid:secret pairs")
+            pairs.append((kid, secret))
+        return cls(pairs)
+
+    @property
+    def active_kid(self) -> str:
+        return self._active_kid
+
+    def add(self, kid: str, secret: str):
+        """Register a key; the first key added becomes the active one."""
+        with self._lock:
+            self._keys[kid] = secret.encode("utf-8")
+            if self._active_kid is None:
+                self._active_kid = kid
+
+    def rotate(self, kid: str, secret: str):
+        """Make ``kid`` the signing key while old keys keep verifying."""
+        with self._lock:
+            self._keys[kid] = secret.encode("utf-8")
+            self._active_kid = kid
+
+    def retire(self, kid: str):
+        with self._lock:
+            if kid == self._active_kid:
+                raise ValueError("cannot retire the active signing key")
+            self._keys.pop(kid, None)
+
+    def sign(self, message: bytes, kid: Optional[str] = None) -> bytes:
+        return hmac.new(self._keys[kid or self._active_kid], message, hashlib.sha256).digest()
+
+    def key(self, kid: str) -> Optional[bytes]:
+        return self._keys.get(kid)
+
+
+_key_ring = None
+
+
+def get_key_ring() -> SessionKeyRing:
+    global _key_ring
+    if _key_ring is None:
+        _key_ring = SessionKeyRing.from_env()
+    return _key_ring
+
+
+def issue_session_token(person_id, role: Role, ttl_seconds: Optional[int] = None) -> str:
+    key_ring = get_key_ring()
+    if ttl_seconds is None:
+        ttl_seconds = int(os.getenv("SESSION_TOKEN_TTL_SECONDS", DEFAULT_SESSION_TTL_SECONDS))
+    payload = json.dumps(
+        {"sub": str(person_id), "role": role.value, "exp": int(time.time()) + ttl_seconds},
+        separators=(",", ":"),
+    )
+    kid = key_ring.active_kid
+    signing_input = f"{kid}.{_b64encode(payload.encode('utf-8'))}"
+    signature = key_ring.sign(signing_input.encode("ascii"), kid)
+    return f"{signing_input}.{_b64encode(signature)}"
+
+
+def verify_session_token(token: str) -> SessionClaims:
+    try:
+        kid, payload, signature = token.split(".")
+    except ValueError:
+        raise InvalidSessionToken("malformed token")
+    key = get_key_ring().key(kid)
+    if key is None:
+        raise InvalidSessionToken("unknown signing key")
+    expected = hmac.new(key, f"{kid}.{payload}".encode("ascii"), hashlib.sha256).digest()
+    try:
+        valid = hmac.compare_digest(expected, _b64decode(signature))
+    except (ValueError, TypeError):
+        valid = False
+    if not valid:
+        raise InvalidSessionToken("bad signature")
+    try:
+        data = json.loads(_b64decode(payload))
+        claims = SessionClaims(data["sub"], Role(data["role"]), int(data["exp"]))
+    except (ValueError, KeyError, TypeError):
+        raise InvalidSessionToken("malformed payload")
+    if claims.expires_at <= time.time():
+        raise InvalidSessionToken("token expired")
+    return claims
+
+
+def _bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token.strip()
+
+
+async def get_session(authorization: Optional[str] = Header(None)) -> SessionClaims:
+    token = _bearer_token(authorization)
+    if token is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    try:
+        return verify_session_token(token)
+    except InvalidSessionToken as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid session: {e}")
+
+
+async def get_optional_session(authorization: Optional[str] = Header(None)) -> Optional[SessionClaims]:
+    if _bearer_token(authorization) is None:
+        return None
+    return await get_session(authorization)
+
+
+async def get_account_session(request: Request, authorization: Optional[str] = Header(None)) -> Optional[SessionClaims]:
+    """``get_session`` for routes that change an account.
+
+    ``None`` (identify the account by email) only without a token and with
+    ``SESSION_EMAIL_FALLBACK`` on.
+    """
+    if _bearer_token(authorization) is None and SESSION_EMAIL_FALLBACK:
+        print(f"SESSION_EMAIL_FALLBACK: unauthenticated {request.method} {request.url.path}")
+        return None
+    return await get_session(authorization)
+
+
+async def get_admin_session(authorization: Optional[str] = Header(None)) -> SessionClaims:
+    claims = await get_session(authorization)
+    if claims.role != Role.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin session required")
+    return claims
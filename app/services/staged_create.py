@@ -0,0 +1,92 @@
+"""Create rows that own uploaded media in two stages.
+
+1. ``stage_media`` uploads every image (and its variants) concurrently,
+   before any database work, under keys derived from an id generated up
+   front. No connection is checked out while the uploads run.
+2. ``commit_with_media`` adds the rows and commits them in one transaction
+   with a single flush, so a pooled connection is held only for the inserts.
+
+If either stage fails, the media that did get uploaded is removed by
+``media_destroy`` jobs, or deleted directly when the queue is unreachable.
+"""
+import asyncio
+import json
+from typing import List
+
+from services import image_variants, jobs
+from services.media import media_service
+from services.storage import media_key
+
+
+class StagedMedia:
+    __slots__ = ("keys", "urls", "variants")
+
+    def __init__(self, keys: List[str], urls: List[str], variants: List[dict]):
+        self.keys = keys
+        self.urls = urls
+        self.variants = variants
+
+    @property
+    def image(self) -> str:
+        """The urls as stored in the ``image`` columns."""
+        return json.dumps(self.urls)
+
+
+def _stored_keys(keys: List[str]) -> List[str]:
+    stored = []
+    for key in keys:
+        stored.append(key)
+        # backends that cannot derive variants store them under their own keys
+        if media_service.storage.variant_urls(key) is None:
+            stored.extend(f"{key}:{name}" for name in image_variants.VARIANT_SIZES)
+    return stored
+
+
+def _enqueue_destroy(keys: List[str]):
+    from db.database import SessionLocal
+
+    with SessionLocal() as db:
+        for key in keys:
+            jobs.enqueue(db, "media_destroy", {"key": key})
+        db.commit()
+
+
+async def discard_media(keys: List[str]):
+    if not keys:
+        return
+    keys = _stored_keys(keys)
+    try:
+        await asyncio.to_thread(_enqueue_destroy, keys)
+    except Exception as e:
+        print(f"could not queue cleanup of {len(keys)} media keys, deleting now: {e}")
+        await asyncio.gather(*(media_service.destroy(key) for key in keys), return_exceptions=True)
+
+
+async def stage_media(owner_id, kind: str, files) -> StagedMedia:
+    """Upload ``files`` and their variants for ``owner_id``; all or nothing."""
+    contents = [await file.read() for file in files or []]
+    keys = [media_key(owner_id, kind, i) for i in range(len(contents))]
+    results = await asyncio.gather(
+        *(media_service.upload(data, key) for data, key in zip(contents, keys)), return_exceptions=True
+    )
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        await discard_media([key for key, result in zip(keys, results) if not isinstance(result, BaseException)])
+        raise failures[0]
+    try:
+        variants = await image_variants.build_variants(contents, keys, results)
+    except BaseException:
+        await discard_media(keys)
+        raise
+    return StagedMedia(keys, list(results), variants)
+
+
+async def commit_with_media(db, rows: list, media: StagedMedia):
+    """Add ``rows`` and commit them; on failure roll back and drop ``media``."""
+    db.add_all(rows)
+    try:
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        await discard_media(media.keys)
+        raise
@@ -0,0 +1,216 @@
+"""Where uploaded media bytes live.
+
+``MEDIA_STORAGE_BACKEND`` picks the backend:
+
+* ``cloudinary`` (default) keeps using Cloudinary, keyed by public id.
+* ``local`` is a content-addressed store on disk. Blobs are named by the
+  SHA-256 of their bytes, so identical uploads are written once; each media
+  key is a small ref file pointing at its blob. Deleting a key drops the
+  ref, and ``gc`` removes blobs no ref points at. Blobs are served by the app
+  under ``MEDIA_URL_PREFIX``/blobs, which lets the whole stack run offline;
+  refs are not served, they map keys (which embed owner ids) to content.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from typing import Optional
+from urllib.parse import quote
+
+
+DEFAULT_LOCAL_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), "temp", "media")
+
+
+def media_key(owner_id, kind: str, index: Optional[int] = None) -> str:
+    """Public id for an owner's image: ``<id>:img:<i>:_:<kind>`` or ``<id>:_:<kind>``."""
+    if index is None:
+        return f"{owner_id}:_:{kind}"
+    return f"{owner_id}:img:{index}:_:{kind}"
+
+
+def _read_bytes(data) -> bytes:
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    if hasattr(data, "seek"):
+        data.seek(0)
+    return data.read()
+
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+
+def _guess_extension(data: bytes) -> str:
+    for signature, extension in _SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return ""
+
+
+class StorageBackend:
+    name = "base"
+
+    def put(self, data, key: str, overwrite: bool = False) -> str:
+        """Store ``data`` (bytes or a file object) under ``key`` and return its url."""
+        raise NotImplementedError
+
+    def delete(self, key: str, if_url: Optional[str] = None) -> dict:
+        """Delete ``key``; with ``if_url``, only while ``key`` still serves that url."""
+        raise NotImplementedError
+
+    def variant_urls(self, key: str) -> Optional[dict]:
+        """Resized variant urls if the backend can derive them, else None."""
+        return None
+
+
+def _cloudinary():
+    """The configured Cloudinary SDK, imported on first use."""
+    import cloudinary
+    import cloudinary.uploader
+    import utils
+
+    utils.initialize_cloudinary()
+    return cloudinary
+
+
+class CloudinaryStorage(StorageBackend):
+    name = "cloudinary"
+
+    def put(self, data, key, overwrite=False):
+        cloudinary = _cloudinary()
+        if isinstance(data, (bytes, bytearray)):
+            data = io.BytesIO(data)
+        options = {"overwrite": True} if overwrite else {}
+        return cloudinary.uploader.upload(data, public_id=key, **options)["secure_url"]
+
+    def delete(self, key, if_url=None):
+        cloudinary = _cloudinary()
+        if if_url is not None:
+            import cloudinary.api
+
+            try:
+                current = cloudinary.api.resource(key)["secure_url"]
+            except cloudinary.exceptions.NotFound:
+                return {"result": "not found"}
+            # an overwrite gets a new version, and so a new url
+            if current != if_url:
+                return {"result": "kept"}
+        return cloudinary.uploader.destroy(public_id=key)
+
+    def variant_urls(self, key):
+        from services.image_variants import VARIANT_SIZES
+
+        cloudinary = _cloudinary()
+        return {
+            name: cloudinary.CloudinaryImage(key).build_url(
+                width=edge, height=edge, crop="limit", fetch_format="auto", quality="auto", secure=True
+            )
+            for name, edge in VARIANT_SIZES.items()
+        }
+
+
+class LocalContentAddressedStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str = DEFAULT_LOCAL_ROOT, base_url: str = "/media"):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        self.blob_url = f"{self.base_url}/blobs"
+        self.blob_dir = os.path.join(root, "blobs")
+        self.ref_dir = os.path.join(root, "refs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.ref_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.dedup_hits = 0
+
+    def _blob_name(self, digest: str, extension: str) -> str:
+        return f"{digest[:2]}/{digest}{extension}"
+
+    def _ref_path(self, key: str) -> str:
+        return os.path.join(self.ref_dir, quote(key, safe=""))
+
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put(self, data, key, overwrite=False):
+        content = _read_bytes(data)
+        blob_name = self._blob_name(hashlib.sha256(content).hexdigest(), _guess_extension(content))
+        blob_path = os.path.join(self.blob_dir, blob_name)
+        if os.path.exists(blob_path):
+            with self._lock:
+                self.dedup_hits += 1
+        else:
+            self._write_atomic(blob_path, content)
+            with self._lock:
+                self.writes += 1
+        self._write_atomic(self._ref_path(key), blob_name.encode("ascii"))
+        return self.url_for(blob_name)
+
+    def url_for(self, blob_name: str) -> str:
+        return f"{self.blob_url}/{blob_name}"
+
+    def resolve(self, key: str) -> Optional[str]:
+        try:
+            with open(self._ref_path(key), "r", encoding="ascii") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key, if_url=None):
+        if if_url is not None:
+            current = self.resolve(key)
+            if current is None:
+                return {"result": "not found"}
+            if self.url_for(current) != if_url:
+                return {"result": "kept"}
+        try:
+            os.remove(self._ref_path(key))
+        except FileNotFoundError:
+            return {"result": "not found"}
+        return {"result": "ok"}
+
+    def gc(self) -> int:
+        """Remove blobs that no ref points at; returns how many were removed.
+
+        Run it while no uploads are in flight: a blob written just before its
+        ref would otherwise look unreferenced.
+        """
+        referenced = set()
+        for name in os.listdir(self.ref_dir):
+            with open(os.path.join(self.ref_dir, name), "r", encoding="ascii") as f:
+                referenced.add(f.read())
+        removed = 0
+        for prefix in os.listdir(self.blob_dir):
+            for name in os.listdir(os.path.join(self.blob_dir, prefix)):
+                if f"{prefix}/{name}" not in referenced and not name.endswith(".tmp"):
+                    os.remove(os.path.join(self.blob_dir, prefix, name))
+                    removed += 1
+        return removed
+
+
+def build_storage(backend: Optional[str] = None) -> StorageBackend:
+    backend = (backend or os.getenv("MEDIA_STORAGE_BACKEND", "cloudinary")).lower()
+    if backend == "cloudinary":
+        return CloudinaryStorage()
+    if backend == "local":
+        return LocalContentAddressedStorage(
+            os.getenv("MEDIA_LOCAL_ROOT", DEFAULT_LOCAL_ROOT), os.getenv("MEDIA_URL_PREFIX", "/media")
+        )
+    raise ValueError(f"unknown MEDIA_STORAGE_BACKEND: {backend}")
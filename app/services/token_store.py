@@ -0,0 +1,254 @@
+"""Keyed storage for the 6 digit account authorization tokens.
+
+Every entry is stored under its own key so issuing or validating a token only
+touches that key: the file backend keeps one small JSON file per key and
+replaces it atomically, the DB backend keeps one row per key in
+``auth_tokens``. Entries carry an absolute expiry and are treated as missing
+once it has passed. A small per-process read cache sits in front of either
+backend so repeated validations do not hit the disk or the database.
+"""
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+DEFAULT_TOKEN_TTL_SECONDS = 24 * 3600
+DEFAULT_TOKEN_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "temp", "auth_tokens")
+
+
+class TokenReadCache:
+    """Tiny LRU of ``key -> (token, expires_at)`` with a short freshness window.
+
+    The window bounds how long another worker's reissue can go unnoticed.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_age_seconds: float = 5.0):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires_at, cached_at = entry
+            if time.monotonic() - cached_at > self.max_age_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token, expires_at
+
+    def put(self, key: str, token: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (token, expires_at, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class TokenStore:
+    """Base class: backends implement ``_read``, ``_write`` and ``_delete``."""
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TOKEN_TTL_SECONDS, cache: Optional[TokenReadCache] = None):
+        self.ttl_seconds = ttl_seconds
+        self.cache = cache if cache is not None else TokenReadCache()
+
+    def _read(self, key: str) -> Optional[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def _write(self, key: str, token: str, expires_at: float):
+        raise NotImplementedError
+
+    def _delete(self, key: str):
+        raise NotImplementedError
+
+    def issue(self, key: str, token: str) -> str:
+        expires_at = time.time() + self.ttl_seconds
+        self._write(key, token, expires_at)
+        self.cache.put(key, token, expires_at)
+        return token
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = self._read(key)
+            if entry is None:
+                return None
+            self.cache.put(key, *entry)
+        token, expires_at = entry
+        if expires_at <= time.time():
+            return None
+        return token
+
+    def validate(self, key: str, token: str) -> bool:
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == token and cached[1] > time.time():
+            return True
+        # a miss or mismatch in the cache may just be stale, so ask the backend
+        entry = self._read(key)
+        if entry is None:
+            self.cache.discard(key)
+            return False
+        self.cache.put(key, *entry)
+        stored_token, expires_at = entry
+        return expires_at > time.time() and stored_token == token
+
+    def revoke(self, key: str):
+        self._delete(key)
+        self.cache.discard(key)
+
+
+class FileTokenStore(TokenStore):
+    """One JSON file per key, written to a temp file and ``os.replace``d in."""
+
+    def __init__(self, directory: str = DEFAULT_TOKEN_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return data["token"], data["expires_at"]
+
+    def _write(self, key, token, expires_at):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"token": token, "expires_at": expires_at}, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self) -> int:
+        removed = 0
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        expired = json.load(f)["expires_at"] <= now
+                except (FileNotFoundError, ValueError, KeyError):
+                    continue
+                if expired:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+class DbTokenStore(TokenStore):
+    """Rows in the ``auth_tokens`` table, keyed by user id."""
+
+    def __init__(self, session_factory=None, **kwargs):
+        super().__init__(**kwargs)
+        if session_factory is None:
+            from db.database import SessionLocal
+
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+
+    def _read(self, key):
+        from db.models.person import AuthToken
+
+        with self.session_factory() as db:
+            row = db.get(AuthToken, key)
+            if row is None:
+                return None
+            return row.token, row.expires_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+    def _write(self, key, token, expires_at):
+        from sqlalchemy.exc import IntegrityError
+        from db.models.person import AuthToken
+
+        expires = datetime.datetime.fromtimestamp(expires_at, tz=datetime.timezone.utc).replace(tzinfo=None)
+        with self.session_factory() as db:
+            updated = (
+                db.query(AuthToken)
+                .filter(AuthToken.key == key)
+                .update({"token": token, "expires_at": expires}, synchronize_session=False)
+            )
+            if not updated:
+                db.add(AuthToken(key=key, token=token, expires_at=expires))
+            try:
+                db.commit()
+            except IntegrityError:
+                # another worker inserted the same key first, overwrite it
+                db.rollback()
+                db.query(AuthToken).filter(AuthToken.key == key).update(
+                    {"token": token, "expires_at": expires}, synchronize_session=False
+                )
+                db.commit()
+
+    def _delete(self, key):
+        from db.models.person import AuthToken
+
+        with self.session_factory() as db:
+            db.query(AuthToken).filter(AuthToken.key == key).delete(synchronize_session=False)
+            db.commit()
+
+    def purge_expired(self) -> int:
+        from db.models.person import AuthToken
+
+        with self.session_factory() as db:
+            removed = (
+                db.query(AuthToken)
+                .filter(AuthToken.expires_at <= datetime.datetime.utcnow())
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return removed
+
+
+_token_store = None
+_token_store_lock = threading.Lock()
+
+
+def build_token_store(backend: Optional[str] = None) -> TokenStore:
+    backend = (backend or os.getenv("AUTH_TOKEN_BACKEND", "file")).lower()
+    ttl = int(os.getenv("AUTH_TOKEN_TTL_SECONDS", DEFAULT_TOKEN_TTL_SECONDS))
+    if backend == "db":
+        return DbTokenStore(ttl_seconds=ttl)
+    if backend == "file":
+        return FileTokenStore(os.getenv("AUTH_TOKEN_DIR", DEFAULT_TOKEN_DIR), ttl_seconds=ttl)
+    raise ValueError(f"unknown AUTH_TOKEN_BACKEND: {backend}")
+
+
+def get_token_store() -> TokenStore:
+    global _token_store
+    if _token_store is None:
+        with _token_store_lock:
+            if _token_store is None:
+                _token_store = build_token_store()
+    return _token_store
@@ -1,61 +1,90 @@
 from sqlalchemy.orm import Session
-from db.models.person import Admin, User, Manager
+from db.models.person import Admin, User, Manager, Person
 from db.models.data_types import Role
-import random
-import numpy as np
-import datetime
+import secrets
+import uuid
+from services import token_store
+from services.identity_cache import identity_cache
 
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 import os
 
 
-auth_token_file_name = 'app/temp/auth_tokens.npy'
+ROLE_MODELS = {Role.USER: User, Role.MANAGER: Manager, Role.ADMIN: Admin}
+ADMIN_BOOTSTRAP_EMAIL = os.getenv("ADMIN_BOOTSTRAP_EMAIL")
 
 
 def get_person_by_email( email: str,role:Role, db: Session,):
-    if role.value =='user':            
-        return db.query(User).filter(User.email == email).first()
-    elif role.value == 'manager':
-        return db.query(Manager).filter(Manager.email == email).first()
-    elif role.value == 'admin':
-        return db.query(Admin).filter(Admin.email == email).first()
+    # the polymorphic model adds the role filter; email is uniquely indexed
+    return db.query(ROLE_MODELS[role]).filter(Person.email == email).first()
+
+
+def email_taken(email: str, db: Session):
+    return db.query(Person.id).filter(Person.email == email).first() is not None
+
+
+def may_sign_up(session, email: str, role: Role, db: Session):
+    """Anyone may sign up as a user; managers and admins are added by an admin.
+
+    The first admin signs up with ``ADMIN_BOOTSTRAP_EMAIL``, which is only
+    honoured while no admin exists.
+    """
+    if role == Role.USER or (session is not None and session.role == Role.ADMIN):
+        return True
+    return (
+        role == Role.ADMIN
+        and ADMIN_BOOTSTRAP_EMAIL is not None
+        and email.lower() == ADMIN_BOOTSTRAP_EMAIL.lower()
+        and db.query(Admin.id).first() is None
+    )
+
+
+def get_person_by_id(person_id, role: Role, db: Session):
+    person = db.get(Person, uuid.UUID(str(person_id)))
+    if person is None or person.role != role:
+        return None
+    return person
+
+
+def resolve_person(session, email: str, role: Role, db: Session):
+    """The logged in person when a session token was sent, else look up by email.
+
+    Routes that change an account only get here without a session when
+    ``SESSION_EMAIL_FALLBACK`` is on (see ``get_account_session``).
+    """
+    if session is not None:
+        return get_person_by_id(session.person_id, session.role, db)
+    return get_person_by_email(email, role, db)
+
+
+def lookup_identity(session, email: str, role: Role, db: Session):
+    """Like ``resolve_person`` but served from the identity cache when possible."""
+    if session is not None:
+        identity = identity_cache.get_by_id(session.person_id)
+    else:
+        identity = identity_cache.get_by_email(email)
+    if identity is not None:
+        expected_role = session.role if session is not None else role
+        return identity if identity.role == expected_role else None
+    person = resolve_person(session, email, role, db)
+    if person is None:
+        return None
+    return identity_cache.put(person)
+
+
+def forget_identity(person):
+    identity_cache.invalidate(person.id, person.email)
 
 
 def generate_random_numbers():
-    return random.randint(0,1000000)
-    
-def has_24_hours_passed(timestamp):
-    current_time = datetime.datetime.now()
-    time_difference = current_time - timestamp
-    return time_difference.total_seconds() >= 24 * 3600
+    return secrets.randbelow(1000000)
 
 
 def generate_new_auth_token(user_id:str):
-    token_file = np.load(auth_token_file_name, allow_pickle=True).item()
-    token = str(generate_random_numbers)
-    new_token = [token, datetime.datetime.now()]
-    
-    if len(token_file) == 0:
-        token_file[user_id] = new_token
-        np.save(auth_token_file_name, token_file)
-        return token
-    for key,value in token_file.items():
-        if key == user_id:
-            token_file[key] = new_token
-            np.save(auth_token_file_name, token_file)
-            return token
+    token = f"{generate_random_numbers():06d}"
+    return token_store.get_token_store().issue(str(user_id), token)
         
 def validate_token(user_id:str, token:str):
-    token_file = np.load(auth_token_file_name, allow_pickle=True).item()
-    for key,value in token_file.items():
-        if key == user_id:
-            if has_24_hours_passed(value[1]):
-                return False
-            if value[0] == token:
-                return True
-    return False
+    return token_store.get_token_store().validate(str(user_id), token)
 
 
 
@@ -63,8 +92,17 @@ def sendEmail(email:str, subject:str, message:str):
     pass
 
 
+_cloudinary_configured = False
+
+
 def initialize_cloudinary():
-    # Configure Cloudinary
+    # Configure Cloudinary once, on first use; importing the SDK is slow enough
+    # to show up in cold starts
+    global _cloudinary_configured
+    if _cloudinary_configured:
+        return
+    import cloudinary
+
     config = cloudinary.config(
     cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
     api_key=os.getenv("CLOUDINARY_API_KEY"),
@@ -72,4 +110,5 @@ def initialize_cloudinary():
 )
     # config = cloudinary.config(secure=True)
     print("****1. Set up and configure the SDK:****\nCredentials: ", config.cloud_name, config.api_key, "\n")
+    _cloudinary_configured = True
 